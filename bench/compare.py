@@ -0,0 +1,113 @@
+"""
+Compare two benchmark results written by bench/run.py:
+
+    python bench/compare.py bench/results/BASELINE.json bench/results/CANDIDATE.json
+
+Prints throughput and latency changes for every scenario and concurrency
+level present in both files, and exits with status 1 if the candidate
+regressed by more than --threshold percent (lower req/s or higher p95/p99).
+"""
+
+import argparse
+import json
+import sys
+
+# (label, path in a run, True if higher is better)
+METRICS = [
+    ("req/s", ("rps",), True),
+    ("p50 ms", ("latency", "p50_ms"), False),
+    ("p95 ms", ("latency", "p95_ms"), False),
+    ("p99 ms", ("latency", "p99_ms"), False),
+]
+# Metrics that count as a regression when they get worse by more than the threshold
+GATED = ("req/s", "p95 ms", "p99 ms")
+
+
+def load_runs(path):
+    """Return the runs of a results file keyed by (scenario, concurrency)."""
+    with open(path, encoding="utf-8") as results_file:
+        results = json.load(results_file)
+    return results, {
+        (run["scenario"], run["concurrency"]): run for run in results["runs"]
+    }
+
+
+def lookup(run, path):
+    """Return the value at a nested path of a run, or None."""
+    value = run
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def change_pct(baseline, candidate):
+    """Percent change from baseline to candidate, or None if undefined."""
+    if baseline in (None, 0) or candidate is None:
+        return None
+    return (candidate - baseline) / baseline * 100
+
+
+def compare(baseline_runs, candidate_runs, threshold):
+    """
+    Compare matching runs.
+
+    Returns:
+        tuple[list, list]: Printable rows, and descriptions of regressions.
+    """
+    rows, regressions = [], []
+    for key in sorted(baseline_runs.keys() & candidate_runs.keys()):
+        for label, path, higher_is_better in METRICS:
+            before = lookup(baseline_runs[key], path)
+            after = lookup(candidate_runs[key], path)
+            change = change_pct(before, after)
+            rows.append((key, label, before, after, change))
+            worse = (
+                change is not None
+                and (-change if higher_is_better else change) > threshold
+            )
+            if label in GATED and worse:
+                regressions.append(f"{key[0]} c={key[1]} {label} {change:+.1f}%")
+    return rows, regressions
+
+
+def print_rows(rows):
+    """Print one line per scenario, concurrency and metric."""
+    for (scenario, concurrency), label, before, after, change in rows:
+        change_text = "" if change is None else f"{change:+7.1f}%"
+        print(
+            f"{scenario:8} c={concurrency:<3} {label:7} {before!s:>10} -> {after!s:>10} "
+            f"{change_text}"
+        )
+
+
+def main():
+    """Print the comparison and exit non-zero on regressions."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    args = parser.parse_args()
+
+    baseline, baseline_runs = load_runs(args.baseline)
+    candidate, candidate_runs = load_runs(args.candidate)
+    print(f"baseline  {baseline['git']['commit'][:8]} {baseline.get('label', '')}")
+    print(f"candidate {candidate['git']['commit'][:8]} {candidate.get('label', '')}")
+    for key in sorted(baseline_runs.keys() & candidate_runs.keys()):
+        modes = {
+            runs[key].get("analysis", "unknown")
+            for runs in (baseline_runs, candidate_runs)
+        }
+        if len(modes) > 1:
+            # pending-only journal runs skip the analyzed page and its worker
+            print(f"note: {key[0]} c={key[1]} compares analysis modes {sorted(modes)}")
+    rows, regressions = compare(baseline_runs, candidate_runs, args.threshold)
+    print_rows(rows)
+    if regressions:
+        print("Regressions over the threshold:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
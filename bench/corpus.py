@@ -0,0 +1,101 @@
+"""
+Synthetic journal corpus for the benchmarks.
+Entries are generated from a fixed seed so every run scores the same texts:
+mostly short and medium entries with a tail of long ones that exceed the
+model's 512-token window and are chunked.
+"""
+
+import random
+from datetime import date, timedelta
+
+from bson.objectid import ObjectId
+
+OPENERS = [
+    "Today I",
+    "This morning I",
+    "After work I",
+    "Tonight I",
+    "At lunch I",
+    "Over the weekend I",
+]
+EVENTS = [
+    "went for a long walk by the river",
+    "finally finished the project I had been dreading",
+    "argued with my roommate about the dishes again",
+    "called my parents and talked for an hour",
+    "missed the bus and was late for class",
+    "cooked dinner for friends",
+    "got feedback on my essay",
+    "spent the afternoon reading in the park",
+    "could not focus on anything",
+    "went to the gym before sunrise",
+    "waited three hours at the clinic",
+    "played music with my band",
+]
+FEELINGS = [
+    "and I feel grateful for the people around me.",
+    "and honestly I am exhausted.",
+    "which left me anxious about tomorrow.",
+    "and it made me really happy.",
+    "and I am frustrated that nothing seems to change.",
+    "so I feel calm and content.",
+    "and I am not sure how I feel about it.",
+    "and now I feel lonely.",
+    "which was a pleasant surprise.",
+    "and I am proud of myself.",
+]
+
+# (sentences, share of the corpus): short, medium and long entries
+LENGTH_MIX = [(2, 0.5), (8, 0.35), (60, 0.15)]
+
+
+def sentence(rng):
+    """Return one random journal sentence."""
+    return f"{rng.choice(OPENERS)} {rng.choice(EVENTS)} {rng.choice(FEELINGS)}"
+
+
+def make_corpus(size, seed=42):
+    """
+    Generate a deterministic list of journal entry texts.
+
+    Args:
+        size (int): Number of entries.
+        seed (int): Random seed; the same seed gives the same corpus.
+
+    Returns:
+        list[str]: The entry texts.
+    """
+    rng = random.Random(seed)
+    lengths = [sentences for sentences, _ in LENGTH_MIX]
+    weights = [share for _, share in LENGTH_MIX]
+    return [
+        " ".join(sentence(rng) for _ in range(rng.choices(lengths, weights)[0]))
+        for _ in range(size)
+    ]
+
+
+def entry_id(index):
+    """Return the fixed ObjectId of the seeded entry at index."""
+    return ObjectId(f"{index + 1:024x}")
+
+
+def journal_date(index):
+    """Return the journal date of the entry at index, one day apart."""
+    return (date(2025, 1, 1) + timedelta(days=index)).isoformat()
+
+
+def seed_entries(db, corpus, user_id="bench-user"):
+    """Insert the corpus as entries with fixed ids, replacing earlier seeds."""
+    ids = [entry_id(index) for index in range(len(corpus))]
+    db["entries"].delete_many({"_id": {"$in": ids}})
+    db["entries"].insert_many(
+        [
+            {
+                "_id": ids[index],
+                "user_id": user_id,
+                "journal_date": journal_date(index),
+                "text": text,
+            }
+            for index, text in enumerate(corpus)
+        ]
+    )
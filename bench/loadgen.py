@@ -0,0 +1,197 @@
+"""
+Closed-loop load generator for the benchmark scenarios.
+Each virtual user runs in its own thread with its own HTTP session and
+repeats its scenario back to back until the time is up, so the offered
+load is set by the concurrency. Latencies are recorded per step.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+
+import requests
+
+from corpus import entry_id, journal_date
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies):
+    """Return count, mean and p50/p95/p99 of latencies in milliseconds."""
+    values = sorted(latency * 1000 for latency in latencies)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+    }
+
+
+class Recorder:  # pylint: disable=too-few-public-methods
+    """
+    Thread-safe store of step latencies and errors.
+
+    Steps are recorded only while recording is on, i.e. after the warm-up;
+    setup steps such as logging in are always recorded, separately.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.setup = defaultdict(list)
+        self.recording = False
+        self._lock = threading.Lock()
+
+    def timed(self, step, send, setup=False):
+        """
+        Send one request, recording its latency if it succeeded.
+
+        Args:
+            step (str): Step name, e.g. "submit_entry".
+            send (callable): Sends the request and returns the response.
+            setup (bool): Record the step as a per-user setup step.
+
+        Returns:
+            requests.Response or None: None if the request failed.
+        """
+        started = time.perf_counter()
+        try:
+            response = send()
+        except requests.RequestException:
+            response = None
+        elapsed = time.perf_counter() - started
+        failed = response is None or response.status_code >= 400
+        if setup:
+            with self._lock:
+                self.setup[step].append(elapsed)
+        elif self.recording:
+            with self._lock:
+                if failed:
+                    self.errors[step] += 1
+                else:
+                    self.latencies[step].append(elapsed)
+        return None if failed else response
+
+
+def journal_user(base_url, user_index, corpus, recorder, stop):
+    """Sign up and log in, then submit and view entries until stopped."""
+    session = requests.Session()
+    credentials = {"username": f"bench-{time.time_ns()}-{user_index}", "password": "pw"}
+    form = f"{base_url}/login-signup"
+    session.post(form, data={**credentials, "submit": "Sign Up"}, allow_redirects=False)
+    recorder.timed(
+        "login",
+        partial(
+            session.post,
+            form,
+            data={**credentials, "submit": "Login"},
+            allow_redirects=False,
+        ),
+        setup=True,
+    )
+    index = user_index
+    while not stop.is_set():
+        submitted = recorder.timed(
+            "submit_entry",
+            partial(
+                session.post,
+                f"{base_url}/submit-entry",
+                data={
+                    "entry": corpus[index % len(corpus)],
+                    "date": journal_date(index),
+                },
+                allow_redirects=False,
+            ),
+        )
+        if submitted is not None and submitted.headers.get("Location"):
+            location = requests.compat.urljoin(base_url, submitted.headers["Location"])
+            recorder.timed("view_entry", partial(session.get, location))
+        index += 1
+
+
+def analyze_user(base_url, user_index, corpus, recorder, stop):
+    """Post seeded entries to ml-client /analyze until stopped."""
+    session = requests.Session()
+    index = user_index
+    while not stop.is_set():
+        payload = {
+            "entry_id": str(entry_id(index % len(corpus))),
+            "text": corpus[index % len(corpus)],
+        }
+        recorder.timed(
+            "analyze",
+            partial(session.post, f"{base_url}/analyze", json=payload, timeout=30),
+        )
+        index += 1
+
+
+SCENARIOS = {"journal": journal_user, "analyze": analyze_user}
+
+
+def run_scenario(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    name, base_url, corpus, concurrency, duration, warmup=0.0
+):
+    """
+    Run a scenario and summarize it.
+
+    Args:
+        name (str): "journal" (web app) or "analyze" (ml-client).
+        base_url (str): Root URL of the service under test.
+        corpus (list[str]): Entry texts to send.
+        concurrency (int): Number of virtual users.
+        duration (float): Seconds to record for.
+        warmup (float): Seconds to run before recording.
+
+    Returns:
+        dict: Throughput, errors and latency percentiles per step and overall.
+    """
+    recorder = Recorder()
+    stop = threading.Event()
+    users = [
+        threading.Thread(
+            target=SCENARIOS[name],
+            args=(base_url, index, corpus, recorder, stop),
+            daemon=True,
+        )
+        for index in range(concurrency)
+    ]
+    for user in users:
+        user.start()
+    time.sleep(warmup)
+    recorder.recording = True
+    started = time.perf_counter()
+    time.sleep(duration)
+    recorder.recording = False
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for user in users:
+        user.join(timeout=30)
+
+    all_latencies = [
+        latency for values in recorder.latencies.values() for latency in values
+    ]
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests": len(all_latencies),
+        "errors": sum(recorder.errors.values()),
+        "rps": round(len(all_latencies) / elapsed, 3),
+        "latency": summarize(all_latencies),
+        "steps": {
+            step: {**summarize(values), "errors": recorder.errors.get(step, 0)}
+            for step, values in sorted(recorder.latencies.items())
+        },
+        "setup": {
+            step: summarize(values) for step, values in sorted(recorder.setup.items())
+        },
+    }
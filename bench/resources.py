@@ -0,0 +1,77 @@
+"""
+CPU and memory sampling of the services under test.
+A background thread samples each service's process tree (gunicorn master
+and workers included) with psutil while the load runs.
+"""
+
+import threading
+
+import psutil
+
+
+def process_tree(pid):
+    """Return a process and its live descendants."""
+    try:
+        root = psutil.Process(pid)
+        return [root] + root.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return []
+
+
+class ResourceSampler:
+    """
+    Sample CPU and RSS of named process trees at a fixed interval.
+
+    Args:
+        pids (dict[str, int]): Service name -> root process id.
+        interval (float): Seconds between samples.
+    """
+
+    def __init__(self, pids, interval=0.5):
+        self.pids = pids
+        self.interval = interval
+        self.samples = {name: [] for name in pids}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._processes = {}
+
+    def __enter__(self):
+        for name, pid in self.pids.items():
+            self._processes[name] = process_tree(pid)
+            for process in self._processes[name]:
+                # the first cpu_percent call only sets the baseline
+                process.cpu_percent(None)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for name, processes in self._processes.items():
+                cpu, rss = 0.0, 0
+                for process in processes:
+                    try:
+                        cpu += process.cpu_percent(None)
+                        rss += process.memory_info().rss
+                    except psutil.NoSuchProcess:
+                        continue
+                self.samples[name].append((cpu, rss))
+
+    def summary(self):
+        """Return mean and max CPU (% of one core) and max RSS (MiB) per service."""
+        result = {}
+        for name, samples in self.samples.items():
+            if not samples:
+                result[name] = {}
+                continue
+            cpu = [sample[0] for sample in samples]
+            result[name] = {
+                "cpu_mean_pct": round(sum(cpu) / len(cpu), 1),
+                "cpu_max_pct": round(max(cpu), 1),
+                "rss_max_mib": round(max(sample[1] for sample in samples) / 2**20, 1),
+                "samples": len(samples),
+            }
+        return result
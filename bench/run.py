@@ -0,0 +1,298 @@
+"""
+End-to-end benchmark of the journaling flow:
+
+    python bench/run.py --concurrency 1 8 --duration 20
+
+Starts the web app and ml-client (or targets running ones with --web-url and
+--ml-url), then drives two closed-loop scenarios at each concurrency level:
+
+    journal   web app: login_signup, then submit_entry -> view_entry
+    analyze   ml-client: POST /analyze with entries from the synthetic corpus
+
+It reports requests per second, p50/p95/p99 latency per step, and CPU and
+RSS per service, and writes everything to bench/results/ as JSON so runs can
+be compared between commits with bench/compare.py.
+
+By default it runs fully offline: MongoDB is an in-memory stand-in (mongomock,
+see serve.py) and the model is a tiny random one built from the corpus
+(tiny_model.py). Each service then has its own in-memory data, so no analysis
+worker can see the web app's queue: submitted entries stay pending and the
+journal scenario measures pending entry pages only, which the report notes.
+Use --mongo mongod to start a throwaway local mongod, or --mongo HOST:PORT
+for an existing server; the services then run under gunicorn as in
+production, with the analysis worker (worker.py) analyzing submitted entries
+as they are viewed. --model real uses the configured model instead.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import pymongo
+import requests
+
+from corpus import make_corpus, seed_entries
+from loadgen import run_scenario
+from resources import ResourceSampler
+from tiny_model import build_tiny_model
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+BENCH_DB = "feelwrite_bench"
+
+
+def free_port():
+    """Return a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_revision():
+    """Return the current commit and whether the tree has local changes."""
+
+    def git(*args):
+        return subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True, check=False
+        ).stdout.strip()
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain")),
+    }
+
+
+def wait_until(url, timeout, process=None):
+    """Poll url until it answers 200, failing early if process exits."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"service exited with {process.returncode} before {url}")
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def start_mongod(workdir):
+    """Start a throwaway mongod on a free port; returns (process, host, port)."""
+    binary = os.getenv("MONGOD") or shutil.which("mongod")
+    if not binary:
+        raise RuntimeError("mongod not found; set MONGOD or use --mongo memory")
+    port = free_port()
+    dbpath = os.path.join(workdir, "db")
+    os.makedirs(dbpath)
+    process = subprocess.Popen(  # pylint: disable=consider-using-with
+        [binary, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1"],
+        stdout=subprocess.DEVNULL,
+    )
+    client = pymongo.MongoClient("127.0.0.1", port, serverSelectionTimeoutMS=30000)
+    client.admin.command("ping")
+    return process, "127.0.0.1", port
+
+
+class Services:
+    """Start, wait for and stop the services under test."""
+
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.processes = {}
+        self.urls = {"web": args.web_url, "ml": args.ml_url}
+
+    def journal_analysis(self):
+        """How entries submitted by the journal scenario get analyzed."""
+        if self.args.web_url:
+            return "external"
+        if self.args.mongo == "memory":
+            return "pending-only"
+        return "worker"
+
+    def environment(self, mongo_host, mongo_port):
+        """Environment shared by both services."""
+        env = dict(
+            os.environ,
+            MONGO_HOST=mongo_host,
+            MONGO_PORT=str(mongo_port),
+            MONGO_DB=BENCH_DB,
+            SECRET_KEY="bench",
+            LOG_LEVEL="WARNING",
+            ASYNC_ANALYSIS="true",
+            MODEL_PRELOAD="background",
+        )
+        if self.args.model == "tiny":
+            model_dir = os.path.join(self.workdir, "tiny-model")
+            build_tiny_model(model_dir)
+            env["MODEL_SNAPSHOT_DIR"] = model_dir
+        return env
+
+    def start(self, corpus):
+        """Start whichever services weren't given by URL."""
+        mongo_host, mongo_port = "127.0.0.1", 27017
+        if self.args.mongo == "mongod":
+            mongod, mongo_host, mongo_port = start_mongod(self.workdir)
+            self.processes["mongod"] = mongod
+        elif self.args.mongo != "memory":
+            mongo_host, _, port = self.args.mongo.partition(":")
+            mongo_port = int(port or 27017)
+        if self.args.mongo != "memory":
+            seed_entries(pymongo.MongoClient(mongo_host, mongo_port)[BENCH_DB], corpus)
+
+        env = self.environment(mongo_host, mongo_port)
+        for service, directory, app in (
+            ("web", "web-app", "app:app"),
+            ("ml", "machine-learning-client", "ml_client:app"),
+        ):
+            if self.urls[service]:
+                continue
+            port = free_port()
+            if self.args.mongo == "memory":
+                command = [sys.executable, os.path.join(BENCH_DIR, "serve.py"), service]
+                command += ["--port", str(port), "--seed", str(len(corpus))]
+                cwd = BENCH_DIR
+            else:
+                command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py"]
+                command.append(app)
+                cwd = os.path.join(ROOT, directory)
+            self.processes[service] = (
+                subprocess.Popen(  # pylint: disable=consider-using-with
+                    command, cwd=cwd, env=dict(env, PORT=str(port))
+                )
+            )
+            self.urls[service] = f"http://127.0.0.1:{port}"
+
+        if self.journal_analysis() == "worker":
+            # drains the analysis jobs the journal scenario's entries queue
+            self.processes["worker"] = (
+                subprocess.Popen(  # pylint: disable=consider-using-with
+                    [sys.executable, "worker.py"],
+                    cwd=os.path.join(ROOT, "machine-learning-client"),
+                    env=env,
+                )
+            )
+
+        if "web" in self.processes:
+            wait_until(f"{self.urls['web']}/login-signup", 60, self.processes["web"])
+        if "ml" in self.processes:
+            wait_until(f"{self.urls['ml']}/readyz", 600, self.processes["ml"])
+
+    def pids(self):
+        """Root process id of each service started here."""
+        names = {"web": "web-app", "ml": "ml-client", "worker": "ml-worker"}
+        return {
+            names[service]: process.pid
+            for service, process in self.processes.items()
+            if service in names
+        }
+
+    def stop(self):
+        """Stop every process started here."""
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    """Run the benchmark and write the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=["journal", "analyze"],
+        choices=["journal", "analyze"],
+    )
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--duration", type=float, default=20, help="seconds per run")
+    parser.add_argument(
+        "--warmup", type=float, default=3, help="seconds before recording"
+    )
+    parser.add_argument("--corpus-size", type=int, default=200)
+    parser.add_argument("--mongo", default="memory", help="memory, mongod or HOST:PORT")
+    parser.add_argument("--model", default="tiny", choices=["tiny", "real"])
+    parser.add_argument("--web-url", help="benchmark a running web app")
+    parser.add_argument("--ml-url", help="benchmark a running ml-client")
+    parser.add_argument(
+        "--label", default="", help="free-form note stored with results"
+    )
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results"))
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.corpus_size)
+    targets = {"journal": "web", "analyze": "ml"}
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "label": args.label,
+        "git": git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "label")
+        },
+        "runs": [],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        services = Services(args, workdir)
+        try:
+            services.start(corpus)
+            for scenario in args.scenarios:
+                for concurrency in args.concurrency:
+                    with ResourceSampler(services.pids()) as sampler:
+                        run = run_scenario(
+                            scenario,
+                            services.urls[targets[scenario]],
+                            corpus,
+                            concurrency,
+                            args.duration,
+                            args.warmup,
+                        )
+                    run["scenario"] = scenario
+                    run["resources"] = sampler.summary()
+                    if scenario == "journal":
+                        run["analysis"] = services.journal_analysis()
+                    results["runs"].append(run)
+                    print(
+                        f"{scenario:8} c={concurrency:<3} {run['rps']:9.1f} req/s  "
+                        f"p50 {run['latency'].get('p50_ms')} ms  "
+                        f"p95 {run['latency'].get('p95_ms')} ms  "
+                        f"p99 {run['latency'].get('p99_ms')} ms  "
+                        f"errors {run['errors']}"
+                        + (
+                            "  (pending pages only)"
+                            if run.get("analysis") == "pending-only"
+                            else ""
+                        )
+                    )
+        finally:
+            services.stop()
+
+    os.makedirs(args.output, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(args.output, f"{stamp}-{results['git']['commit'][:8]}.json")
+    with open(path, "w", encoding="utf-8") as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
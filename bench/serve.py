@@ -0,0 +1,68 @@
+"""
+Serve one FeelWrite service against an in-memory MongoDB stand-in:
+
+    python bench/serve.py web --port 5100
+    python bench/serve.py ml --port 5101 --seed 200
+
+pymongo.MongoClient is replaced by mongomock before the service is imported,
+so no MongoDB server is needed. Each process has its own in-memory database,
+so the ml-client is seeded with the benchmark corpus (--seed) for /analyze to
+find. The app is served by werkzeug's threaded server in a single process,
+because separate gunicorn workers would not share the in-memory data; with a
+real MongoDB the benchmark runs the services under gunicorn instead.
+mongomock doesn't support every operation the services use (for example the
+mood rollup bulk upserts with recent pymongo versions); the services log
+those failures and carry on, so absolute numbers are only comparable between
+runs of the same mode.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+import mongomock
+import pymongo
+from werkzeug.serving import run_simple
+
+from corpus import make_corpus, seed_entries
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICES = {
+    "web": ("web-app", "app", "app"),
+    "ml": ("machine-learning-client", "ml_client", "app"),
+}
+
+
+def use_memory_mongo():
+    """Make every MongoClient created from now on share one in-memory server."""
+    shared = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: shared
+    return shared
+
+
+def main():
+    """Seed the in-memory database if asked and serve the service."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("service", choices=sorted(SERVICES))
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--seed", type=int, default=0, help="corpus entries to seed")
+    args = parser.parse_args()
+
+    directory, module_name, attribute = SERVICES[args.service]
+    client = use_memory_mongo()
+    if args.seed:
+        seed_entries(client[os.getenv("MONGO_DB", "ml_app_db")], make_corpus(args.seed))
+
+    service_dir = os.path.join(ROOT, directory)
+    sys.path.insert(0, service_dir)
+    os.chdir(service_dir)
+    module = __import__(module_name)
+    if hasattr(module, "start_model_loading"):
+        module.start_model_loading()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    run_simple("127.0.0.1", args.port, getattr(module, attribute), threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Build a tiny, randomly initialized sentiment model for offline benchmarks:
+
+    python bench/tiny_model.py --output bench/models/tiny
+
+The model has the same RoBERTa architecture and input pipeline as the real
+one but only a few layers, and its byte-level BPE tokenizer is trained on the
+synthetic corpus, so nothing is downloaded. The directory is written as a
+snapshot that ml-client loads through MODEL_SNAPSHOT_DIR. Its scores are
+meaningless; use it to measure the service around the model, not accuracy.
+"""
+
+import argparse
+import os
+
+from corpus import make_corpus
+
+# ml-client only loads a snapshot that records the model version it expects
+DEFAULT_VERSION = "cardiffnlp/twitter-roberta-base-sentiment@main"
+SPECIAL_TOKENS = ["<s>", "<pad>", "</s>", "<unk>", "<mask>"]
+
+
+def build_tiny_model(output, model_version=DEFAULT_VERSION, hidden_size=64, layers=2):
+    """Train a small tokenizer on the corpus and save a tiny model snapshot."""
+    # pylint: disable=import-outside-toplevel
+    from tokenizers import ByteLevelBPETokenizer
+    from transformers import (
+        RobertaConfig,
+        RobertaForSequenceClassification,
+        RobertaTokenizerFast,
+    )
+
+    os.makedirs(output, exist_ok=True)
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(
+        make_corpus(500), vocab_size=2000, special_tokens=SPECIAL_TOKENS
+    )
+    bpe.save_model(output)
+    tokenizer = RobertaTokenizerFast(
+        vocab_file=os.path.join(output, "vocab.json"),
+        merges_file=os.path.join(output, "merges.txt"),
+    )
+    tokenizer.save_pretrained(output)
+
+    config = RobertaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        num_hidden_layers=layers,
+        num_attention_heads=2,
+        intermediate_size=hidden_size * 2,
+        max_position_embeddings=514,
+        num_labels=3,
+        pad_token_id=tokenizer.pad_token_id,
+    )
+    RobertaForSequenceClassification(config).save_pretrained(
+        output, safe_serialization=True
+    )
+    with open(
+        os.path.join(output, "model_version.txt"), "w", encoding="utf-8"
+    ) as version_file:
+        version_file.write(model_version)
+
+
+def main():
+    """Build the tiny model snapshot."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", default="bench/models/tiny")
+    parser.add_argument("--model-version", default=DEFAULT_VERSION)
+    args = parser.parse_args()
+    build_tiny_model(args.output, args.model_version)
+    print(f"Saved tiny model to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
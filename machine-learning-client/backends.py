@@ -0,0 +1,119 @@
+"""
+Selectable inference backends for the sentiment model.
+Every backend takes the tokenizer's encoded batch and returns a tensor of
+raw logits with one row per text, so analyze_sentiment's output contract
+is the same whichever backend is configured. forward() also returns each
+text's mean-pooled final hidden state, the embedding used to find similar
+entries:
+
+- "torch": the FP32 PyTorch model (default)
+- "torch-int8": the PyTorch model with dynamically quantized INT8 linear layers
+- "onnx": an ONNX Runtime session over a model exported by export_model.py
+"""
+
+import os
+
+import torch
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+
+def mean_pool(hidden, attention_mask):
+    """Average [N, tokens, hidden] states over the unpadded tokens of each row."""
+    mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+    return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+
+
+class TorchBackend:
+    """Run the PyTorch sequence-classification model."""
+
+    def __init__(self, model):
+        self.model = model.eval()
+
+    def __call__(self, encoded):
+        with torch.no_grad():
+            return self.model(**encoded)[0]
+
+    def forward(self, encoded):
+        """Return (logits, [N, hidden] mean-pooled embeddings)."""
+        with torch.no_grad():
+            output = self.model(**encoded, output_hidden_states=True)
+        pooled = mean_pool(output.hidden_states[-1], encoded["attention_mask"])
+        return output.logits, pooled
+
+
+class OnnxBackend:
+    """
+    Run an exported model with ONNX Runtime on the CPU.
+
+    Models exported before the "embedding" output was added still work, but
+    forward() returns no embeddings for them.
+    """
+
+    def __init__(self, path, num_threads=None):
+        try:
+            import onnxruntime  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise RuntimeError(
+                "INFERENCE_BACKEND=onnx requires the onnxruntime package"
+            ) from e
+        if not os.path.exists(path):
+            raise RuntimeError(
+                f"ONNX model not found at {path}; run export_model.py first"
+            )
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [
+            model_input.name for model_input in self.session.get_inputs()
+        ]
+        self.has_embedding = any(
+            output.name == "embedding" for output in self.session.get_outputs()
+        )
+
+    def __call__(self, encoded):
+        feed = {name: encoded[name].numpy() for name in self.input_names}
+        (logits,) = self.session.run(["logits"], feed)
+        return torch.from_numpy(logits)
+
+    def forward(self, encoded):
+        """Return (logits, [N, hidden] embeddings or None)."""
+        if not self.has_embedding:
+            return self(encoded), None
+        feed = {name: encoded[name].numpy() for name in self.input_names}
+        logits, pooled = self.session.run(["logits", "embedding"], feed)
+        return torch.from_numpy(logits), torch.from_numpy(pooled)
+
+
+def quantize_dynamic(model):
+    """Return a copy of the model with INT8 dynamically quantized linear layers."""
+    return torch.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def load_backend(name, model_loader, onnx_path=None, num_threads=None):
+    """
+    Create the inference backend selected by name.
+
+    Args:
+        name (str): One of BACKENDS.
+        model_loader (callable): Returns the FP32 PyTorch model; only called by
+            the backends that need it.
+        onnx_path (str, optional): Path of the exported ONNX model.
+        num_threads (int, optional): Intra-op threads for ONNX Runtime.
+
+    Returns:
+        callable: Maps an encoded batch to a tensor of logits; its forward()
+        method also returns the pooled embeddings.
+    """
+    if name == "torch":
+        return TorchBackend(model_loader())
+    if name == "torch-int8":
+        return TorchBackend(quantize_dynamic(model_loader()))
+    if name == "onnx":
+        return OnnxBackend(onnx_path, num_threads)
+    raise ValueError(f"Unknown inference backend {name!r}; expected one of {BACKENDS}")
@@ -0,0 +1,140 @@
+"""
+Dynamic micro-batching for model inference.
+Concurrent callers submit single items; a background thread gathers them
+into one batch (bounded by a maximum size and a maximum wait) and runs a
+single batched call, then hands each caller its own result.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Buckets for the number of items per batch
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class MicroBatcher:  # pylint: disable=too-many-instance-attributes,too-few-public-methods
+    """
+    Gather concurrently submitted items into batches for a batched function.
+
+    Args:
+        process_batch (callable): Function taking a list of items and returning
+            a list of results in the same order, one per item.
+        max_batch_size (int): Largest number of items processed in one call.
+        max_wait_ms (float): Longest time the first item of a batch waits for
+            more items to arrive before the batch is processed anyway.
+        name (str): Name used as a prefix for the batcher's metrics.
+    """
+
+    def __init__(self, process_batch, max_batch_size=16, max_wait_ms=10, name="batch"):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._closed = False
+        self._drained = threading.Condition()
+        self.batch_size_hist = metrics.histogram(
+            f"{name}_batch_size", "Number of items per batch", BATCH_SIZE_BUCKETS
+        )
+        self.queue_wait_hist = metrics.histogram(
+            f"{name}_queue_wait_seconds",
+            "Time items wait in the queue before processing",
+        )
+
+    def submit(self, item):
+        """
+        Queue an item for the next batch.
+
+        Args:
+            item: The item to process.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the item's result, or raises
+            the exception raised by the batched function.
+
+        Raises:
+            RuntimeError: If the batcher has been shut down.
+        """
+        with self._drained:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is shut down")
+            self._pending += 1
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.monotonic()))
+        return future
+
+    def shutdown(self, timeout=None):
+        """
+        Stop accepting items and wait for queued and running batches to finish.
+
+        Args:
+            timeout (float, optional): Longest time to wait, in seconds.
+
+        Returns:
+            bool: True if every submitted item was processed.
+        """
+        with self._drained:
+            self._closed = True
+            return self._drained.wait_for(lambda: self._pending == 0, timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="micro-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self):
+        """Block for the first item, then gather more until the batch is full or due."""
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            self.batch_size_hist.observe(len(batch))
+            for _, _, enqueued_at in batch:
+                self.queue_wait_hist.observe(started - enqueued_at)
+            self._process(batch)
+
+    def _process(self, batch):
+        items = [item for item, _, _ in batch]
+        try:
+            results = list(self.process_batch(items))
+            if len(results) != len(items):
+                # zip would leave the callers of the missing results waiting
+                raise ValueError(f"expected {len(items)} results, got {len(results)}")
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error("* MicroBatcher: batch of %d failed: %s", len(batch), e)
+            for _, future, _ in batch:
+                future.set_exception(e)
+        else:
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+        with self._drained:
+            self._pending -= len(batch)
+            self._drained.notify_all()
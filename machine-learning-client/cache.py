@@ -0,0 +1,204 @@
+"""
+Content-hash cache for sentiment results and the embeddings computed with them.
+Results are keyed by a hash of the exact text and the model version,
+held in an in-process LRU with size and TTL limits, and optionally
+persisted in a MongoDB collection shared by every ml-client process.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Server error code for an index that exists with other options
+INDEX_OPTIONS_CONFLICT = 85
+
+
+# Settings, LRU state and one metric per lookup outcome are kept on the cache
+# itself, which is more attributes than pylint allows by default
+class SentimentCache:  # pylint: disable=too-many-instance-attributes
+    """
+    Two-tier LRU cache of sentiment results.
+
+    Args:
+        namespace (str): Model name and revision; part of every key, so results
+            from another model version are never returned.
+        max_size (int): Maximum number of results kept in process memory.
+        ttl_seconds (float): How long a result stays valid in either tier.
+        collection (pymongo.collection.Collection, optional): Collection used as
+            the persistent tier. Entries from other model versions are removed
+            from it the first time it is used.
+    """
+
+    def __init__(self, namespace, max_size=1024, ttl_seconds=86400, collection=None):
+        self.namespace = namespace
+        self.max_size = max(0, int(max_size))
+        self.ttl = float(ttl_seconds)
+        self.collection = collection
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._collection_ready = False
+        self.hits = metrics.counter(
+            "sentiment_cache_hits_total", "Sentiment results served from the cache"
+        )
+        self.mongo_hits = metrics.counter(
+            "sentiment_cache_mongo_hits_total",
+            "Sentiment results served from the persistent cache tier",
+        )
+        self.misses = metrics.counter(
+            "sentiment_cache_misses_total", "Sentiment lookups not found in the cache"
+        )
+        self.evictions = metrics.counter(
+            "sentiment_cache_evictions_total",
+            "Cached results removed for size or age",
+        )
+
+    def key(self, text):
+        """
+        Return the cache key for a text under this cache's model version.
+
+        The text isn't normalized: whitespace, line endings and unicode form
+        all change the model's tokens, and so its scores.
+        """
+        payload = f"{self.namespace}\0{text}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, text):
+        """
+        Look up the cached sentiment scores for a text.
+
+        Returns:
+            dict or None: A copy of the cached sentiment scores, or None on a miss.
+        """
+        result = self.lookup(text)
+        return result[0] if result is not None else None
+
+    def lookup(self, text):
+        """
+        Look up the cached result for a text with its embedding.
+
+        Returns:
+            tuple or None: A copy of the cached sentiment scores and the
+            embedding stored with them (None if the backend produced none),
+            or None on a miss.
+        """
+        key = self.key(text)
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                scores, vector, expires_at = item
+                if expires_at > now:
+                    self._items.move_to_end(key)
+                    self.hits.inc()
+                    return dict(scores), vector
+                del self._items[key]
+                self.evictions.inc()
+
+        doc = self._get_persistent(key)
+        if doc is not None:
+            self.hits.inc()
+            self.mongo_hits.inc()
+            self._set_local(key, doc["scores"], doc["vector"])
+            return dict(doc["scores"]), doc["vector"]
+
+        self.misses.inc()
+        return None
+
+    def set(self, text, scores, vector=None):
+        """Store the sentiment scores and embedding computed for a text in both tiers."""
+        key = self.key(text)
+        self._set_local(key, scores, vector)
+        self._set_persistent(key, scores, vector)
+
+    def clear(self):
+        """Remove every result from the in-process tier."""
+        with self._lock:
+            self._items.clear()
+
+    def _set_local(self, key, scores, vector):
+        if self.max_size == 0:
+            return
+        with self._lock:
+            self._items[key] = (dict(scores), vector, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions.inc()
+
+    def _prepare_collection(self):
+        """Create the TTL index and drop results from other model versions, once."""
+        if self._collection_ready:
+            return
+        self._ensure_ttl_index()
+        removed = self.collection.delete_many({"model": {"$ne": self.namespace}})
+        if removed.deleted_count:
+            logger.info(
+                "* SentimentCache: invalidated %d results from other model versions",
+                removed.deleted_count,
+            )
+        self._collection_ready = True
+
+    def _ensure_ttl_index(self):
+        """Create the TTL index, or change its TTL if CACHE_TTL_SECONDS changed."""
+        ttl = int(self.ttl)
+        try:
+            self.collection.create_index("created_at", expireAfterSeconds=ttl)
+        except OperationFailure as e:
+            if e.code != INDEX_OPTIONS_CONFLICT:
+                raise
+            logger.info(
+                "* SentimentCache: changing the TTL of %s to %ds: %s",
+                self.collection.name,
+                ttl,
+                e,
+            )
+            self.collection.database.command(
+                "collMod",
+                self.collection.name,
+                index={"keyPattern": {"created_at": 1}, "expireAfterSeconds": ttl},
+            )
+
+    def _get_persistent(self, key):
+        if self.collection is None:
+            return None
+        try:
+            self._prepare_collection()
+            # results stored before embeddings were cached have no vector
+            # field and are recomputed so their entries get an embedding
+            doc = self.collection.find_one(
+                {"_id": key, "model": self.namespace, "vector": {"$exists": True}},
+                {"scores": 1, "vector": 1},
+            )
+        except PyMongoError as e:
+            logger.warning("* SentimentCache: persistent lookup failed: %s", e)
+            return None
+        return doc
+
+    def _set_persistent(self, key, scores, vector):
+        if self.collection is None:
+            return
+        try:
+            self._prepare_collection()
+            self.collection.update_one(
+                {"_id": key},
+                {
+                    "$set": {
+                        "model": self.namespace,
+                        "scores": scores,
+                        "vector": vector,
+                        "created_at": datetime.now(timezone.utc),
+                    }
+                },
+                upsert=True,
+            )
+        except PyMongoError as e:
+            logger.warning("* SentimentCache: persistent write failed: %s", e)
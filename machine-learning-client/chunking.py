@@ -0,0 +1,216 @@
+"""
+Sliding-window chunking and length bucketing for batched inference.
+Entries longer than the model's input limit are split into overlapping
+token windows, and each entry's probabilities are the length-weighted mean
+of its windows' probabilities. The windows of a batch are sorted by length
+and grouped into buckets that are padded separately, so short entries
+aren't padded to the length of the longest one; results are put back in
+request order after the forward passes.
+"""
+
+import numpy as np
+import torch
+
+import metrics
+
+# Histogram buckets for the token length of analyzed texts
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+input_tokens_hist = metrics.histogram(
+    "analyze_input_tokens", "Token length of analyzed texts", TOKEN_BUCKETS
+)
+chunked_texts = metrics.counter(
+    "analyze_chunked_texts_total", "Texts split into more than one window"
+)
+padding_waste_hist = metrics.histogram(
+    "analyze_padding_waste_ratio",
+    "Share of the tokens in a batch's forward passes that are padding",
+    (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9),
+)
+
+
+def window_starts(length, window_size, stride, max_windows):
+    """
+    Return the start offsets of the windows over a sequence.
+
+    Windows advance by stride tokens and the last one is aligned with the end
+    of the sequence, so together they cover every token. If more than
+    max_windows would be needed, max_windows windows are spread evenly from
+    the start to the end of the sequence instead. That bounds the worst-case
+    cost, but the tokens between those windows are not scored at all.
+    """
+    if length <= window_size:
+        return [0]
+    last = length - window_size
+    starts = list(range(0, last, stride)) + [last]
+    if len(starts) > max_windows:
+        starts = np.linspace(0, last, num=max_windows).round().astype(int).tolist()
+    return starts
+
+
+def split_windows(tokenizer, texts, window_size, overlap, max_windows):
+    """
+    Tokenize texts in batch mode and split each into overlapping windows.
+
+    Args:
+        tokenizer: A Hugging Face tokenizer for a model whose inputs are framed
+            by cls and sep tokens, such as RoBERTa's <s> ... </s>.
+        texts (list[str]): The texts to encode.
+        window_size (int): Content tokens per window, excluding special tokens.
+        overlap (int): Tokens shared by consecutive windows.
+        max_windows (int): Cap on windows per text.
+
+    Returns:
+        tuple[list, list[int], list[int]]: The token ids of every window framed
+        by special tokens, the index of the text each window belongs to, and
+        the number of content tokens in each window.
+    """
+    stride = max(1, window_size - overlap)
+    token_ids = tokenizer(texts, add_special_tokens=False)["input_ids"]
+    windows, owners, lengths = [], [], []
+    for index, ids in enumerate(token_ids):
+        input_tokens_hist.observe(len(ids))
+        starts = window_starts(len(ids), window_size, stride, max_windows)
+        if len(starts) > 1:
+            chunked_texts.inc()
+        for start in starts:
+            window = ids[start : start + window_size]
+            windows.append([tokenizer.cls_token_id] + window + [tokenizer.sep_token_id])
+            owners.append(index)
+            lengths.append(max(1, len(window)))
+    return windows, owners, lengths
+
+
+def encode_windows(tokenizer, texts, window_size, overlap, max_windows):
+    """
+    Split texts into windows and pad all of them into a single batch.
+
+    Returns:
+        tuple[dict, list[int], list[int]]: The padded batch of all windows
+        (input_ids and attention_mask tensors), the index of the text each
+        window belongs to, and the number of content tokens in each window.
+    """
+    windows, owners, lengths = split_windows(
+        tokenizer, texts, window_size, overlap, max_windows
+    )
+    return pad_windows(windows, tokenizer.pad_token_id), owners, lengths
+
+
+def bucket_by_length(windows, max_bucket_tokens):
+    """
+    Group windows of similar length, shortest first.
+
+    Windows are sorted by length and a bucket is closed when padding one more
+    window to the bucket's longest length would exceed max_bucket_tokens, so
+    every bucket's padded batch stays within the token budget (a single
+    window longer than the budget gets a bucket of its own).
+
+    Returns:
+        list[list[int]]: The window indices of each bucket.
+    """
+    buckets, current = [], []
+    for index in sorted(range(len(windows)), key=lambda index: len(windows[index])):
+        if current and (len(current) + 1) * len(windows[index]) > max_bucket_tokens:
+            buckets.append(current)
+            current = []
+        current.append(index)
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+def encode_buckets(
+    tokenizer, texts, window_size, overlap, max_windows, max_bucket_tokens
+):  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """
+    Split texts into windows and pad them in length buckets.
+
+    Records the share of padding tokens over all buckets in the
+    analyze_padding_waste_ratio histogram.
+
+    Returns:
+        tuple[list, list[int], list[int]]: (window indices, padded batch) of
+        each bucket, and the owner and content length of each window as
+        returned by split_windows.
+    """
+    windows, owners, lengths = split_windows(
+        tokenizer, texts, window_size, overlap, max_windows
+    )
+    buckets = []
+    real_tokens = padded_tokens = 0
+    for indices in bucket_by_length(windows, max_bucket_tokens):
+        bucket = [windows[index] for index in indices]
+        encoded = pad_windows(bucket, tokenizer.pad_token_id)
+        buckets.append((indices, encoded))
+        real_tokens += sum(len(window) for window in bucket)
+        padded_tokens += encoded["input_ids"].numel()
+    if padded_tokens:
+        padding_waste_hist.observe(1 - real_tokens / padded_tokens)
+    return buckets, owners, lengths
+
+
+def forward_buckets(backend, buckets, count):
+    """
+    Run the backend on each bucket and return its outputs in window order.
+
+    Args:
+        backend (callable): Maps a padded batch to [windows, classes] logits,
+            or to a tuple of [windows, ...] tensors (None for a missing output).
+        buckets (list): (window indices, padded batch) pairs.
+        count (int): Total number of windows.
+
+    Returns:
+        torch.Tensor or tuple: [count, classes] logits, or a tuple of outputs
+        like the backend's.
+    """
+    outputs = None
+    single = False
+    for indices, encoded in buckets:
+        bucket_outputs = backend(encoded)
+        if isinstance(bucket_outputs, torch.Tensor):
+            single, bucket_outputs = True, (bucket_outputs,)
+        if outputs is None:
+            outputs = [
+                None if output is None else output.new_empty((count, *output.shape[1:]))
+                for output in bucket_outputs
+            ]
+        rows = torch.tensor(indices)
+        for output, bucket_output in zip(outputs, bucket_outputs):
+            if output is not None:
+                output[rows] = bucket_output.detach()
+    return outputs[0] if single else tuple(outputs)
+
+
+def pad_windows(windows, pad_token_id):
+    """Pad token id lists to the longest one and build the attention mask."""
+    width = max(len(window) for window in windows)
+    input_ids = torch.full((len(windows), width), pad_token_id)
+    attention_mask = torch.zeros((len(windows), width), dtype=torch.long)
+    for row, window in enumerate(windows):
+        input_ids[row, : len(window)] = torch.tensor(window)
+        attention_mask[row, : len(window)] = 1
+    return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+
+def aggregate_windows(probabilities, owners, lengths, count):
+    """
+    Combine window probabilities into one row per text, weighted by length.
+
+    Args:
+        probabilities (torch.Tensor): [windows, classes] probabilities.
+        owners (list[int]): Text index of each window.
+        lengths (list[int]): Token count of each window, used as its weight.
+        count (int): Number of texts.
+
+    Returns:
+        torch.Tensor: [count, classes] probabilities.
+    """
+    if len(owners) == count:
+        return probabilities
+    index = torch.tensor(owners)
+    weights = torch.tensor(lengths, dtype=probabilities.dtype)
+    totals = torch.zeros((count, probabilities.shape[1]), dtype=probabilities.dtype)
+    totals.index_add_(0, index, probabilities * weights[:, None])
+    weight_sums = torch.zeros(count, dtype=probabilities.dtype)
+    weight_sums.index_add_(0, index, weights)
+    return totals / weight_sums[:, None]
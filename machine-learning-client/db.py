@@ -1,11 +1,10 @@
 """MongoDB connection setup using environment variables."""
 
 import os
-from pymongo import MongoClient
 
-MONGO_HOST = os.getenv("MONGO_HOST")
-MONGO_PORT = int(os.getenv("MONGO_PORT"))
+from mongo_settings import create_client
+
 MONGO_DB = os.getenv("MONGO_DB")
 
-client = MongoClient(host=MONGO_HOST, port=MONGO_PORT)
+client = create_client()
 db = client[MONGO_DB]
@@ -0,0 +1,56 @@
+"""
+Compact entry embeddings for the similar-entries search.
+Each analyzed entry's embedding is the length-weighted mean of its windows'
+mean-pooled final hidden states, L2-normalized so that a dot product is the
+cosine similarity, and stored as float16 bytes (1.5 KB for a 768-dimension
+model) in the entry_embeddings collection:
+
+    {_id: entry ObjectId, user_id, journal_date, model, vector: float16 bytes}
+"""
+
+import numpy as np
+import torch
+
+from chunking import aggregate_windows
+
+EMBEDDING_DTYPE = np.float16
+
+
+def encode_embeddings(pooled, owners, lengths, count):
+    """
+    Combine window embeddings into one normalized float16 vector per text.
+
+    Args:
+        pooled (torch.Tensor): [windows, hidden] mean-pooled hidden states.
+        owners (list[int]): Text index of each window.
+        lengths (list[int]): Token count of each window.
+        count (int): Number of texts.
+
+    Returns:
+        list[bytes]: One float16 vector per text.
+    """
+    vectors = aggregate_windows(pooled.float(), owners, lengths, count)
+    vectors = torch.nn.functional.normalize(vectors, dim=1)
+    return [row.tobytes() for row in vectors.numpy().astype(EMBEDDING_DTYPE)]
+
+
+def decode_embedding(data):
+    """Return a stored embedding as a float16 array."""
+    return np.frombuffer(data, dtype=EMBEDDING_DTYPE)
+
+
+def embedding_document(entry, vector, model):
+    """
+    Return the $set of an entry's embedding document.
+
+    Args:
+        entry (dict): The entry's user_id and journal_date.
+        vector (bytes): The encoded embedding.
+        model (str): Model version that produced it.
+    """
+    return {
+        "user_id": entry.get("user_id"),
+        "journal_date": entry.get("journal_date"),
+        "model": model,
+        "vector": vector,
+    }
@@ -0,0 +1,108 @@
+"""
+Prepare model artifacts for fast, offline loading.
+Run once per model version, for example in the Docker build:
+
+    python export_model.py snapshot --output models/snapshot
+    python export_model.py onnx --output models
+
+`snapshot` saves the tokenizer and model as safetensors in a local directory
+that ml-client loads from instead of the Hugging Face Hub (MODEL_SNAPSHOT_DIR).
+`onnx` writes <output>/model.onnx (FP32) and <output>/model.int8.onnx
+(dynamically quantized weights) for the onnx inference backend; both output
+the logits and the mean-pooled embedding.
+"""
+
+import argparse
+import os
+
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from backends import mean_pool
+from model_registry import save_snapshot
+
+OPSET_VERSION = 17
+
+
+class LogitsAndEmbedding(torch.nn.Module):
+    """Export wrapper returning the logits and the mean-pooled last hidden state."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        """Return (logits, [batch, hidden] embedding)."""
+        output = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            output_hidden_states=True,
+        )
+        return output.logits, mean_pool(output.hidden_states[-1], attention_mask)
+
+
+def export_onnx(model, tokenizer, path):
+    """Export the model to ONNX with dynamic batch and sequence dimensions."""
+    sample = tokenizer(
+        ["A sample journal entry", "Another one"], return_tensors="pt", padding=True
+    )
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "sequence"},
+        "logits": {0: "batch"},
+        "embedding": {0: "batch"},
+    }
+    with torch.no_grad():
+        torch.onnx.export(
+            LogitsAndEmbedding(model),
+            (sample["input_ids"], sample["attention_mask"]),
+            path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits", "embedding"],
+            dynamic_axes=dynamic_axes,
+            opset_version=OPSET_VERSION,
+            dynamo=False,
+        )
+
+
+def quantize_onnx(source, target):
+    """Quantize the weights of an ONNX model to INT8."""
+    # pylint: disable=import-outside-toplevel
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+
+
+def main():
+    """Export the model named by MODEL_NAME/MODEL_REVISION."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("artifact", choices=["snapshot", "onnx"])
+    parser.add_argument("--output", default="models", help="output directory")
+    parser.add_argument(
+        "--model",
+        default=os.getenv("MODEL_NAME", "cardiffnlp/twitter-roberta-base-sentiment"),
+    )
+    parser.add_argument("--revision", default=os.getenv("MODEL_REVISION", "main"))
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model, revision=args.revision)
+    model = AutoModelForSequenceClassification.from_pretrained(
+        args.model, revision=args.revision
+    ).eval()
+
+    if args.artifact == "snapshot":
+        save_snapshot(tokenizer, model, args.output, f"{args.model}@{args.revision}")
+        print(f"Saved snapshot to {args.output}")
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+    fp32_path = os.path.join(args.output, "model.onnx")
+    int8_path = os.path.join(args.output, "model.int8.onnx")
+    export_onnx(model, tokenizer, fp32_path)
+    print(f"Exported {fp32_path}")
+    quantize_onnx(fp32_path, int8_path)
+    print(f"Quantized {int8_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Gunicorn settings for serving ml-client in production:
+
+    gunicorn -c gunicorn_config.py ml_client:app
+
+Worker processes, threads and timeouts are read from the environment.
+Inference threads are divided among the worker processes so that they
+don't oversubscribe the CPU cores, and workers drain in-flight analyses
+before exiting on shutdown.
+"""
+
+import os
+
+# gunicorn reads these lowercase module-level settings by name
+# pylint: disable=invalid-name
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# Request threads per worker; concurrent requests share forward passes
+# through the micro-batcher
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+# Time given to in-flight requests to finish after SIGTERM
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# With MODEL_PRELOAD=eager the weights are loaded once in the master process
+# and workers share them through fork; each worker runs its own warm-up
+# inference in post_worker_init, after post_fork has set its thread count
+preload_app = os.getenv("MODEL_PRELOAD", "background") == "eager"
+
+
+def inference_threads():
+    """Threads each worker may use for inference."""
+    configured = int(os.getenv("INFERENCE_THREADS", "0"))
+    if configured:
+        return configured
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def post_fork(server, worker):  # pylint: disable=unused-argument
+    """Limit inference threads in each new worker process."""
+    num_threads = inference_threads()
+    os.environ["INFERENCE_THREADS"] = str(num_threads)
+    # pylint: disable=import-outside-toplevel
+    import torch
+
+    torch.set_num_threads(num_threads)
+    server.log.info("Worker %s: %d inference threads", worker.pid, num_threads)
+
+
+def post_worker_init(worker):
+    """Start loading or warming up the model and create indexes in the worker."""
+    # pylint: disable=import-outside-toplevel
+    from ml_client import ensure_indexes, start_model_loading
+
+    start_model_loading()
+    try:
+        ensure_indexes()
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        worker.log.warning("Worker %s could not create indexes: %s", worker.pid, e)
+
+
+def worker_exit(server, worker):  # pylint: disable=unused-argument
+    """Let queued analyses finish before the worker process exits."""
+    # pylint: disable=import-outside-toplevel
+    from ml_client import batcher
+
+    if not batcher.shutdown(timeout=graceful_timeout):
+        server.log.warning("Worker %s exited with analyses still queued", worker.pid)
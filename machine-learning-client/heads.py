@@ -0,0 +1,143 @@
+"""
+Extra analysis heads that share the sentiment model's encoder pass.
+Besides the sentiment classifier built into the model, ml-client can run any
+number of small heads (e.g. emotion categories or intensity) on the
+mean-pooled encoder output of the same forward pass, so each head costs one
+matrix product rather than another transformer. Heads are configured with
+
+    HEADS="emotion=models/heads/emotion.pt,intensity=models/heads/intensity.pt"
+
+Each file is a linear head trained on the pooled output of the configured
+sentiment model and saved with save_head(): its labels, a [labels, hidden]
+weight, a [labels] bias and the activation turning the outputs into scores
+("softmax" for one-of-N categories, "sigmoid" for independent labels,
+"identity" for regression). Like the sentiment probabilities, head scores
+are the length-weighted mean of an entry's windows.
+"""
+
+import torch
+
+from chunking import aggregate_windows
+
+# Result key that carries the outputs of the extra heads
+HEADS_KEY = "heads"
+# The model's own classifier, always run and stored in the entry's sentiment
+SENTIMENT_HEAD = "sentiment"
+
+ACTIVATIONS = {
+    "softmax": lambda outputs: torch.softmax(outputs, dim=1),
+    "sigmoid": torch.sigmoid,
+    "identity": lambda outputs: outputs,
+}
+
+
+class LinearHead:  # pylint: disable=too-few-public-methods
+    """
+    A linear layer and activation applied to pooled encoder outputs.
+
+    Args:
+        name (str): Key of the head's scores in results.
+        labels (list[str]): Name of each output.
+        weight (torch.Tensor): [labels, hidden] weight.
+        bias (torch.Tensor): [labels] bias.
+        activation (str): One of ACTIVATIONS.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, name, labels, weight, bias, activation="softmax"
+    ):
+        if activation not in ACTIVATIONS:
+            raise ValueError(
+                f"Unknown activation {activation!r} of head {name!r}; "
+                f"expected one of {tuple(ACTIVATIONS)}"
+            )
+        weight = torch.as_tensor(weight, dtype=torch.float32)
+        bias = torch.as_tensor(bias, dtype=torch.float32)
+        if (
+            weight.dim() != 2
+            or bias.shape != (len(labels),)
+            or weight.shape[0] != len(labels)
+        ):
+            raise ValueError(f"Head {name!r} needs a weight and bias per label")
+        self.name = name
+        self.labels = tuple(labels)
+        self.weight = weight
+        self.bias = bias
+        self.activation = activation
+
+    def __call__(self, pooled):
+        """Map [N, hidden] pooled outputs to [N, labels] scores."""
+        if pooled.shape[1] != self.weight.shape[1]:
+            raise ValueError(
+                f"Head {self.name!r} expects {self.weight.shape[1]} hidden "
+                f"features, the model produces {pooled.shape[1]}"
+            )
+        outputs = torch.nn.functional.linear(pooled.float(), self.weight, self.bias)
+        return ACTIVATIONS[self.activation](outputs)
+
+    @classmethod
+    def load(cls, name, path):
+        """Load a head saved with save_head()."""
+        state = torch.load(path, map_location="cpu", weights_only=True)
+        return cls(
+            name, state["labels"], state["weight"], state["bias"], state["activation"]
+        )
+
+
+def save_head(path, labels, weight, bias, activation="softmax"):
+    """Save a linear head's labels, weight, bias and activation for LinearHead.load."""
+    LinearHead("head", labels, weight, bias, activation)
+    torch.save(
+        {
+            "labels": list(labels),
+            "weight": torch.as_tensor(weight, dtype=torch.float32),
+            "bias": torch.as_tensor(bias, dtype=torch.float32),
+            "activation": activation,
+        },
+        path,
+    )
+
+
+def parse_heads(spec):
+    """
+    Parse a HEADS setting of comma-separated name=path pairs.
+
+    Returns:
+        list[tuple[str, str]]: (name, path) of each head, in order.
+    """
+    heads = []
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        name, separator, path = (part.strip() for part in item.partition("="))
+        if not separator or not name or not path:
+            raise ValueError(f"Invalid head {item!r}; expected name=path")
+        if name == SENTIMENT_HEAD or name in dict(heads):
+            raise ValueError(f"Head name {name!r} is reserved or used twice")
+        heads.append((name, path))
+    return heads
+
+
+def load_heads(spec):
+    """Load the heads configured by a HEADS setting."""
+    return [LinearHead.load(name, path) for name, path in parse_heads(spec)]
+
+
+def head_results(heads, pooled, owners, lengths, count):
+    """
+    Run every head on the pooled window outputs and combine each text's windows.
+
+    Args:
+        heads (list[LinearHead]): The heads to run.
+        pooled (torch.Tensor): [windows, hidden] mean-pooled encoder outputs.
+        owners (list[int]): Text index of each window.
+        lengths (list[int]): Token count of each window.
+        count (int): Number of texts.
+
+    Returns:
+        list[dict]: For each text, {head name: {label: score}}.
+    """
+    results = [{} for _ in range(count)]
+    for head in heads:
+        scores = aggregate_windows(head(pooled), owners, lengths, count)
+        for result, row in zip(results, scores.tolist()):
+            result[head.name] = dict(zip(head.labels, row))
+    return results
@@ -0,0 +1,175 @@
+"""
+Durable analysis job queue backed by a MongoDB collection.
+The web app enqueues one job per submitted entry; ml-client workers claim
+jobs atomically with find_one_and_update and hold a time-limited lease while
+they work. Failed jobs are retried with exponential backoff and moved to a
+dead-letter state once they run out of attempts.
+
+The web app inserts jobs itself (app.enqueue_analysis) and must write exactly
+the document built by new_job, which claim() relies on:
+
+    {entry_id: str, text, status: "queued", attempts: 0,
+     available_at: datetime, created_at: datetime}
+
+Workers add worker_id, claimed_at and lease_expires_at when they claim a job,
+and last_error when an attempt fails.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING, ReturnDocument
+
+QUEUED = "queued"
+RUNNING = "running"
+DEAD = "dead"
+
+
+def utcnow():
+    """Return the current time as a timezone-aware UTC datetime."""
+    return datetime.now(timezone.utc)
+
+
+def new_job(entry_id, text, now=None):
+    """Return the document of a queued job to analyze an entry's text."""
+    now = now or utcnow()
+    return {
+        "entry_id": str(entry_id),
+        "text": text,
+        "status": QUEUED,
+        "attempts": 0,
+        "available_at": now,
+        "created_at": now,
+    }
+
+
+class JobQueue:
+    """
+    Claim, complete and retry analysis jobs stored in a MongoDB collection.
+
+    Args:
+        collection (pymongo.collection.Collection): The jobs collection.
+        lease_seconds (float): How long a claimed job is reserved for a worker
+            before another worker may claim it again.
+        max_attempts (int): Attempts after which a job is dead-lettered.
+        retry_base_seconds (float): Delay before the first retry; doubled for
+            each further attempt.
+        on_dead_letter (callable, optional): Called with each job this queue
+            dead-letters, whether its last attempt failed or its lease kept
+            expiring.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        collection,
+        lease_seconds=60,
+        max_attempts=5,
+        retry_base_seconds=5,
+        on_dead_letter=None,
+    ):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.on_dead_letter = on_dead_letter
+
+    def ensure_indexes(self):
+        """Create the indexes used to find claimable jobs."""
+        self.collection.create_index(
+            [("status", ASCENDING), ("available_at", ASCENDING)]
+        )
+        self.collection.create_index(
+            [("status", ASCENDING), ("lease_expires_at", ASCENDING)]
+        )
+
+    def backlog(self):
+        """Return the number of queued jobs that are due."""
+        return self.collection.count_documents(
+            {"status": QUEUED, "available_at": {"$lte": utcnow()}}
+        )
+
+    def enqueue(self, entry_id, text):
+        """Add a job to analyze an entry's text."""
+        return self.collection.insert_one(new_job(entry_id, text)).inserted_id
+
+    def claim(self, worker_id):
+        """
+        Atomically claim the oldest available job.
+
+        A job is available when it is queued and due, or when the lease of the
+        worker running it has expired (for example because the worker crashed).
+
+        Returns:
+            dict or None: The claimed job document, or None if there is no work.
+        """
+        while True:
+            now = utcnow()
+            job = self.collection.find_one_and_update(
+                {
+                    "$or": [
+                        {"status": QUEUED, "available_at": {"$lte": now}},
+                        {"status": RUNNING, "lease_expires_at": {"$lte": now}},
+                    ]
+                },
+                {
+                    "$set": {
+                        "status": RUNNING,
+                        "worker_id": worker_id,
+                        "claimed_at": now,
+                        "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    },
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("available_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if job is None or job["attempts"] <= self.max_attempts:
+                return job
+            # A job whose lease keeps expiring has crashed its workers too often
+            self._dead_letter(job, job.get("last_error", "lease expired"))
+
+    def complete(self, job):
+        """Remove a finished job, unless its lease was lost to another worker."""
+        result = self.collection.delete_one(
+            {"_id": job["_id"], "status": RUNNING, "worker_id": job["worker_id"]}
+        )
+        return result.deleted_count == 1
+
+    def fail(self, job, error):
+        """
+        Record a failed attempt, scheduling a retry or dead-lettering the job.
+
+        Nothing is changed if the job's lease was lost to another worker.
+
+        Returns:
+            bool: True if the job was dead-lettered.
+        """
+        if job["attempts"] >= self.max_attempts:
+            return self._dead_letter(job, error)
+        delay = self.retry_base_seconds * 2 ** (job["attempts"] - 1)
+        self.collection.update_one(
+            {"_id": job["_id"], "status": RUNNING, "worker_id": job["worker_id"]},
+            {
+                "$set": {
+                    "status": QUEUED,
+                    "available_at": utcnow() + timedelta(seconds=delay),
+                    "last_error": str(error),
+                },
+                "$unset": {"lease_expires_at": "", "worker_id": ""},
+            },
+        )
+        return False
+
+    def _dead_letter(self, job, error):
+        # only while this worker holds the lease, like complete()
+        result = self.collection.update_one(
+            {"_id": job["_id"], "status": RUNNING, "worker_id": job["worker_id"]},
+            {
+                "$set": {"status": DEAD, "dead_at": utcnow(), "last_error": str(error)},
+                "$unset": {"lease_expires_at": ""},
+            },
+        )
+        if result.modified_count != 1:
+            return False
+        if self.on_dead_letter is not None:
+            self.on_dead_letter(job)
+        return True
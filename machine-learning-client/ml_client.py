@@ -2,41 +2,279 @@
 Sentiment analysis Flask API using RoBERTa and MongoDB.
 Module to analyze sentiment using a pre-trained
 RoBERTa model for sentiment analysis on Twitter data.
-This module loads the model and tokenizer,
+This module loads the model and tokenizer lazily through a model registry,
 then performs sentiment analysis on input text.
 """
 
-# pip install transformers torch scipy
+# pip install transformers torch
 import logging
+import os
 
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from scipy.special import softmax
+import numpy as np
 import torch
 
 # import flask
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 
 # import database connection
 from db import db
 
+import metrics
+import mongo_settings
+from backends import load_backend
+from batching import MicroBatcher
+from chunking import encode_buckets, forward_buckets
+from cache import SentimentCache
+from heads import HEADS_KEY, head_results, load_heads, parse_heads
+from embeddings import decode_embedding, embedding_document, encode_embeddings
+from model_registry import ModelRegistry, snapshot_source
+import rollups
+from scoring import score_logits, to_results
+from vector_index import UserIndexes, build_index
+
 app = Flask(__name__)
 entries_col = db["entries"]
+rollups_col = db["mood_rollups"]
+# one float16 embedding per analyzed entry, for the similar-entries search
+embeddings_col = db["entry_embeddings"]
+
+# Optional write concern for sentiment writes, e.g. MONGO_WRITE_CONCERN_SENTIMENT=0
+# for unacknowledged writes; unset uses the client's write concern
+SENTIMENT_WRITE_CONCERN = mongo_settings.write_concern("sentiment")
+
+# Set up logging in Docker container's output. Debug logging on the request
+# path is only formatted when LOG_LEVEL=DEBUG
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+metrics.instrument_app(app)
 
-# Set up logging in Docker container's output
-logging.basicConfig(level=logging.DEBUG)
+# Per-stage latency of the analyze path
+tokenize_seconds = metrics.histogram(
+    "analyze_tokenize_seconds", "Time to tokenize and pad a batch of texts"
+)
+forward_seconds = metrics.histogram(
+    "analyze_forward_seconds", "Time for the model's forward pass over a batch"
+)
+softmax_seconds = metrics.histogram(
+    "analyze_softmax_seconds", "Time to turn a batch's logits into scores"
+)
+heads_seconds = metrics.histogram(
+    "analyze_heads_seconds", "Time to run the extra analysis heads on a batch"
+)
+mongo_write_seconds = metrics.histogram(
+    "mongo_write_seconds", "Time to store sentiments and update rollups"
+)
+similar_query_seconds = metrics.histogram(
+    "similar_query_seconds", "Time to answer a similar-entries query"
+)
 
-# Load model and tokenizer
+# Model and tokenizer
 # Using a pre-trained RoBERTa model fine-tuned for sentiment analysis on Twitter data
-MODEL_NAME = "cardiffnlp/twitter-roberta-base-sentiment"
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+MODEL_NAME = os.getenv("MODEL_NAME", "cardiffnlp/twitter-roberta-base-sentiment")
+MODEL_REVISION = os.getenv("MODEL_REVISION", "main")
+MODEL_VERSION = f"{MODEL_NAME}@{MODEL_REVISION}"
+# Optional local snapshot written by `python export_model.py snapshot`
+MODEL_SNAPSHOT_DIR = os.getenv("MODEL_SNAPSHOT_DIR", "models/snapshot")
+# lazy: load on first request; background: load in a warm-up thread at startup;
+# eager: load the weights at import time (used with gunicorn --preload to share
+# them) and run the warm-up inference once the service starts
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "background")
+
+# Inference backend: torch (FP32), torch-int8 (dynamic quantization) or onnx
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "models/model.int8.onnx")
+# Extra analysis heads run on the same encoder pass as the sentiment model,
+# e.g. HEADS=emotion=models/heads/emotion.pt (see heads.py)
+HEADS = os.getenv("HEADS", "")
+HEAD_NAMES = [name for name, _ in parse_heads(HEADS)]
+# Recorded with every stored result; adding or removing a head makes
+# rescore.py re-analyze entries so every entry has the same heads
+ANALYSIS_VERSION = "+".join([MODEL_VERSION, *HEAD_NAMES])
+
+# Intra-op threads per process for inference; 0 leaves the library default.
+# The production server sets it per worker so workers don't oversubscribe cores
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))
+
+
+def load_model():
+    """
+    Load the tokenizer, inference backend and extra heads, preferring a
+    local snapshot.
+
+    Returns:
+        tuple: (tokenizer, backend, heads)
+    """
+    # transformers is slow to import, so it is only imported when loading
+    # pylint: disable=import-outside-toplevel
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    source = snapshot_source(MODEL_SNAPSHOT_DIR, MODEL_VERSION)
+    if source:
+        options = {"local_files_only": True}
+    else:
+        source, options = MODEL_NAME, {"revision": MODEL_REVISION}
+    app.logger.info("* load_model(): Loading %s from %s", MODEL_VERSION, source)
+    # The Rust-backed fast tokenizer encodes a whole batch in one call
+    tokenizer = AutoTokenizer.from_pretrained(source, use_fast=True, **options)
+    backend = load_backend(
+        INFERENCE_BACKEND,
+        lambda: AutoModelForSequenceClassification.from_pretrained(source, **options),
+        onnx_path=ONNX_MODEL_PATH,
+        num_threads=INFERENCE_THREADS or None,
+    )
+    heads = load_heads(HEADS)
+    if heads and not getattr(backend, "has_embedding", True):
+        raise RuntimeError(
+            "HEADS need the pooled encoder output; re-export the ONNX model"
+        )
+    return tokenizer, backend, heads
+
+
+# Result cache keyed by text, model version, heads and backend, optionally
+# persisted in MongoDB
+sentiment_cache = SentimentCache(
+    f"{MODEL_VERSION}/{INFERENCE_BACKEND}/{HEADS}",
+    max_size=int(os.getenv("CACHE_MAX_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("CACHE_TTL_SECONDS", "86400")),
+    collection=(
+        db["sentiment_cache"]
+        if os.getenv("CACHE_MONGO", "false").lower() == "true"
+        else None
+    ),
+)
+
+
+# Micro-batching: concurrent requests are gathered into one padded batch
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+# Number of texts scored per forward pass by the bulk /analyze/batch endpoint
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "32"))
+
+# Long entries are split into overlapping windows of at most CHUNK_WINDOW_TOKENS
+# tokens; CHUNK_MAX_WINDOWS bounds the windows (and cost) per entry
+CHUNK_WINDOW_TOKENS = int(os.getenv("CHUNK_WINDOW_TOKENS", "510"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+CHUNK_MAX_WINDOWS = int(os.getenv("CHUNK_MAX_WINDOWS", "8"))
+# Windows of similar length are padded and run together in buckets of at most
+# BUCKET_MAX_TOKENS padded tokens, instead of padding a batch to its longest text
+BUCKET_MAX_TOKENS = int(os.getenv("BUCKET_MAX_TOKENS", "8192"))
+
+# Similar-entries search over each user's entry embeddings: exact brute force
+# (flat), or an inverted-file index over int8 codes (ivf) that "auto" uses for
+# histories of at least SIMILAR_IVF_MIN_ENTRIES entries
+SIMILAR_INDEX_MODE = os.getenv("SIMILAR_INDEX_MODE", "auto")
+SIMILAR_IVF_MIN_ENTRIES = int(os.getenv("SIMILAR_IVF_MIN_ENTRIES", "5000"))
+SIMILAR_IVF_PROBE = int(os.getenv("SIMILAR_IVF_PROBE", "8"))
+SIMILAR_MAX_K = int(os.getenv("SIMILAR_MAX_K", "20"))
+
+
+def analyze_texts(texts):
+    """
+    Analyze several texts with one forward pass per length bucket.
+
+    Texts longer than the model's input limit are split into overlapping
+    windows and each text's probabilities are the length-weighted mean of its
+    windows. Windows are grouped by length so each forward pass pads only to
+    the longest window of its bucket. When the backend produces embeddings,
+    the same pass also yields each text's encoded embedding and the scores of
+    every configured head.
+
+    Args:
+        texts (list[str]): The input texts to analyze.
+
+    Returns:
+        list[tuple[dict, bytes]]: For each text, in the same order, its scores
+        as returned by analyze_sentiment and its embedding, or None if the
+        backend produces none.
+    """
+    tokenizer, backend, heads = model_registry.get()
+    # Tokenize all texts into windows, padded per bucket of similar lengths
+    with tokenize_seconds.time():
+        buckets, owners, lengths = encode_buckets(
+            tokenizer,
+            texts,
+            CHUNK_WINDOW_TOKENS,
+            CHUNK_OVERLAP_TOKENS,
+            CHUNK_MAX_WINDOWS,
+            BUCKET_MAX_TOKENS,
+        )
+    # Get the raw scores from the model output, one row per window in text order
+    with forward_seconds.time():
+        logits, pooled = forward_buckets(backend.forward, buckets, len(owners))
+    # Convert raw scores of each sentiment class (neg, neu, pos) to probabilities,
+    # combine the windows of each text and map them to composite scores (1 to 5)
+    with softmax_seconds.time():
+        probabilities, composite = score_logits(logits, owners, lengths, len(texts))
+        results = to_results(probabilities, composite)
+    if pooled is None:
+        return [(result, None) for result in results]
+    vectors = add_pooled_outputs(results, heads, pooled, owners, lengths)
+    return list(zip(results, vectors))
+
+
+def add_pooled_outputs(results, heads, pooled, owners, lengths):
+    """Add the extra head scores to each result and return the texts' embeddings."""
+    # Extra heads reuse the pooled encoder output of the same forward pass
+    if heads:
+        with heads_seconds.time():
+            outputs = head_results(heads, pooled, owners, lengths, len(results))
+        for result, output in zip(results, outputs):
+            result[HEADS_KEY] = output
+    return encode_embeddings(pooled, owners, lengths, len(results))
+
+
+def analyze_sentiment_batch(texts):
+    """
+    Analyze the sentiment of several texts with one forward pass per length bucket.
+
+    Args:
+        texts (list[str]): The input texts to analyze.
+
+    Returns:
+        list[dict[str, float]]: One result per text, in the same order and
+        with the same keys as analyze_sentiment.
+    """
+    return [scores for scores, _ in analyze_texts(texts)]
+
+
+def warm_up_model(_model):
+    """Run one inference so the first request doesn't pay for lazy initialization."""
+    analyze_texts(["Warming up the sentiment model."])
+
+
+model_registry = ModelRegistry(load_model, warm_up_model)
+
+
+def start_model_loading():
+    """Load the model according to MODEL_PRELOAD when the service starts."""
+    if MODEL_PRELOAD == "background":
+        model_registry.start_background()
+    elif MODEL_PRELOAD == "eager":
+        model_registry.warm_up()
+
+
+if INFERENCE_THREADS:
+    torch.set_num_threads(INFERENCE_THREADS)
+if MODEL_PRELOAD == "eager":
+    # Only the weights: with gunicorn --preload this runs in the master, and
+    # inference there would start thread pools that forked workers inherit
+    # before post_fork has sized them
+    model_registry.get()
+
+
+batcher = MicroBatcher(analyze_texts, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, name="analyze")
 
 
 def analyze_sentiment(text):
     """
     Analyze the sentiment of a given text using a RoBERTa-based sentiment analysis model.
 
+    The text is queued on the micro-batcher so that concurrent calls share a
+    single forward pass.
+
     Args:
         text (str): The input text to analyze.
 
@@ -44,7 +282,8 @@ def analyze_sentiment(text):
         dict[str, float]: A dictionary containing sentiment
         probabilities ('negative', 'neutral', 'positive')
         and a 'composite_score' ranging from 1 to 5, where 1 indicates strong negativity
-        and 5 indicates strong positivity.
+        and 5 indicates strong positivity. When extra heads are configured,
+        their scores are under 'heads', keyed by head name and label.
 
         Example:
         {
@@ -54,25 +293,177 @@ def analyze_sentiment(text):
             'composite_score': 4.53
         }
     """
-    # Tokenize the input text
-    encoded_text = tokenizer(text, return_tensors="pt")
-    with torch.no_grad():
-        output = model(**encoded_text)
-    # Get the raw scores from the model output
-    scores = output[0][0].detach().numpy()
-    # Convert raw scores of each sentiment class (neg, neu, pos) to probabilities
-    score = softmax(scores)
-
-    # Map to composite score (1 to 5): Negative - 1, Neutral - 3, Positive - 5
-    composite_score = round(score[0] * 1 + score[1] * 3 + score[2] * 5, 2)
-
-    sentiment_scores = {
-        "negative": float(score[0]),
-        "neutral": float(score[1]),
-        "positive": float(score[2]),
-        "composite_score": composite_score,
+    return analyze_text(text)[0]
+
+
+def analyze_text(text):
+    """
+    Analyze a text like analyze_sentiment and also return its embedding.
+
+    The embedding is cached with the scores, so entries with the same text
+    all get one.
+
+    Returns:
+        tuple[dict, bytes]: The scores, and the embedding or None.
+    """
+    cached = sentiment_cache.lookup(text)
+    if cached is not None:
+        return cached
+    sentiment_scores, vector = batcher.submit(text).result()
+    sentiment_cache.set(text, sentiment_scores, vector)
+    return sentiment_scores, vector
+
+
+def score_texts(texts):
+    """
+    Score several texts, running inference only for those not already cached.
+
+    Args:
+        texts (list[str]): The input texts to analyze.
+
+    Returns:
+        list[tuple[dict, bytes]]: The scores and embedding of each text, in
+        the same order; the embedding is None if the backend produces none.
+    """
+    results = [sentiment_cache.lookup(text) for text in texts]
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        computed = analyze_texts([texts[index] for index in missing])
+        for index, (scores, vector) in zip(missing, computed):
+            results[index] = (scores, vector)
+            sentiment_cache.set(texts[index], scores, vector)
+    return results
+
+
+def ensure_indexes():
+    """Create the indexes that ml-client's writes rely on."""
+    rollups.ensure_indexes(rollups_col)
+    # entries scored by another model version, for rescore.py
+    entries_col.create_index([("sentiment_version", 1), ("_id", 1)])
+    # a user's embeddings are loaded together to build their index
+    embeddings_col.create_index([("user_id", 1), ("model", 1)])
+
+
+def sentiment_writes(collection=None):
+    """Return the entries collection (or another) with the sentiment write concern."""
+    collection = entries_col if collection is None else collection
+    if SENTIMENT_WRITE_CONCERN is None:
+        return collection
+    return collection.with_options(write_concern=SENTIMENT_WRITE_CONCERN)
+
+
+def load_user_embeddings(user_id):
+    """
+    Load a user's embeddings from the current model version.
+
+    Returns:
+        tuple[list, np.ndarray]: Entry ObjectIds and [N, dim] vectors.
+    """
+    ids, vectors = [], []
+    for doc in embeddings_col.find(
+        {"user_id": user_id, "model": MODEL_VERSION}, {"vector": 1}
+    ):
+        ids.append(doc["_id"])
+        vectors.append(doc["vector"])
+    if not ids:
+        return ids, np.empty((0, 0), dtype=np.float32)
+    return ids, decode_embedding(b"".join(vectors)).reshape(len(ids), -1)
+
+
+user_indexes = UserIndexes(
+    load_user_embeddings,
+    lambda ids, vectors: build_index(
+        ids,
+        vectors,
+        SIMILAR_INDEX_MODE,
+        ivf_min_vectors=SIMILAR_IVF_MIN_ENTRIES,
+        n_probe=SIMILAR_IVF_PROBE,
+    ),
+    max_users=int(os.getenv("SIMILAR_INDEX_MAX_USERS", "256")),
+    ttl_seconds=float(os.getenv("SIMILAR_INDEX_TTL_SECONDS", "60")),
+)
+
+
+def store_embeddings(embeddings):
+    """
+    Upsert entry embeddings and drop the cached indexes of their users.
+
+    Args:
+        embeddings (list[tuple]): (entry ObjectId, entry, vector) tuples, where
+            entry holds the entry's user_id and journal_date.
+    """
+    if not embeddings:
+        return
+    sentiment_writes(embeddings_col).bulk_write(
+        [
+            UpdateOne(
+                {"_id": object_id},
+                {"$set": embedding_document(entry, vector, MODEL_VERSION)},
+                upsert=True,
+            )
+            for object_id, entry, vector in embeddings
+        ],
+        ordered=False,
+    )
+    for user_id in {entry.get("user_id") for _, entry, _ in embeddings}:
+        user_indexes.invalidate(user_id)
+
+
+def sentiment_update(sentiment_scores):
+    """
+    Return the update that stores an entry's analysis in one write.
+
+    The sentiment head's scores go to sentiment and the extra heads' scores,
+    if any, to heads. sentiment_version records the model name and revision
+    (and heads) that produced them, so rescore.py can find entries analyzed
+    by an older model. sentiment_updated_at is set to the server's clock with
+    every new result; the web app uses it to validate its cached pages of
+    the entry.
+    """
+    sentiment_scores = dict(sentiment_scores)
+    fields = {"sentiment_version": ANALYSIS_VERSION}
+    if HEADS_KEY in sentiment_scores:
+        fields[HEADS_KEY] = sentiment_scores.pop(HEADS_KEY)
+    return {
+        "$set": {"sentiment": sentiment_scores, **fields},
+        "$currentDate": {"sentiment_updated_at": True},
     }
-    return sentiment_scores
+
+
+def store_sentiment(entry_id, sentiment_scores, vector=None):
+    """
+    Save the sentiment scores of a single entry and update its mood rollups.
+    The entry's embedding, if given, is stored in entry_embeddings.
+
+    Returns:
+        bool: False if the entry doesn't exist.
+    """
+    query = {"_id": ObjectId(entry_id)}
+    update = sentiment_update(sentiment_scores)
+    if SENTIMENT_WRITE_CONCERN is None or SENTIMENT_WRITE_CONCERN.acknowledged:
+        previous = sentiment_writes().find_one_and_update(
+            query,
+            update,
+            projection=rollups.ROLLUP_FIELDS,
+            return_document=ReturnDocument.BEFORE,
+        )
+    else:
+        # unacknowledged: read the sentiment being replaced, then write without
+        # waiting for the server
+        previous = entries_col.find_one(query, rollups.ROLLUP_FIELDS)
+        if previous:
+            sentiment_writes().update_one(query, update)
+    if not previous:
+        return False
+    rollups.apply_rollups(
+        rollups_col,
+        rollups.rollup_updates(
+            previous, new=sentiment_scores, old=previous.get("sentiment")
+        ),
+    )
+    if vector is not None:
+        store_embeddings([(query["_id"], previous, vector)])
+    return True
 
 
 @app.route("/analyze", methods=["POST"])
@@ -86,27 +477,237 @@ def analyze_and_store():
     if not entry_id or not text:
         return jsonify({"error": "entry_id and text are required"}), 400
 
-    sentiment_scores = analyze_sentiment(text)
-    # Convert all sentiment scores to native Python types (float)
-    sentiment_scores = {
-        "negative": float(sentiment_scores.get("negative", 0)),
-        "neutral": float(sentiment_scores.get("neutral", 0)),
-        "positive": float(sentiment_scores.get("positive", 0)),
-        "composite_score": float(sentiment_scores.get("composite_score", 0)),
-    }
+    sentiment_scores, vector = analyze_text(text)
     app.logger.debug("* analyze_and_store(): Sentiment scores: %s", sentiment_scores)
-    print("* analyze_and_store(): Sentiment scores: %s", sentiment_scores)
-    entries_col.update_one(
-        {"_id": ObjectId(entry_id)},
-        {"$set": {"sentiment": sentiment_scores}},
-        upsert=True,
-    )
+    with mongo_write_seconds.time():
+        stored = store_sentiment(entry_id, sentiment_scores, vector)
+    if not stored:
+        return jsonify({"error": "entry not found", "entry_id": entry_id}), 404
     app.logger.debug("* analyze_and_store(): Updated entry with ID %s", entry_id)
-    print("* analyze_and_store(): Updated entry with ID %s", entry_id)
     return jsonify({"status": "updated", "entry_id": entry_id})
 
 
+def parse_batch_items(items):
+    """
+    Validate the items of a bulk analysis request.
+
+    Returns:
+        tuple[list, list]: (entry_id, ObjectId, text) tuples for valid items, and
+        an error dict for each invalid one.
+    """
+    valid = []
+    errors = []
+    for item in items:
+        entry_id = item.get("entry_id") if isinstance(item, dict) else None
+        text = item.get("text") if isinstance(item, dict) else None
+        if not entry_id or not text:
+            errors.append(
+                {"entry_id": entry_id, "error": "entry_id and text are required"}
+            )
+            continue
+        try:
+            valid.append((entry_id, ObjectId(entry_id), text))
+        except (InvalidId, TypeError):
+            errors.append({"entry_id": entry_id, "error": "invalid entry_id"})
+    return valid, errors
+
+
+def store_sentiment_batch(results):
+    """
+    Persist many sentiment results with a single unordered bulk_write and
+    update the mood rollups of the entries that were written.
+
+    Args:
+        results (list[tuple]): (entry_id, ObjectId, scores, embedding) tuples;
+            the embedding may be None. An entry listed more than once is
+            written once, with its last result.
+
+    Returns:
+        tuple[int, list]: The number of entries updated, and an error dict for
+        each entry that doesn't exist or whose write failed.
+    """
+    if not results:
+        return 0, []
+    # every update is diffed against the same snapshot, so each entry may only
+    # be written once or its rollups would move twice
+    results = list({result[1]: result for result in results}.values())
+    # sentiments being replaced, to move the rollups by the difference; entries
+    # that don't exist are reported instead of written
+    previous = {
+        entry["_id"]: entry
+        for entry in entries_col.find(
+            {"_id": {"$in": [object_id for _, object_id, _, _ in results]}},
+            rollups.ROLLUP_FIELDS,
+        )
+    }
+    errors = [
+        {"entry_id": entry_id, "error": "entry not found"}
+        for entry_id, object_id, _, _ in results
+        if object_id not in previous
+    ]
+    results = [result for result in results if result[1] in previous]
+    if not results:
+        return 0, errors
+
+    operations = [
+        UpdateOne({"_id": object_id}, sentiment_update(scores))
+        for _, object_id, scores, _ in results
+    ]
+    failed = {}
+    try:
+        sentiment_writes().bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        failed = {
+            write_error["index"]: write_error.get("errmsg", "write failed")
+            for write_error in e.details.get("writeErrors", [])
+        }
+
+    rollup_updates = []
+    embeddings = []
+    for index, (_, object_id, scores, vector) in enumerate(results):
+        if index not in failed:
+            entry = previous[object_id]
+            rollup_updates.extend(
+                rollups.rollup_updates(entry, new=scores, old=entry.get("sentiment"))
+            )
+            if vector is not None:
+                embeddings.append((object_id, entry, vector))
+    rollups.apply_rollups(rollups_col, rollup_updates)
+    store_embeddings(embeddings)
+
+    errors.extend(
+        {"entry_id": results[index][0], "error": message}
+        for index, message in failed.items()
+    )
+    return len(operations) - len(failed), errors
+
+
+@app.route("/analyze/batch", methods=["POST"])
+def analyze_and_store_batch():
+    """
+    Handle POST requests to analyze and store many entries at once.
+
+    Expects a JSON body of the form {"entries": [{"entry_id": ..., "text": ...}]}.
+    Texts are scored in padded chunks and all results are written with a single
+    unordered bulk_write. Invalid items, failed chunks and failed writes are
+    reported per entry without failing the rest of the batch.
+    """
+
+    data = request.get_json(silent=True) or {}
+    items = data.get("entries")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "entries must be a non-empty list"}), 400
+
+    valid, errors = parse_batch_items(items)
+    results = []
+    for start in range(0, len(valid), BULK_CHUNK_SIZE):
+        chunk = valid[start : start + BULK_CHUNK_SIZE]
+        try:
+            chunk_scores = score_texts([text for _, _, text in chunk])
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            app.logger.error("* analyze_and_store_batch(): Chunk failed: %s", e)
+            errors.extend(
+                {"entry_id": entry_id, "error": str(e)} for entry_id, _, _ in chunk
+            )
+            continue
+        results.extend(
+            (entry_id, object_id, scores, vector)
+            for (entry_id, object_id, _), (scores, vector) in zip(chunk, chunk_scores)
+        )
+
+    with mongo_write_seconds.time():
+        updated, write_errors = store_sentiment_batch(results)
+    errors.extend(write_errors)
+    app.logger.debug(
+        "* analyze_and_store_batch(): Updated %d entries, %d errors",
+        updated,
+        len(errors),
+    )
+    return jsonify({"status": "completed", "updated": updated, "errors": errors})
+
+
+@app.route("/similar", methods=["POST"])
+def similar_entries():
+    """
+    Handle POST requests for the entries most similar to one of a user's entries.
+
+    Expects a JSON body of the form {"entry_id": ..., "user_id": ..., "k": 5}.
+    Only the user's own entries embedded by the current model are searched.
+    Responds 404 if the entry has no embedding (yet).
+    """
+
+    data = request.get_json(silent=True) or {}
+    entry_id = data.get("entry_id")
+    user_id = data.get("user_id")
+    k = data.get("k", 5)
+    if not entry_id or not user_id:
+        return jsonify({"error": "entry_id and user_id are required"}), 400
+    if not isinstance(k, int) or not 1 <= k <= SIMILAR_MAX_K:
+        return jsonify({"error": f"k must be between 1 and {SIMILAR_MAX_K}"}), 400
+    try:
+        object_id = ObjectId(entry_id)
+    except (InvalidId, TypeError):
+        return jsonify({"error": "invalid entry_id"}), 400
+
+    with similar_query_seconds.time():
+        embedding = embeddings_col.find_one(
+            {"_id": object_id, "user_id": user_id, "model": MODEL_VERSION},
+            {"vector": 1},
+        )
+        if not embedding:
+            return (
+                jsonify({"error": "entry has no embedding", "entry_id": entry_id}),
+                404,
+            )
+        matches = user_indexes.get(user_id).search(
+            decode_embedding(embedding["vector"]), k, exclude=object_id
+        )
+    app.logger.debug("* similar_entries(): %d matches for %s", len(matches), entry_id)
+    return jsonify(
+        {
+            "entry_id": entry_id,
+            "similar": [
+                {"entry_id": str(match_id), "score": round(score, 4)}
+                for match_id, score in matches
+            ],
+        }
+    )
+
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness probe: the process is up and serving requests."""
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """Readiness probe: the model is loaded and the warm-up inference has run."""
+    if model_registry.ready:
+        return jsonify({"status": "ready", "model": MODEL_VERSION, "heads": HEAD_NAMES})
+    if model_registry.error is not None:
+        return jsonify({"status": "error", "error": str(model_registry.error)}), 503
+    status = "warming up" if model_registry.loaded else "loading"
+    return jsonify({"status": status}), 503
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Report every service metric in the Prometheus text format."""
+    return Response(
+        metrics.render_prometheus(), content_type=metrics.PROMETHEUS_CONTENT_TYPE
+    )
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    """Report batch-size and queue-wait histograms and other service metrics."""
+    return jsonify(metrics.snapshot())
+
+
 if __name__ == "__main__":
+    # Development server only; production uses gunicorn with gunicorn_config.py
+    ensure_indexes()
+    start_model_loading()
     app.run(host="0.0.0.0", port=5001, debug=False)
-    print("ml-client running on port 5001")
     app.logger.debug("*** ml-client is running")
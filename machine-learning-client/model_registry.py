@@ -0,0 +1,129 @@
+"""
+Lazy, thread-safe model loading for ml-client.
+The tokenizer and inference backend are loaded on first use or by a
+background warm-up thread instead of at import time, so the app, the test
+suite and new workers start in seconds. The model can also be loaded from a
+local snapshot written by `python export_model.py snapshot`, avoiding a
+download from the Hugging Face Hub.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# File in a snapshot directory recording which model version it holds
+SNAPSHOT_VERSION_FILE = "model_version.txt"
+
+
+def snapshot_source(snapshot_dir, model_version):
+    """
+    Return the snapshot directory if it holds the requested model version.
+
+    Returns:
+        str or None: The directory to load from, or None to use the Hub.
+    """
+    if not snapshot_dir:
+        return None
+    version_path = os.path.join(snapshot_dir, SNAPSHOT_VERSION_FILE)
+    if not os.path.exists(version_path):
+        return None
+    with open(version_path, encoding="utf-8") as version_file:
+        snapshot_version = version_file.read().strip()
+    if snapshot_version != model_version:
+        logger.warning(
+            "* snapshot in %s holds %s, not %s; ignoring it",
+            snapshot_dir,
+            snapshot_version,
+            model_version,
+        )
+        return None
+    return snapshot_dir
+
+
+def save_snapshot(tokenizer, model, snapshot_dir, model_version):
+    """Save a tokenizer and model as a local snapshot for fast loading."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    tokenizer.save_pretrained(snapshot_dir)
+    model.save_pretrained(snapshot_dir, safe_serialization=True)
+    with open(
+        os.path.join(snapshot_dir, SNAPSHOT_VERSION_FILE), "w", encoding="utf-8"
+    ) as version_file:
+        version_file.write(model_version)
+
+
+class ModelRegistry:
+    """
+    Load a model once, on demand or in the background, and report readiness.
+
+    Args:
+        loader (callable): Returns the loaded model objects.
+        warmup (callable, optional): Called with the loaded objects to run a
+            first inference before the registry reports ready.
+    """
+
+    def __init__(self, loader, warmup=None):
+        self.loader = loader
+        self.warmup = warmup
+        self._model = None
+        self._ready = False
+        self._error = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def loaded(self):
+        """Whether the model has been loaded."""
+        return self._model is not None
+
+    @property
+    def ready(self):
+        """Whether the model is loaded and the warm-up inference has run."""
+        return self._ready
+
+    @property
+    def error(self):
+        """The exception raised by the last failed load, if any."""
+        return self._error
+
+    def get(self):
+        """Return the loaded model objects, loading them first if needed."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    started = time.monotonic()
+                    try:
+                        self._model = self.loader()
+                    except Exception as e:
+                        self._error = e
+                        raise
+                    self._error = None
+                    logger.info(
+                        "* ModelRegistry: loaded in %.1fs", time.monotonic() - started
+                    )
+        return self._model
+
+    def warm_up(self):
+        """Load the model and run the warm-up inference."""
+        model = self.get()
+        if not self._ready:
+            if self.warmup is not None:
+                self.warmup(model)
+            self._ready = True
+
+    def start_background(self):
+        """Load and warm up the model in a background thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._warm_up_logged, name="model-warmup", daemon=True
+        )
+        self._thread.start()
+
+    def _warm_up_logged(self):
+        try:
+            self.warm_up()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error("* ModelRegistry: warm-up failed: %s", e)
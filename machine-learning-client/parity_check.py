@@ -0,0 +1,121 @@
+"""
+Accuracy-parity and latency check for the inference backends.
+Scores a fixed corpus with the FP32 torch baseline and with each selected
+backend, then reports the largest probability and composite-score
+differences, label agreement and per-request latency. Exits non-zero if a
+backend drifts further from the baseline than the tolerance allows:
+
+    python parity_check.py --backends torch-int8 onnx --onnx-path models/model.int8.onnx
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from backends import BACKENDS, load_backend
+from scoring import score_logits
+
+# Fixed corpus of journal-style texts covering negative, neutral and positive moods
+CORPUS = [
+    "Today was such a good day. I woke up feeling refreshed and energized.",
+    "I feel frustrated today. Nothing seems to be going right at work",
+    "It was an average day",
+    "It was a sunny day",
+    "I'm so frustrated right now",
+    "Finally finished my project and celebrated with friends!",
+    "Feeling overwhelmed by deadlines and meetings.",
+    "I went grocery shopping and cleaned the kitchen.",
+    "My cat knocked over my coffee, but honestly it made me laugh.",
+    "I couldn't sleep last night and I'm exhausted and anxious.",
+    "Had a long phone call with my mom. It was nice to catch up.",
+    "The train was late again and I missed the start of the lecture.",
+    "Nothing special happened today.",
+    "I got the internship! I can't believe it, I'm so happy.",
+    "I miss my friends from home. It has been a lonely week.",
+    "Went for a run in the park and felt great afterwards.",
+    "The exam was harder than expected, I'm worried about my grade.",
+    "Cooked dinner for the first time in weeks; it turned out fine.",
+    "Everything went wrong today and I just want to cry.",
+    "A quiet Sunday with a good book and some tea.",
+]
+
+
+def score(backend, encoded):
+    """Return the softmax probabilities and composite scores of a backend."""
+    return score_logits(backend(encoded))
+
+
+def time_per_request(backend, tokenizer, repeats):
+    """Average latency of scoring the corpus one text at a time, in milliseconds."""
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for text in CORPUS:
+            backend(tokenizer(text, return_tensors="pt"))
+    return (time.perf_counter() - started) * 1000 / (repeats * len(CORPUS))
+
+
+def main():  # pylint: disable=too-many-locals
+    """Compare each selected backend against the FP32 torch baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--backends", nargs="+", default=["torch-int8", "onnx"], choices=BACKENDS
+    )
+    parser.add_argument(
+        "--onnx-path", default=os.getenv("ONNX_MODEL_PATH", "models/model.int8.onnx")
+    )
+    parser.add_argument(
+        "--model",
+        default=os.getenv("MODEL_NAME", "cardiffnlp/twitter-roberta-base-sentiment"),
+    )
+    parser.add_argument("--revision", default=os.getenv("MODEL_REVISION", "main"))
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.05,
+        help="largest allowed absolute probability difference",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model, revision=args.revision)
+
+    def load_model():
+        return AutoModelForSequenceClassification.from_pretrained(
+            args.model, revision=args.revision
+        )
+
+    encoded = tokenizer(CORPUS, return_tensors="pt", padding=True)
+    baseline = load_backend("torch", load_model)
+    base_probabilities, base_composite = score(baseline, encoded)
+    base_latency = time_per_request(baseline, tokenizer, args.repeats)
+    print(f"{'torch (baseline)':<18} latency={base_latency:7.2f} ms/request")
+
+    failed = False
+    for name in args.backends:
+        backend = load_backend(name, load_model, onnx_path=args.onnx_path)
+        probabilities, composite = score(backend, encoded)
+        max_diff = (probabilities - base_probabilities).abs().max().item()
+        composite_diff = (composite - base_composite).abs().max().item()
+        agreement = (
+            (probabilities.argmax(dim=-1) == base_probabilities.argmax(dim=-1))
+            .float()
+            .mean()
+            .item()
+        )
+        latency = time_per_request(backend, tokenizer, args.repeats)
+        ok = max_diff <= args.tolerance
+        failed = failed or not ok
+        print(
+            f"{name:<18} latency={latency:7.2f} ms/request "
+            f"speedup={base_latency / latency:4.2f}x max_prob_diff={max_diff:.4f} "
+            f"max_composite_diff={composite_diff:.4f} label_agreement={agreement:.0%} "
+            f"{'OK' if ok else 'FAIL'}"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Re-score entries whose sentiment was produced by another model version:
+
+    python rescore.py [--batch-size 32] [--rate 5] [--limit 1000] [--restart]
+
+Every stored sentiment records the MODEL_NAME@MODEL_REVISION (and extra
+HEADS) that produced it in sentiment_version. This job lists the other
+versions stored (and null, for entries that were never scored), finds their
+entries through the (sentiment_version, _id) index, and re-scores them in _id
+order a batch at a time through the same bulk path as /analyze/batch, so mood
+rollups and embeddings are updated too.
+
+After each batch the last _id is saved in the rescore_checkpoints
+collection, so a run that crashed or was stopped continues where it left
+off; --restart starts from the beginning, e.g. to retry failed batches.
+Throughput is capped at --rate entries per second and the job pauses while
+the live analysis queue has a backlog, so it doesn't starve new entries.
+Progress, throughput and an ETA are logged after every batch and kept in the
+checkpoint. Stops after the current batch on SIGTERM/SIGINT.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING
+
+from db import db
+from job_queue import JobQueue
+from ml_client import (
+    ANALYSIS_VERSION,
+    ensure_indexes,
+    model_registry,
+    score_texts,
+    store_sentiment_batch,
+)
+
+logger = logging.getLogger("rescore")
+
+RESCORE_BATCH_SIZE = int(os.getenv("RESCORE_BATCH_SIZE", "32"))
+# Entries re-scored per second at most; 0 doesn't limit the rate
+RESCORE_MAX_ENTRIES_PER_SECOND = float(os.getenv("RESCORE_MAX_ENTRIES_PER_SECOND", "5"))
+# Pause while more than this many live analysis jobs are waiting
+RESCORE_PAUSE_BACKLOG = int(os.getenv("RESCORE_PAUSE_BACKLOG", "10"))
+RESCORE_PAUSE_SECONDS = float(os.getenv("RESCORE_PAUSE_SECONDS", "5"))
+
+entries_col = db["entries"]
+checkpoints_col = db["rescore_checkpoints"]
+job_queue = JobQueue(db["analysis_jobs"])
+
+# Index created by ensure_indexes() that stale entries are read through
+STALE_INDEX = [("sentiment_version", ASCENDING), ("_id", ASCENDING)]
+
+
+class Throttle:  # pylint: disable=too-few-public-methods
+    """
+    Spaces out work so that at most rate items are processed per second.
+
+    Args:
+        rate (float): Items per second; 0 or less disables throttling.
+        sleep (callable): Waits for a number of seconds.
+        clock (callable): Monotonic clock in seconds.
+    """
+
+    def __init__(self, rate, sleep=time.sleep, clock=time.monotonic):
+        self.rate = float(rate)
+        self.sleep = sleep
+        self.clock = clock
+        self.next_at = None
+
+    def wait(self, count):
+        """Wait until count more items may be processed."""
+        if self.rate <= 0:
+            return
+        now = self.clock()
+        if self.next_at is not None and self.next_at > now:
+            self.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + count / self.rate
+
+
+def stale_versions(version):
+    """
+    Return the sentiment_version values of entries not scored by version.
+
+    The versions are listed from the index rather than matched with $ne, so
+    the stale entries can be read as ranges of the (sentiment_version, _id)
+    index. None stands for entries that were never scored.
+    """
+    stored = entries_col.distinct("sentiment_version")
+    return [None] + sorted(v for v in stored if v is not None and v != version)
+
+
+def stale_query(versions, after=None):
+    """Return the query for entries with one of the versions, after an _id."""
+    query = {"sentiment_version": {"$in": list(versions)}}
+    if after is not None:
+        query["_id"] = {"$gt": after}
+    return query
+
+
+def load_checkpoint(version, restart=False):
+    """
+    Return the checkpoint of the run re-scoring to version, creating it if needed.
+
+    Args:
+        version (str): The model version entries are re-scored with.
+        restart (bool): Discard a previous run's checkpoint.
+    """
+    if restart:
+        checkpoints_col.delete_one({"_id": version})
+    checkpoint = checkpoints_col.find_one({"_id": version})
+    if checkpoint is None:
+        checkpoint = {
+            "_id": version,
+            "last_id": None,
+            "processed": 0,
+            "failed": 0,
+            "started_at": datetime.now(timezone.utc),
+        }
+        checkpoints_col.insert_one(checkpoint)
+    return checkpoint
+
+
+def save_checkpoint(checkpoint):
+    """Store a checkpoint's progress."""
+    checkpoints_col.update_one(
+        {"_id": checkpoint["_id"]},
+        {
+            "$set": {
+                key: value
+                for key, value in checkpoint.items()
+                if key not in ("_id", "started_at")
+            },
+            "$currentDate": {"updated_at": True},
+        },
+    )
+
+
+def rescore_batch(entries):
+    """
+    Score a batch of entries and store the results.
+
+    Returns:
+        int: The number of entries that failed.
+    """
+    items = [(str(entry["_id"]), entry["_id"], entry.get("text")) for entry in entries]
+    items = [item for item in items if item[2]]
+    failed = len(entries) - len(items)
+    try:
+        results = score_texts([text for _, _, text in items])
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.error("* rescore_batch(): scoring failed: %s", e)
+        return len(entries)
+    _, errors = store_sentiment_batch(
+        [
+            (entry_id, object_id, scores, vector)
+            for (entry_id, object_id, _), (scores, vector) in zip(items, results)
+        ]
+    )
+    for error in errors:
+        logger.warning("* rescore_batch(): %s: %s", error["entry_id"], error["error"])
+    return failed + len(errors)
+
+
+def wait_for_live_traffic(stop_event):
+    """Wait while the live analysis queue has more than RESCORE_PAUSE_BACKLOG jobs."""
+    while not stop_event.is_set():
+        backlog = job_queue.backlog()
+        if backlog <= RESCORE_PAUSE_BACKLOG:
+            return
+        logger.info("* rescore: %d live jobs waiting, pausing", backlog)
+        stop_event.wait(RESCORE_PAUSE_SECONDS)
+
+
+def rescore(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    version=ANALYSIS_VERSION,
+    batch_size=RESCORE_BATCH_SIZE,
+    rate=RESCORE_MAX_ENTRIES_PER_SECOND,
+    limit=None,
+    restart=False,
+    stop_event=None,
+):
+    """
+    Re-score entries not scored by version until none are left.
+
+    Args:
+        version (str): The model version entries should be scored with.
+        batch_size (int): Entries scored and written together.
+        rate (float): Maximum entries per second; 0 is unlimited.
+        limit (int, optional): Stop after this many entries.
+        restart (bool): Ignore the checkpoint of a previous run.
+        stop_event (threading.Event, optional): Stops the run after a batch.
+
+    Returns:
+        dict: The checkpoint, with the totals of every run so far.
+    """
+    stop_event = stop_event or threading.Event()
+    checkpoint = load_checkpoint(version, restart)
+    versions = stale_versions(version)
+    remaining = entries_col.count_documents(
+        stale_query(versions, checkpoint["last_id"]), hint=STALE_INDEX
+    )
+    if limit is not None:
+        remaining = min(remaining, limit)
+    logger.info(
+        "* rescore: %d entries to re-score with %s, %d done before",
+        remaining,
+        version,
+        checkpoint["processed"],
+    )
+    throttle = Throttle(rate, sleep=stop_event.wait)
+    started = time.monotonic()
+    done = 0
+    while not stop_event.is_set() and done < remaining:
+        wait_for_live_traffic(stop_event)
+        entries = list(
+            entries_col.find(stale_query(versions, checkpoint["last_id"]), {"text": 1})
+            .hint(STALE_INDEX)
+            .sort("_id", ASCENDING)
+            .limit(min(batch_size, remaining - done))
+        )
+        if not entries:
+            break
+        throttle.wait(len(entries))
+        if stop_event.is_set():
+            break
+        failed = rescore_batch(entries)
+
+        done += len(entries)
+        checkpoint["last_id"] = entries[-1]["_id"]
+        checkpoint["processed"] += len(entries) - failed
+        checkpoint["failed"] += failed
+        throughput = done / max(time.monotonic() - started, 1e-9)
+        checkpoint["entries_per_second"] = round(throughput, 2)
+        save_checkpoint(checkpoint)
+        logger.info(
+            "* rescore: %d/%d (%.1f%%), %d failed, %.2f entries/s, ETA %ds",
+            done,
+            remaining,
+            100 * done / remaining,
+            checkpoint["failed"],
+            checkpoint["entries_per_second"],
+            (remaining - done) / throughput,
+        )
+    return checkpoint
+
+
+def main():
+    """Run the re-scoring job until it is done or stopped."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=RESCORE_BATCH_SIZE)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=RESCORE_MAX_ENTRIES_PER_SECOND,
+        help="maximum entries per second, 0 for no limit",
+    )
+    parser.add_argument("--limit", type=int, help="stop after this many entries")
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore the previous run's checkpoint"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    ensure_indexes()
+    model_registry.warm_up()
+    stop_event = threading.Event()
+
+    def request_stop(signum, _frame):
+        logger.info("* rescore: received signal %s, stopping after this batch", signum)
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    checkpoint = rescore(
+        batch_size=args.batch_size,
+        rate=args.rate,
+        limit=args.limit,
+        restart=args.restart,
+        stop_event=stop_event,
+    )
+    logger.info(
+        "* rescore: stopped, %d entries re-scored and %d failed in total",
+        checkpoint["processed"],
+        checkpoint["failed"],
+    )
+
+
+if __name__ == "__main__":
+    main()
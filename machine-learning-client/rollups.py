@@ -0,0 +1,227 @@
+"""
+Pre-aggregated mood rollups for the web app's trend charts.
+Each rollup document holds, for one user and one day, ISO week or month, the
+number of analyzed entries, the sum of their composite scores and how many of
+them were mostly negative, neutral or positive. ml-client keeps the rollups
+current with $inc as it stores each sentiment, so trends are read without
+scanning raw entries. The rollups can be rebuilt from the entries with:
+
+    python rollups.py rebuild
+"""
+
+import argparse
+import logging
+from datetime import datetime
+
+from pymongo import ASCENDING, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+LABELS = ("negative", "neutral", "positive")
+
+# Period name -> key format, shared by datetime.strftime and $dateToString
+PERIOD_FORMATS = {"day": "%Y-%m-%d", "week": "%G-W%V", "month": "%Y-%m"}
+
+# Entry fields needed to place a sentiment in its rollups
+ROLLUP_FIELDS = {"user_id": 1, "journal_date": 1, "sentiment": 1}
+
+
+def ensure_indexes(collection):
+    """Create the unique (user_id, period, key) index rollups are found by."""
+    collection.create_index(
+        [("user_id", ASCENDING), ("period", ASCENDING), ("key", ASCENDING)],
+        unique=True,
+    )
+
+
+def period_keys(journal_date):
+    """
+    Return the rollup key of each period for an entry's journal date.
+
+    Returns:
+        dict or None: Period name -> key, or None if the date isn't YYYY-MM-DD.
+    """
+    try:
+        date = datetime.strptime(journal_date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+    return {period: date.strftime(fmt) for period, fmt in PERIOD_FORMATS.items()}
+
+
+def top_label(sentiment):
+    """Return the label with the highest probability; ties go to the first one."""
+    return max(LABELS, key=lambda label: sentiment.get(label, 0))
+
+
+def rollup_increments(new=None, old=None):
+    """
+    Return the $inc that moves a rollup from an old sentiment to a new one.
+
+    Args:
+        new (dict, optional): The sentiment being stored.
+        old (dict, optional): The sentiment it replaces, if the entry was
+            analyzed before.
+
+    Returns:
+        dict: Field -> increment, empty if nothing changes.
+    """
+    increments = {}
+    for sentiment, sign in ((new, 1), (old, -1)):
+        if not sentiment:
+            continue
+        for field, amount in (
+            ("count", sign),
+            ("score_sum", sign * sentiment.get("composite_score", 0)),
+            (f"labels.{top_label(sentiment)}", sign),
+        ):
+            increments[field] = increments.get(field, 0) + amount
+    return {field: amount for field, amount in increments.items() if amount}
+
+
+def rollup_updates(entry, new=None, old=None):
+    """
+    Build the rollup writes for storing a new sentiment on an entry.
+
+    Args:
+        entry (dict): The entry, with at least user_id and journal_date.
+        new (dict, optional): The sentiment being stored.
+        old (dict, optional): The sentiment it replaces.
+
+    Returns:
+        list[UpdateOne]: One upserting $inc per period, or none if the entry
+        has no owner or date or the sentiment didn't change its rollups.
+    """
+    keys = period_keys(entry.get("journal_date"))
+    increments = rollup_increments(new, old)
+    if not entry.get("user_id") or not keys or not increments:
+        return []
+    return [
+        UpdateOne(
+            {"user_id": entry["user_id"], "period": period, "key": key},
+            {"$inc": increments},
+            upsert=True,
+        )
+        for period, key in keys.items()
+    ]
+
+
+def apply_rollups(collection, updates):
+    """Write rollup updates in one unordered bulk_write; failures are logged."""
+    if not updates:
+        return
+    try:
+        collection.bulk_write(updates, ordered=False)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        # the sentiment itself is stored; a rebuild repairs the rollups
+        logger.error("* apply_rollups(): rollup update failed: %s", e)
+
+
+def rebuild_pipeline(period):
+    """Aggregation pipeline computing one period's rollups from the entries."""
+    probabilities = [f"$sentiment.{label}" for label in LABELS]
+    negative, neutral, positive = probabilities
+    is_negative = {
+        "$and": [{"$gte": [negative, neutral]}, {"$gte": [negative, positive]}]
+    }
+    is_neutral = {"$and": [{"$not": [is_negative]}, {"$gte": [neutral, positive]}]}
+    is_positive = {"$and": [{"$not": [is_negative]}, {"$not": [is_neutral]}]}
+    flags = {"negative": is_negative, "neutral": is_neutral, "positive": is_positive}
+    return [
+        {"$match": {"sentiment": {"$type": "object"}, "user_id": {"$exists": True}}},
+        {
+            "$set": {
+                "_date": {
+                    "$dateFromString": {
+                        "dateString": "$journal_date",
+                        "format": "%Y-%m-%d",
+                        "onError": None,
+                        "onNull": None,
+                    }
+                }
+            }
+        },
+        {"$match": {"_date": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": {
+                    "user_id": "$user_id",
+                    "key": {
+                        "$dateToString": {
+                            "date": "$_date",
+                            "format": PERIOD_FORMATS[period],
+                        }
+                    },
+                },
+                "count": {"$sum": 1},
+                "score_sum": {"$sum": "$sentiment.composite_score"},
+                **{
+                    label: {"$sum": {"$cond": [flag, 1, 0]}}
+                    for label, flag in flags.items()
+                },
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "user_id": "$_id.user_id",
+                "period": {"$literal": period},
+                "key": "$_id.key",
+                "count": 1,
+                "score_sum": 1,
+                "labels": {label: f"${label}" for label in LABELS},
+            }
+        },
+    ]
+
+
+def rebuild_rollups(entries, rollups):
+    """
+    Recompute every rollup from the analyzed entries.
+
+    Each period's rollups are computed by an aggregation over the entries and
+    merged on the server into a temporary collection, which then replaces the
+    rollup collection in one rename, so trends are never read half rebuilt.
+    Increments stored while the rebuild runs go to the replaced collection;
+    rebuild again if entries were analyzed meanwhile.
+    """
+    staging = rollups.database[f"{rollups.name}_rebuild"]
+    # left over from an interrupted rebuild
+    staging.drop()
+    ensure_indexes(staging)
+    for period in PERIOD_FORMATS:
+        entries.aggregate(
+            rebuild_pipeline(period)
+            + [
+                {
+                    "$merge": {
+                        "into": staging.name,
+                        "on": ["user_id", "period", "key"],
+                        "whenMatched": "replace",
+                        "whenNotMatched": "insert",
+                    }
+                }
+            ]
+        )
+        logger.info(
+            "* rebuild_rollups(): %d %s rollups",
+            staging.count_documents({"period": period}),
+            period,
+        )
+    staging.rename(rollups.name, dropTarget=True)
+
+
+def main():
+    """Rebuild the mood rollups from the entries collection."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # pylint: disable=import-outside-toplevel
+    from db import db
+
+    rebuild_rollups(db["entries"], db["mood_rollups"])
+
+
+if __name__ == "__main__":
+    main()
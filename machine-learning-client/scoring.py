@@ -0,0 +1,66 @@
+"""
+Vectorized scoring of sentiment model outputs.
+A batch of logits is turned into class probabilities and 1-5 composite
+scores with a handful of torch operations, and converted to Python floats
+once when the per-text results are built.
+"""
+
+import torch
+
+from chunking import aggregate_windows
+
+LABELS = ("negative", "neutral", "positive")
+# Composite score weight of each class: Negative - 1, Neutral - 3, Positive - 5
+COMPOSITE_WEIGHTS = (1, 3, 5)
+
+
+def composite_scores(probabilities):
+    """
+    Map [N, 3] probabilities to composite scores from 1 to 5, rounded to 2 decimals.
+
+    The score is computed in float32 as p_neg * 1 + p_neu * 3 + p_pos * 5,
+    summed left to right and rounded half to even: the same arithmetic as
+    round(score[0] * 1 + score[1] * 3 + score[2] * 5, 2) on a NumPy float32 row,
+    so stored scores don't change.
+    """
+    negative, neutral, positive = COMPOSITE_WEIGHTS
+    composite = (
+        probabilities[:, 0] * negative
+        + probabilities[:, 1] * neutral
+        + probabilities[:, 2] * positive
+    )
+    return torch.round(composite, decimals=2)
+
+
+def score_logits(logits, owners=None, lengths=None, count=None):
+    """
+    Score a batch of logits.
+
+    Args:
+        logits (torch.Tensor): [windows, 3] raw model outputs.
+        owners (list[int], optional): Text index of each window, if texts were
+            split into several windows.
+        lengths (list[int], optional): Token count of each window.
+        count (int, optional): Number of texts.
+
+    Returns:
+        tuple[torch.Tensor, torch.Tensor]: [texts, 3] float32 probabilities and
+        [texts] composite scores.
+    """
+    probabilities = torch.softmax(logits.float(), dim=1)
+    if owners is not None:
+        probabilities = aggregate_windows(probabilities, owners, lengths, count)
+    return probabilities, composite_scores(probabilities)
+
+
+def to_results(probabilities, composite):
+    """
+    Build one result dict of native Python floats per text.
+
+    Returns:
+        list[dict[str, float]]: negative, neutral, positive and composite_score.
+    """
+    return [
+        dict(zip(LABELS, row), composite_score=score)
+        for row, score in zip(probabilities.tolist(), composite.tolist())
+    ]
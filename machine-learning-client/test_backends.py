@@ -0,0 +1,66 @@
+"""Unit tests for the selectable inference backends."""
+
+import pytest
+import torch
+from transformers import RobertaConfig, RobertaForSequenceClassification
+
+from backends import load_backend
+
+
+def tiny_model():
+    """Build a small randomly initialized RoBERTa classifier."""
+    torch.manual_seed(0)
+    config = RobertaConfig(
+        vocab_size=100,
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=64,
+        num_labels=3,
+    )
+    return RobertaForSequenceClassification(config)
+
+
+def encoded_batch():
+    """Build an encoded batch of two padded sequences."""
+    return {
+        "input_ids": torch.tensor([[0, 5, 6, 7, 2], [0, 8, 2, 1, 1]]),
+        "attention_mask": torch.tensor([[1, 1, 1, 1, 1], [1, 1, 1, 0, 0]]),
+    }
+
+
+def test_torch_backend_returns_logits():
+    """The torch backend returns one row of three logits per text."""
+    logits = load_backend("torch", tiny_model)(encoded_batch())
+    assert logits.shape == (2, 3)
+
+
+def test_quantized_backend_matches_fp32():
+    """Dynamic INT8 quantization stays close to the FP32 probabilities."""
+    model = tiny_model()
+    fp32 = torch.softmax(load_backend("torch", lambda: model)(encoded_batch()), -1)
+    int8 = torch.softmax(load_backend("torch-int8", lambda: model)(encoded_batch()), -1)
+    assert torch.allclose(fp32, int8, atol=0.05)
+
+
+def test_unknown_backend_is_rejected():
+    """An unknown backend name raises a ValueError."""
+    with pytest.raises(ValueError):
+        load_backend("tensorrt", tiny_model)
+
+
+def test_torch_backend_forward_pools_unpadded_tokens():
+    """forward() returns the logits and one mean-pooled embedding per text."""
+    backend = load_backend("torch", tiny_model)
+    logits, pooled = backend.forward(encoded_batch())
+    assert torch.allclose(logits, backend(encoded_batch()), atol=1e-6)
+    assert pooled.shape == (2, 32)
+    # padding doesn't change the second text's embedding
+    _, alone = backend.forward(
+        {
+            "input_ids": torch.tensor([[0, 8, 2]]),
+            "attention_mask": torch.tensor([[1, 1, 1]]),
+        }
+    )
+    assert torch.allclose(pooled[1], alone[0], atol=1e-5)
@@ -0,0 +1,81 @@
+"""Unit tests for the micro-batching scheduler."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from batching import MicroBatcher
+
+
+def test_concurrent_submits_share_a_batch():
+    """Items submitted together are processed in one call, each caller its result."""
+    calls = []
+    start = threading.Barrier(4)
+
+    def process(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    # the wait is long enough that only a full batch closes it in time
+    batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=5000, name="t1")
+
+    def submit(n):
+        start.wait(timeout=2)
+        return batcher.submit(n).result(timeout=2)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(submit, n) for n in range(4)]
+        results = [future.result(timeout=4) for future in futures]
+
+    assert results == [0, 2, 4, 6]
+    assert len(calls) == 1
+    assert sorted(calls[0]) == [0, 1, 2, 3]
+
+
+def test_batch_size_is_bounded():
+    """A batch never exceeds max_batch_size items."""
+    sizes = []
+
+    def process(items):
+        sizes.append(len(items))
+        return items
+
+    batcher = MicroBatcher(process, max_batch_size=3, max_wait_ms=50, name="t2")
+    futures = [batcher.submit(n) for n in range(7)]
+    assert [future.result(timeout=2) for future in futures] == list(range(7))
+    assert max(sizes) <= 3
+    assert batcher.batch_size_hist.snapshot()["count"] == len(sizes)
+    assert batcher.queue_wait_hist.snapshot()["count"] == 7
+
+
+def test_batch_failure_propagates_to_every_caller():
+    """An exception in the batched function is raised for each caller."""
+
+    def process(items):
+        raise ValueError(f"bad batch of {len(items)}")
+
+    batcher = MicroBatcher(process, max_batch_size=2, max_wait_ms=5, name="t3")
+    futures = [batcher.submit("a"), batcher.submit("b")]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=2)
+
+
+def test_missing_results_fail_every_caller():
+    """A batched function returning too few results fails the batch, not hangs it."""
+    batcher = MicroBatcher(lambda items: items[:1], max_batch_size=2, name="t5")
+    futures = [batcher.submit("a"), batcher.submit("b")]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=2)
+
+
+def test_shutdown_drains_queued_items():
+    """Shutdown waits for queued items and then rejects new ones."""
+    batcher = MicroBatcher(lambda items: items, max_batch_size=2, name="t4")
+    futures = [batcher.submit(n) for n in range(5)]
+
+    assert batcher.shutdown(timeout=2) is True
+    assert all(future.done() for future in futures)
+    with pytest.raises(RuntimeError):
+        batcher.submit(5)
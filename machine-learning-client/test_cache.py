@@ -0,0 +1,98 @@
+"""Unit tests for the sentiment result cache."""
+
+from unittest.mock import MagicMock, patch
+
+from pymongo.errors import OperationFailure
+
+from cache import SentimentCache
+
+SCORES = {"negative": 0.1, "neutral": 0.2, "positive": 0.7, "composite_score": 4.2}
+
+
+def test_cache_hit_and_miss():
+    """A stored result is returned for the same text only."""
+    cache = SentimentCache("model@main", max_size=8)
+    hits, misses = cache.hits.value, cache.misses.value
+
+    assert cache.get("A good day") is None
+    cache.set("A good day", SCORES)
+
+    assert cache.get("A good day") == SCORES
+    assert cache.get("  A good day\r\n") is None
+    assert cache.hits.value == hits + 1
+    assert cache.misses.value == misses + 2
+
+
+def test_cache_keys_include_model_version():
+    """Results from another model version are never returned."""
+    assert SentimentCache("model@v1").key("text") != SentimentCache("model@v2").key(
+        "text"
+    )
+
+
+def test_cache_lru_eviction():
+    """The least recently used result is evicted when the cache is full."""
+    cache = SentimentCache("model@main", max_size=2)
+    evictions = cache.evictions.value
+    cache.set("first", SCORES)
+    cache.set("second", SCORES)
+    cache.get("first")
+    cache.set("third", SCORES)
+
+    assert cache.get("second") is None
+    assert cache.get("first") == SCORES
+    assert cache.evictions.value == evictions + 1
+
+
+def test_cache_ttl_expiry():
+    """A result older than the TTL is treated as a miss."""
+    cache = SentimentCache("model@main", max_size=2, ttl_seconds=10)
+    with patch("cache.time.monotonic", return_value=100.0):
+        cache.set("old entry", SCORES)
+    with patch("cache.time.monotonic", return_value=111.0):
+        assert cache.get("old entry") is None
+
+
+def test_cache_keeps_embeddings():
+    """The embedding stored with a result is returned by lookup."""
+    cache = SentimentCache("model@main", max_size=8)
+    cache.set("A good day", SCORES, b"\x00\x3c")
+
+    assert cache.lookup("A good day") == (SCORES, b"\x00\x3c")
+    assert cache.lookup("Another day") is None
+
+
+def test_cache_persistent_tier():
+    """Misses fall back to the Mongo tier, which is purged of other model versions."""
+    collection = MagicMock()
+    collection.find_one.return_value = {"scores": SCORES, "vector": b"\x00\x3c"}
+    cache = SentimentCache("model@main", collection=collection)
+
+    assert cache.lookup("shared entry") == (SCORES, b"\x00\x3c")
+    assert collection.find_one.call_args[0][0]["vector"] == {"$exists": True}
+    collection.delete_many.assert_called_once_with({"model": {"$ne": "model@main"}})
+
+    cache.set("new entry", SCORES, b"\x00\x3c")
+    update = collection.update_one.call_args[0][1]
+    assert update["$set"]["vector"] == b"\x00\x3c"
+
+
+def test_cache_persistent_tier_updates_changed_ttl():
+    """A TTL index created with another TTL is changed in place with collMod."""
+    collection = MagicMock()
+    collection.name = "sentiment_cache"
+    collection.create_index.side_effect = OperationFailure(
+        "Index with name: created_at_1 already exists with different options",
+        code=85,
+    )
+    collection.find_one.return_value = {"scores": SCORES, "vector": None}
+    cache = SentimentCache("model@main", ttl_seconds=3600, collection=collection)
+
+    assert cache.get("shared entry") == SCORES
+    assert cache.get("other entry") == SCORES
+    collection.database.command.assert_called_once_with(
+        "collMod",
+        "sentiment_cache",
+        index={"keyPattern": {"created_at": 1}, "expireAfterSeconds": 3600},
+    )
+    collection.create_index.assert_called_once()
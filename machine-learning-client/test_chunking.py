@@ -0,0 +1,141 @@
+"""Unit tests for sliding-window chunking of long entries."""
+
+import pytest
+import torch
+from chunking import (
+    aggregate_windows,
+    bucket_by_length,
+    encode_buckets,
+    encode_windows,
+    forward_buckets,
+    input_tokens_hist,
+    padding_waste_hist,
+    window_starts,
+)
+
+
+class FakeTokenizer:  # pylint: disable=too-few-public-methods
+    """Tokenizer that maps each word to one token id."""
+
+    cls_token_id = 0
+    pad_token_id = 1
+    sep_token_id = 2
+
+    def __call__(self, texts, add_special_tokens=True):
+        assert add_special_tokens is False
+        return {"input_ids": [[10 + n for n in range(len(t.split()))] for t in texts]}
+
+
+def test_short_text_is_a_single_window():
+    """A text within the limit is not split."""
+    assert window_starts(5, window_size=10, stride=8, max_windows=4) == [0]
+
+
+def test_long_text_windows_overlap_and_cover_the_end():
+    """Windows advance by the stride and the last one ends with the text."""
+    assert window_starts(25, window_size=10, stride=8, max_windows=4) == [0, 8, 15]
+
+
+def test_window_cap_spreads_windows_over_the_text():
+    """With too many windows, the capped windows still span the whole text."""
+    starts = window_starts(1000, window_size=10, stride=8, max_windows=3)
+    assert starts == [0, 495, 990]
+
+
+def test_window_cap_skips_tokens_between_windows():
+    """Capped windows bound the cost but leave the tokens between them unscored."""
+    length, window_size = 100, 10
+    uncapped = window_starts(length, window_size, stride=8, max_windows=100)
+    capped = window_starts(length, window_size, stride=8, max_windows=4)
+
+    def covered(starts):
+        return {
+            token for start in starts for token in range(start, start + window_size)
+        }
+
+    assert covered(uncapped) == set(range(length))
+    assert len(capped) == 4
+    assert capped[0] == 0 and capped[-1] + window_size == length
+    assert len(covered(capped)) == 4 * window_size
+
+
+def test_encode_windows_pads_every_window():
+    """All windows of all texts are padded into one batch."""
+    encoded, owners, lengths = encode_windows(
+        FakeTokenizer(), ["one two", "a b c d e f"], 4, 1, 8
+    )
+    assert owners == [0, 1, 1]
+    assert lengths == [2, 4, 4]
+    assert encoded["input_ids"].shape == (3, 6)
+    assert encoded["input_ids"][0].tolist() == [0, 10, 11, 2, 1, 1]
+    assert encoded["attention_mask"][0].tolist() == [1, 1, 1, 1, 0, 0]
+
+
+def test_aggregate_windows_weights_by_length():
+    """Each text's probabilities are the length-weighted mean of its windows."""
+    probabilities = torch.tensor([[0.1, 0.2, 0.7], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]])
+    result = aggregate_windows(probabilities, [0, 1, 1], [5, 3, 1], count=2)
+    assert result[0].tolist() == pytest.approx([0.1, 0.2, 0.7])
+    assert result[1].tolist() == pytest.approx([0.75, 0.0, 0.25])
+
+
+def test_encode_windows_records_token_lengths():
+    """Test the token length of every text is recorded."""
+    before = input_tokens_hist.snapshot()["count"]
+    encode_windows(FakeTokenizer(), ["a b c", "a b c d e f g h"], 4, 1, 8)
+    assert input_tokens_hist.snapshot()["count"] == before + 2
+
+
+def test_bucket_by_length_respects_token_budget():
+    """Windows are sorted by length and each bucket fits the padded budget."""
+    windows = [[0] * 9, [0] * 2, [0] * 3, [0] * 8, [0] * 2]
+    buckets = bucket_by_length(windows, max_bucket_tokens=16)
+    assert buckets == [[1, 4, 2], [3], [0]]
+    for bucket in buckets:
+        width = max(len(windows[index]) for index in bucket)
+        assert len(bucket) * width <= 16
+
+
+def test_encode_buckets_pads_each_bucket_to_its_longest_window():
+    """Short texts aren't padded to the length of a long one."""
+    before = padding_waste_hist.snapshot()["count"]
+    buckets, owners, lengths = encode_buckets(
+        FakeTokenizer(), ["a b c d e f g h", "one", "two"], 10, 1, 8, 12
+    )
+    assert owners == [0, 1, 2]
+    assert lengths == [8, 1, 1]
+    assert [indices for indices, _ in buckets] == [[1, 2], [0]]
+    assert buckets[0][1]["input_ids"].shape == (2, 3)
+    assert buckets[1][1]["input_ids"].shape == (1, 10)
+    assert padding_waste_hist.snapshot()["count"] == before + 1
+
+
+def test_forward_buckets_restores_window_order():
+    """Logits of every bucket are put back at their window's position."""
+    buckets, _, _ = encode_buckets(
+        FakeTokenizer(), ["a b c d e f g h", "one", "two words"], 10, 1, 8, 12
+    )
+
+    def backend(encoded):
+        # One row per window holding its token count
+        tokens = encoded["attention_mask"].sum(dim=1, keepdim=True).float()
+        return torch.cat([tokens, -tokens], dim=1)
+
+    logits = forward_buckets(backend, buckets, 3)
+    assert logits[:, 0].tolist() == [10.0, 3.0, 4.0]
+
+
+def test_forward_buckets_scatters_every_output():
+    """Tuple outputs are each put back in window order; missing outputs stay None."""
+    buckets, _, _ = encode_buckets(
+        FakeTokenizer(), ["a b c d e f g h", "one", "two words"], 10, 1, 8, 12
+    )
+
+    def backend(encoded):
+        tokens = encoded["attention_mask"].sum(dim=1, keepdim=True).float()
+        return torch.cat([tokens, -tokens], dim=1), tokens * 2, None
+
+    logits, pooled, missing = forward_buckets(backend, buckets, 3)
+    assert logits[:, 0].tolist() == [10.0, 3.0, 4.0]
+    assert pooled[:, 0].tolist() == [20.0, 6.0, 8.0]
+    assert missing is None
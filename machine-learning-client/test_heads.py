@@ -0,0 +1,56 @@
+"""Unit tests for the extra analysis heads."""
+
+import pytest
+import torch
+
+from heads import LinearHead, head_results, load_heads, parse_heads, save_head
+
+
+def test_parse_heads():
+    """HEADS is a list of name=path pairs; sentiment and duplicates are rejected."""
+    assert not parse_heads("")
+    assert parse_heads(" emotion=a.pt, intensity = b.pt ") == [
+        ("emotion", "a.pt"),
+        ("intensity", "b.pt"),
+    ]
+    for spec in ("emotion", "sentiment=a.pt", "a=x.pt,a=y.pt"):
+        with pytest.raises(ValueError):
+            parse_heads(spec)
+
+
+def test_saved_head_round_trips(tmp_path):
+    """A head saved with save_head loads with the same labels and outputs."""
+    path = tmp_path / "emotion.pt"
+    weight = torch.randn(3, 8)
+    save_head(path, ["joy", "anger", "sadness"], weight, torch.zeros(3))
+
+    (head,) = load_heads(f"emotion={path}")
+    pooled = torch.randn(2, 8)
+    assert head.labels == ("joy", "anger", "sadness")
+    assert torch.allclose(head(pooled), torch.softmax(pooled @ weight.T, dim=1))
+
+
+def test_head_rejects_mismatched_shapes():
+    """Weights must match the labels and the model's hidden size."""
+    with pytest.raises(ValueError):
+        LinearHead("emotion", ["joy", "anger"], torch.zeros(3, 8), torch.zeros(3))
+    with pytest.raises(ValueError):
+        LinearHead("emotion", ["joy"], torch.zeros(1, 8), torch.zeros(1), "relu")
+    head = LinearHead("intensity", ["intensity"], torch.zeros(1, 8), torch.zeros(1))
+    with pytest.raises(ValueError):
+        head(torch.zeros(1, 4))
+
+
+def test_head_results_combine_windows_per_text():
+    """Every head's scores are length-weighted over each text's windows."""
+    intensity = LinearHead(
+        "intensity", ["intensity"], torch.tensor([[1.0, 0.0]]), [0.0], "identity"
+    )
+    joy = LinearHead("emotion", ["joy"], torch.tensor([[0.0, 1.0]]), [0.0], "sigmoid")
+    pooled = torch.tensor([[1.0, 0.0], [4.0, 0.0], [2.0, 0.0]])
+
+    results = head_results([intensity, joy], pooled, [0, 0, 1], [3, 1, 2], 2)
+
+    assert results[0]["intensity"]["intensity"] == pytest.approx(1.75)
+    assert results[1]["intensity"]["intensity"] == pytest.approx(2.0)
+    assert results[1]["emotion"]["joy"] == pytest.approx(0.5)
@@ -0,0 +1,126 @@
+"""Unit tests for the MongoDB-backed analysis job queue."""
+
+from unittest.mock import MagicMock
+
+from bson.objectid import ObjectId
+from job_queue import DEAD, QUEUED, RUNNING, JobQueue, new_job, utcnow
+
+
+def make_job(attempts):
+    """Build a claimed job document."""
+    return {
+        "_id": ObjectId(),
+        "entry_id": "507f1f77bcf86cd799439011",
+        "text": "A calm day",
+        "status": RUNNING,
+        "worker_id": "worker-1",
+        "attempts": attempts,
+    }
+
+
+def test_claim_uses_atomic_find_one_and_update():
+    """Claiming marks the job running with a lease and counts the attempt."""
+    collection = MagicMock()
+    collection.find_one_and_update.return_value = make_job(attempts=1)
+    queue = JobQueue(collection, lease_seconds=30)
+
+    job = queue.claim("worker-1")
+
+    assert job["status"] == RUNNING
+    query, update = collection.find_one_and_update.call_args[0]
+    assert [clause["status"] for clause in query["$or"]] == [QUEUED, RUNNING]
+    assert update["$set"]["worker_id"] == "worker-1"
+    assert update["$inc"] == {"attempts": 1}
+
+
+def test_claim_matches_jobs_written_by_the_web_app():
+    """A job as web-app's enqueue_analysis writes it is due for claim()."""
+    created = utcnow()
+    job = new_job("507f1f77bcf86cd799439011", "A calm day", now=created)
+    # keep in sync with test_submit_entry_async in web-app/test_app.py
+    assert job == {
+        "entry_id": "507f1f77bcf86cd799439011",
+        "text": "A calm day",
+        "status": "queued",
+        "attempts": 0,
+        "available_at": created,
+        "created_at": created,
+    }
+    collection = MagicMock()
+    collection.find_one_and_update.return_value = None
+    JobQueue(collection).claim("worker-1")
+
+    due = collection.find_one_and_update.call_args[0][0]["$or"][0]
+    assert job["status"] == due["status"]
+    assert job["available_at"] <= due["available_at"]["$lte"]
+    assert collection.find_one_and_update.call_args[1]["sort"] == [("available_at", 1)]
+
+
+def test_claim_returns_none_when_queue_is_empty():
+    """No job is returned when nothing is available."""
+    collection = MagicMock()
+    collection.find_one_and_update.return_value = None
+    assert JobQueue(collection).claim("worker-1") is None
+
+
+def test_claim_dead_letters_jobs_over_attempt_limit():
+    """A reclaimed job past its attempt limit is dead-lettered, not returned."""
+    collection = MagicMock()
+    job = make_job(attempts=4)
+    collection.find_one_and_update.side_effect = [job, None]
+    collection.update_one.return_value.modified_count = 1
+    on_dead_letter = MagicMock()
+    queue = JobQueue(collection, max_attempts=3, on_dead_letter=on_dead_letter)
+
+    assert queue.claim("worker-1") is None
+    assert collection.update_one.call_args[0][1]["$set"]["status"] == DEAD
+    on_dead_letter.assert_called_once_with(job)
+
+
+def test_fail_schedules_retry_with_backoff():
+    """A failed attempt below the limit is re-queued with exponential backoff."""
+    collection = MagicMock()
+    queue = JobQueue(collection, max_attempts=3, retry_base_seconds=5)
+
+    assert queue.fail(make_job(attempts=2), RuntimeError("boom")) is False
+    update = collection.update_one.call_args[0][1]
+    assert update["$set"]["status"] == QUEUED
+    assert update["$set"]["last_error"] == "boom"
+
+
+def test_fail_dead_letters_on_last_attempt():
+    """The final failed attempt moves the job to the dead-letter state."""
+    collection = MagicMock()
+    collection.update_one.return_value.modified_count = 1
+    on_dead_letter = MagicMock()
+    queue = JobQueue(collection, max_attempts=3, on_dead_letter=on_dead_letter)
+    job = make_job(attempts=3)
+
+    assert queue.fail(job, RuntimeError("boom")) is True
+    query, update = collection.update_one.call_args[0]
+    assert query == {"_id": job["_id"], "status": RUNNING, "worker_id": "worker-1"}
+    assert update["$set"]["status"] == DEAD
+    on_dead_letter.assert_called_once_with(job)
+
+
+def test_fail_leaves_jobs_leased_by_another_worker():
+    """A job re-leased by another worker isn't dead-lettered by the old one."""
+    collection = MagicMock()
+    collection.update_one.return_value.modified_count = 0
+    on_dead_letter = MagicMock()
+    queue = JobQueue(collection, max_attempts=3, on_dead_letter=on_dead_letter)
+
+    assert queue.fail(make_job(attempts=3), RuntimeError("boom")) is False
+    on_dead_letter.assert_not_called()
+
+
+def test_complete_only_removes_own_lease():
+    """Completing a job deletes it only while this worker still holds the lease."""
+    collection = MagicMock()
+    collection.delete_one.return_value.deleted_count = 1
+    job = make_job(attempts=1)
+
+    assert JobQueue(collection).complete(job) is True
+    collection.delete_one.assert_called_once_with(
+        {"_id": job["_id"], "status": RUNNING, "worker_id": "worker-1"}
+    )
@@ -0,0 +1,51 @@
+"""Unit tests for lazy model loading."""
+
+import os
+
+import pytest
+from model_registry import ModelRegistry, SNAPSHOT_VERSION_FILE, snapshot_source
+
+
+def test_model_is_loaded_once_on_first_use():
+    """The loader runs on the first get() only."""
+    calls = []
+    registry = ModelRegistry(lambda: calls.append(1) or "model")
+
+    assert not registry.loaded
+    assert registry.get() == "model"
+    assert registry.get() == "model"
+    assert calls == [1]
+
+
+def test_ready_after_warm_up():
+    """The registry is ready only after the warm-up inference has run."""
+    warmed = []
+    registry = ModelRegistry(lambda: "model", warmup=warmed.append)
+
+    registry.get()
+    assert not registry.ready
+    registry.warm_up()
+    assert registry.ready
+    assert warmed == ["model"]
+
+
+def test_load_error_is_recorded():
+    """A failed load is reported and retried on the next call."""
+
+    def loader():
+        raise OSError("no network")
+
+    registry = ModelRegistry(loader)
+    with pytest.raises(OSError):
+        registry.get()
+    assert isinstance(registry.error, OSError)
+    assert not registry.loaded
+
+
+def test_snapshot_source_checks_version(tmp_path):
+    """A snapshot is only used when it holds the requested model version."""
+    (tmp_path / SNAPSHOT_VERSION_FILE).write_text("model@main", encoding="utf-8")
+
+    assert snapshot_source(str(tmp_path), "model@main") == str(tmp_path)
+    assert snapshot_source(str(tmp_path), "model@v2") is None
+    assert snapshot_source(os.path.join(str(tmp_path), "missing"), "model@main") is None
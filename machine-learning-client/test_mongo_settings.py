@@ -0,0 +1,55 @@
+"""Unit tests for the shared MongoDB connection settings."""
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import metrics
+from mongo_settings import PoolMetrics, client_options, write_concern
+
+
+def test_write_concern_per_operation():
+    """Test per-operation write concerns are read from the environment."""
+    with patch.dict(
+        "os.environ",
+        {
+            "MONGO_WRITE_CONCERN_SENTIMENT": "0",
+            "MONGO_WRITE_CONCERN_JOBS": "majority:j",
+        },
+    ):
+        assert not write_concern("sentiment").acknowledged
+        assert write_concern("jobs").document == {"w": "majority", "j": True}
+        assert write_concern("rollups") is None
+
+
+def test_client_options_timeouts_and_compressors():
+    """Test only configured timeouts are passed to MongoClient."""
+    with patch.dict(
+        "os.environ", {"MONGO_SERVER_SELECTION_TIMEOUT_MS": "2000"}, clear=False
+    ), patch("mongo_settings.MONGO_COMPRESSORS", "zstd,snappy"):
+        options = client_options()
+    assert options["serverSelectionTimeoutMS"] == 2000
+    assert "socketTimeoutMS" not in options
+    assert options["compressors"] == "zstd,snappy"
+    assert isinstance(options["event_listeners"][0], PoolMetrics)
+    assert "directConnection" not in options
+
+
+def test_client_options_direct_connection():
+    """Test MONGO_DIRECT_CONNECTION connects to the configured host only."""
+    with patch("mongo_settings.MONGO_DIRECT_CONNECTION", True):
+        assert client_options()["directConnection"] is True
+
+
+def test_pool_metrics_track_checkouts():
+    """Test checkouts update the in-use gauge, utilization and wait histogram."""
+    listener = PoolMetrics(max_pool_size=4)
+    before = listener.checked_out.value
+    waits = listener.wait.snapshot()["count"]
+
+    listener.connection_checked_out(SimpleNamespace(duration=0.002))
+    assert listener.checked_out.value == before + 1
+    assert metrics.snapshot()["mongo_pool_utilization"]["value"] == (before + 1) / 4
+    assert listener.wait.snapshot()["count"] == waits + 1
+
+    listener.connection_checked_in(SimpleNamespace())
+    assert listener.checked_out.value == before
@@ -0,0 +1,98 @@
+"""Unit tests for the resumable re-scoring job."""
+
+from unittest.mock import patch
+
+from bson.objectid import ObjectId
+
+import rescore
+from rescore import Throttle, stale_query, stale_versions
+
+
+def test_throttle_spaces_batches_by_rate():
+    """Batches after the first wait until the rate allows them."""
+    now = [100.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    throttle = Throttle(10, sleep=sleep, clock=lambda: now[0])
+    throttle.wait(5)
+    throttle.wait(5)
+    now[0] += 2
+    throttle.wait(5)
+    assert sleeps == [0.5]
+    Throttle(0, sleep=sleep).wait(1000)
+    assert sleeps == [0.5]
+
+
+@patch("rescore.entries_col")
+def test_stale_query_lists_other_versions(mock_entries):
+    """Entries of other versions or never scored, after the checkpoint, are stale."""
+    mock_entries.distinct.return_value = ["model@v2", None, "model@v1+emotion"]
+    last_id = ObjectId()
+    versions = stale_versions("model@v2")
+    assert versions == [None, "model@v1+emotion"]
+    assert stale_query(versions) == {
+        "sentiment_version": {"$in": [None, "model@v1+emotion"]}
+    }
+    assert stale_query(versions, last_id)["_id"] == {"$gt": last_id}
+
+
+@patch("rescore.store_sentiment_batch")
+@patch("rescore.score_texts")
+@patch("rescore.job_queue")
+@patch("rescore.checkpoints_col")
+@patch("rescore.entries_col")
+def test_rescore_resumes_from_checkpoint(
+    mock_entries, mock_checkpoints, mock_job_queue, mock_score, mock_store
+):
+    """Batches start after the saved _id and the checkpoint advances with each."""
+    last_id = ObjectId()
+    entries = [{"_id": ObjectId(), "text": f"entry {n}"} for n in range(3)]
+    mock_checkpoints.find_one.return_value = {
+        "_id": "model@v2",
+        "last_id": last_id,
+        "processed": 10,
+        "failed": 0,
+    }
+    mock_entries.distinct.return_value = ["model@v1"]
+    mock_entries.count_documents.return_value = 3
+    cursor = mock_entries.find.return_value.hint.return_value
+    cursor.sort.return_value.limit.side_effect = [
+        entries[:2],
+        entries[2:],
+    ]
+    mock_job_queue.backlog.return_value = 0
+    mock_score.side_effect = lambda texts: [({"composite_score": 3.0}, None)] * len(
+        texts
+    )
+    mock_store.return_value = (1, [{"entry_id": str(entries[2]["_id"]), "error": "x"}])
+
+    checkpoint = rescore.rescore("model@v2", batch_size=2, rate=0)
+
+    first_query = mock_entries.find.call_args_list[0][0][0]
+    assert first_query == {
+        "sentiment_version": {"$in": [None, "model@v1"]},
+        "_id": {"$gt": last_id},
+    }
+    mock_entries.find.return_value.hint.assert_called_with(rescore.STALE_INDEX)
+    assert mock_entries.count_documents.call_args[1]["hint"] == rescore.STALE_INDEX
+    assert mock_entries.find.call_args_list[1][0][0]["_id"] == {
+        "$gt": entries[1]["_id"]
+    }
+    assert checkpoint["last_id"] == entries[2]["_id"]
+    assert checkpoint["processed"] == 11
+    assert checkpoint["failed"] == 2
+    assert mock_checkpoints.update_one.call_count == 2
+    mock_checkpoints.insert_one.assert_not_called()
+
+
+@patch("rescore.RESCORE_PAUSE_SECONDS", 0)
+@patch("rescore.job_queue")
+def test_waits_while_live_queue_has_backlog(mock_job_queue):
+    """The job pauses until the live analysis backlog drains."""
+    mock_job_queue.backlog.side_effect = [50, 11, 3]
+    rescore.wait_for_live_traffic(rescore.threading.Event())
+    assert mock_job_queue.backlog.call_count == 3
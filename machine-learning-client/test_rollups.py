@@ -0,0 +1,87 @@
+"""Unit tests for the incremental mood rollups."""
+
+from unittest.mock import MagicMock
+
+from rollups import (
+    LABELS,
+    PERIOD_FORMATS,
+    period_keys,
+    rebuild_pipeline,
+    rebuild_rollups,
+    rollup_increments,
+    rollup_updates,
+)
+
+POSITIVE = {"negative": 0.1, "neutral": 0.2, "positive": 0.7, "composite_score": 4.2}
+NEGATIVE = {"negative": 0.8, "neutral": 0.1, "positive": 0.1, "composite_score": 1.6}
+
+
+def test_period_keys():
+    """Test an entry date maps to its day, ISO week and month."""
+    assert period_keys("2025-01-01") == {
+        "day": "2025-01-01",
+        "week": "2025-W01",
+        "month": "2025-01",
+    }
+    assert period_keys("2024-12-30")["week"] == "2025-W01"
+    assert period_keys("not a date") is None
+    assert period_keys(None) is None
+
+
+def test_first_analysis_increments_rollups():
+    """Test a new sentiment adds one entry, its score and its top label."""
+    assert rollup_increments(new=POSITIVE) == {
+        "count": 1,
+        "score_sum": 4.2,
+        "labels.positive": 1,
+    }
+
+
+def test_rescore_moves_rollups_by_the_difference():
+    """Test replacing a sentiment keeps the count and moves the score and label."""
+    increments = rollup_increments(new=NEGATIVE, old=POSITIVE)
+    assert "count" not in increments
+    assert round(increments["score_sum"], 6) == -2.6
+    assert increments["labels.negative"] == 1
+    assert increments["labels.positive"] == -1
+    assert not rollup_increments(new=POSITIVE, old=POSITIVE.copy())
+
+
+def test_rollup_updates_upsert_one_document_per_period():
+    """Test one upserting $inc is built per period for the entry's owner."""
+    entry = {"user_id": "user-1", "journal_date": "2025-04-08"}
+    updates = rollup_updates(entry, new=POSITIVE)
+    filters = [update._filter for update in updates]  # pylint: disable=protected-access
+    assert filters == [
+        {"user_id": "user-1", "period": "day", "key": "2025-04-08"},
+        {"user_id": "user-1", "period": "week", "key": "2025-W15"},
+        {"user_id": "user-1", "period": "month", "key": "2025-04"},
+    ]
+    assert all(update._upsert for update in updates)  # pylint: disable=protected-access
+
+
+def test_rollup_updates_skip_entries_without_owner_or_date():
+    """Test entries that can't be placed in a rollup produce no writes."""
+    assert not rollup_updates({"journal_date": "2025-04-08"}, new=POSITIVE)
+    assert not rollup_updates({"user_id": "user-1"}, new=POSITIVE)
+
+
+def test_rebuild_merges_each_period():
+    """Test a rebuild aggregates each period into a collection swapped in at the end."""
+    entries = MagicMock()
+    rollups = MagicMock()
+    rollups.name = "mood_rollups"
+    staging = rollups.database.__getitem__.return_value
+    staging.name = "mood_rollups_rebuild"
+    staging.count_documents.return_value = 0
+
+    rebuild_rollups(entries, rollups)
+
+    rollups.database.__getitem__.assert_called_once_with("mood_rollups_rebuild")
+    assert entries.aggregate.call_count == len(PERIOD_FORMATS)
+    pipeline = entries.aggregate.call_args[0][0]
+    assert pipeline[-1]["$merge"]["into"] == "mood_rollups_rebuild"
+    assert set(rebuild_pipeline("day")[-1]["$project"]["labels"]) == set(LABELS)
+    staging.create_index.assert_called_once()
+    staging.rename.assert_called_once_with("mood_rollups", dropTarget=True)
+    rollups.delete_many.assert_not_called()
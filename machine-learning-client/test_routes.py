@@ -1,8 +1,10 @@
 """unit tests for ml-client routes"""
 
+from concurrent.futures import Future
 from unittest.mock import patch
 import pytest
-from ml_client import app
+from bson.objectid import ObjectId
+from ml_client import ANALYSIS_VERSION, app, sentiment_cache
 
 
 @pytest.fixture
@@ -13,19 +15,28 @@ def client():
         yield test_client
 
 
+@patch("ml_client.rollups_col")
 @patch("ml_client.entries_col")
-@patch("ml_client.analyze_sentiment")
+@patch("ml_client.analyze_text")
 def test_analyze_and_store_success(
-    mock_analyze, mock_entries_col, client
+    mock_analyze, mock_entries_col, mock_rollups_col, client
 ):  # pylint: disable=redefined-outer-name
     """Test the /analyze route for successful sentiment analysis and DB update."""
     test_entry_id = "507f1f77bcf86cd799439011"
     test_text = "I love this app!"
-    mock_analyze.return_value = {
-        "negative": 0.01,
-        "neutral": 0.15,
-        "positive": 0.84,
-        "composite_score": 4.53,
+    mock_analyze.return_value = (
+        {
+            "negative": 0.01,
+            "neutral": 0.15,
+            "positive": 0.84,
+            "composite_score": 4.53,
+        },
+        None,
+    )
+    mock_entries_col.find_one_and_update.return_value = {
+        "_id": test_entry_id,
+        "user_id": "user-1",
+        "journal_date": "2025-04-08",
     }
 
     response = client.post(
@@ -38,4 +49,318 @@ def test_analyze_and_store_success(
     assert data["entry_id"] == test_entry_id
 
     mock_analyze.assert_called_once_with(test_text)
-    mock_entries_col.update_one.assert_called_once()
+    mock_entries_col.find_one_and_update.assert_called_once()
+    assert "upsert" not in mock_entries_col.find_one_and_update.call_args[1]
+    update = mock_entries_col.find_one_and_update.call_args[0][1]
+    assert update["$currentDate"] == {"sentiment_updated_at": True}
+    # day, week and month rollups of the entry's owner
+    assert len(mock_rollups_col.bulk_write.call_args[0][0]) == 3
+
+
+@patch("ml_client.entries_col")
+@patch("ml_client.analyze_texts")
+def test_analyze_batch_success(
+    mock_analyze_batch, mock_entries_col, client
+):  # pylint: disable=redefined-outer-name
+    """Test the /analyze/batch route scores entries and writes them in one bulk_write."""
+    scores = {
+        "negative": 0.01,
+        "neutral": 0.15,
+        "positive": 0.84,
+        "composite_score": 4.53,
+    }
+    mock_analyze_batch.side_effect = lambda texts: [(scores, None)] * len(texts)
+    entries = [
+        {"entry_id": "507f1f77bcf86cd799439011", "text": "I love this app!"},
+        {"entry_id": "507f1f77bcf86cd799439012", "text": "Another good day"},
+    ]
+    mock_entries_col.find.return_value = [
+        {"_id": ObjectId(entry["entry_id"])} for entry in entries
+    ]
+
+    response = client.post("/analyze/batch", json={"entries": entries})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["updated"] == 2
+    assert data["errors"] == []
+    mock_entries_col.bulk_write.assert_called_once()
+    operations = mock_entries_col.bulk_write.call_args[0][0]
+    assert len(operations) == 2
+    # pylint: disable-next=protected-access
+    assert not any(operation._upsert for operation in operations)
+    assert mock_entries_col.bulk_write.call_args[1]["ordered"] is False
+
+
+@patch("ml_client.rollups_col")
+@patch("ml_client.entries_col")
+@patch("ml_client.analyze_texts")
+def test_analyze_batch_writes_duplicate_entries_once(
+    mock_analyze_batch, mock_entries_col, mock_rollups_col, client
+):  # pylint: disable=redefined-outer-name
+    """Test an entry listed twice is written and rolled up once, with its last result."""
+    mock_analyze_batch.side_effect = lambda texts: [
+        ({"composite_score": float(len(text))}, None) for text in texts
+    ]
+    entry_id = "507f1f77bcf86cd799439011"
+    entries = [
+        {"entry_id": entry_id, "text": "Sad"},
+        {"entry_id": entry_id, "text": "Happy"},
+    ]
+    mock_entries_col.find.return_value = [
+        {"_id": ObjectId(entry_id), "user_id": "user-1", "journal_date": "2025-04-08"}
+    ]
+
+    response = client.post("/analyze/batch", json={"entries": entries})
+
+    assert response.status_code == 200
+    assert response.get_json()["updated"] == 1
+    (operation,) = mock_entries_col.bulk_write.call_args[0][0]
+    # pylint: disable-next=protected-access
+    assert operation._doc["$set"]["sentiment"] == {"composite_score": 5.0}
+    # day, week and month rollups, each moved once
+    assert len(mock_rollups_col.bulk_write.call_args[0][0]) == 3
+
+
+@patch("ml_client.entries_col")
+@patch("ml_client.analyze_texts")
+def test_analyze_batch_reports_item_errors(
+    mock_analyze_batch, mock_entries_col, client
+):  # pylint: disable=redefined-outer-name
+    """Test invalid items are reported without failing the rest of the batch."""
+    mock_analyze_batch.side_effect = lambda texts: [
+        (
+            {"negative": 0.2, "neutral": 0.6, "positive": 0.2, "composite_score": 3.0},
+            None,
+        )
+    ] * len(texts)
+    entries = [
+        {"entry_id": "507f1f77bcf86cd799439011", "text": "An ordinary day"},
+        {"entry_id": "not-an-object-id", "text": "Bad id"},
+        {"entry_id": "507f1f77bcf86cd799439013"},
+        {"entry_id": "507f1f77bcf86cd799439014", "text": "Deleted entry"},
+    ]
+    mock_entries_col.find.return_value = [{"_id": ObjectId("507f1f77bcf86cd799439011")}]
+
+    response = client.post("/analyze/batch", json={"entries": entries})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["updated"] == 1
+    assert {error["entry_id"] for error in data["errors"]} == {
+        "not-an-object-id",
+        "507f1f77bcf86cd799439013",
+        "507f1f77bcf86cd799439014",
+    }
+    assert len(mock_entries_col.bulk_write.call_args[0][0]) == 1
+
+
+def test_analyze_batch_requires_entries(client):  # pylint: disable=redefined-outer-name
+    """Test the /analyze/batch route rejects a request without entries."""
+    response = client.post("/analyze/batch", json={})
+    assert response.status_code == 400
+
+
+def test_healthz(client):  # pylint: disable=redefined-outer-name
+    """Test the liveness probe responds without loading the model."""
+    response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "ok"
+
+
+@patch("ml_client.model_registry")
+def test_readyz(mock_registry, client):  # pylint: disable=redefined-outer-name
+    """Test the readiness probe reflects the model registry state."""
+    mock_registry.ready = False
+    mock_registry.loaded = False
+    mock_registry.error = None
+    assert client.get("/readyz").status_code == 503
+
+    mock_registry.ready = True
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "ready"
+
+
+@patch("ml_client.entries_col")
+@patch("ml_client.analyze_text")
+def test_analyze_and_store_missing_entry(
+    mock_analyze, mock_entries_col, client
+):  # pylint: disable=redefined-outer-name
+    """Test the /analyze route reports an entry that doesn't exist."""
+    mock_analyze.return_value = ({"composite_score": 3.0}, None)
+    mock_entries_col.find_one_and_update.return_value = None
+
+    response = client.post(
+        "/analyze", json={"entry_id": "507f1f77bcf86cd799439011", "text": "Hello"}
+    )
+
+    assert response.status_code == 404
+    mock_analyze.assert_called_once_with("Hello")
+
+
+def test_metrics_prometheus_format(client):  # pylint: disable=redefined-outer-name
+    """Test /metrics reports stage histograms and request timings as Prometheus text."""
+    client.get("/healthz")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    body = response.get_data(as_text=True)
+    assert "# TYPE analyze_forward_seconds histogram" in body
+    assert 'analyze_forward_seconds_bucket{le="+Inf"}' in body
+    assert 'http_request_seconds_count{endpoint="healthz"}' in body
+
+
+@patch("ml_client.embeddings_col")
+@patch("ml_client.rollups_col")
+@patch("ml_client.entries_col")
+@patch("ml_client.analyze_text")
+def test_analyze_and_store_saves_embedding(
+    mock_analyze, mock_entries_col, _mock_rollups_col, mock_embeddings_col, client
+):  # pylint: disable=redefined-outer-name
+    """The result's embedding is upserted into entry_embeddings, not the entry."""
+    test_entry_id = "507f1f77bcf86cd799439011"
+    mock_analyze.return_value = (
+        {
+            "negative": 0.01,
+            "neutral": 0.15,
+            "positive": 0.84,
+            "composite_score": 4.53,
+        },
+        b"\x00\x3c\x00\x00",
+    )
+    mock_entries_col.find_one_and_update.return_value = {
+        "_id": ObjectId(test_entry_id),
+        "user_id": "user-1",
+        "journal_date": "2025-04-08",
+    }
+
+    response = client.post("/analyze", json={"entry_id": test_entry_id, "text": "hi"})
+
+    assert response.status_code == 200
+    update = mock_entries_col.find_one_and_update.call_args[0][1]
+    assert "embedding" not in update["$set"]["sentiment"]
+    (operation,) = mock_embeddings_col.bulk_write.call_args[0][0]
+    # pylint: disable=protected-access
+    assert operation._filter == {"_id": ObjectId(test_entry_id)}
+    assert operation._doc["$set"]["user_id"] == "user-1"
+    assert operation._doc["$set"]["vector"] == b"\x00\x3c\x00\x00"
+    assert operation._upsert
+
+
+@patch("ml_client.batcher")
+@patch("ml_client.embeddings_col")
+@patch("ml_client.rollups_col")
+@patch("ml_client.entries_col")
+def test_cached_text_still_saves_embedding(
+    mock_entries_col, _mock_rollups_col, mock_embeddings_col, mock_batcher, client
+):  # pylint: disable=redefined-outer-name
+    """Entries with the same text both get an embedding, the second from the cache."""
+    future = Future()
+    future.set_result(({"composite_score": 4.0}, b"\x00\x3c"))
+    mock_batcher.submit.return_value = future
+    entry_ids = [ObjectId(), ObjectId()]
+    mock_entries_col.find_one_and_update.side_effect = [
+        {"_id": entry_id, "user_id": "user-1"} for entry_id in entry_ids
+    ]
+    sentiment_cache.clear()
+
+    for entry_id in entry_ids:
+        response = client.post(
+            "/analyze", json={"entry_id": str(entry_id), "text": "Same words"}
+        )
+        assert response.status_code == 200
+
+    sentiment_cache.clear()
+    mock_batcher.submit.assert_called_once()
+    operations = [
+        call[0][0][0] for call in mock_embeddings_col.bulk_write.call_args_list
+    ]
+    # pylint: disable=protected-access
+    assert [operation._filter["_id"] for operation in operations] == entry_ids
+    assert all(operation._doc["$set"]["vector"] for operation in operations)
+
+
+@patch("ml_client.user_indexes")
+@patch("ml_client.embeddings_col")
+def test_similar_entries(
+    mock_embeddings_col, mock_user_indexes, client
+):  # pylint: disable=redefined-outer-name
+    """/similar searches the user's index with the entry's stored embedding."""
+    entry_id = ObjectId("507f1f77bcf86cd799439011")
+    match_id = ObjectId("507f1f77bcf86cd799439012")
+    mock_embeddings_col.find_one.return_value = {
+        "_id": entry_id,
+        "vector": b"\x00\x3c\x00\x00",
+    }
+    mock_user_indexes.get.return_value.search.return_value = [(match_id, 0.91234)]
+
+    response = client.post(
+        "/similar", json={"entry_id": str(entry_id), "user_id": "user-1", "k": 3}
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["similar"] == [
+        {"entry_id": str(match_id), "score": 0.9123}
+    ]
+    assert mock_embeddings_col.find_one.call_args[0][0]["user_id"] == "user-1"
+    mock_user_indexes.get.assert_called_once_with("user-1")
+    _, k = mock_user_indexes.get.return_value.search.call_args[0]
+    assert k == 3
+    assert mock_user_indexes.get.return_value.search.call_args[1] == {
+        "exclude": entry_id
+    }
+
+
+@patch("ml_client.embeddings_col")
+def test_similar_entries_errors(
+    mock_embeddings_col, client
+):  # pylint: disable=redefined-outer-name
+    """/similar rejects bad requests and reports entries without an embedding."""
+    mock_embeddings_col.find_one.return_value = None
+    entry_id = "507f1f77bcf86cd799439011"
+    assert client.post("/similar", json={"entry_id": entry_id}).status_code == 400
+    assert (
+        client.post(
+            "/similar", json={"entry_id": entry_id, "user_id": "u", "k": 0}
+        ).status_code
+        == 400
+    )
+    response = client.post("/similar", json={"entry_id": entry_id, "user_id": "u"})
+    assert response.status_code == 404
+
+
+@patch("ml_client.rollups_col")
+@patch("ml_client.entries_col")
+@patch("ml_client.analyze_text")
+def test_analyze_and_store_writes_heads_in_one_update(
+    mock_analyze, mock_entries_col, _mock_rollups_col, client
+):  # pylint: disable=redefined-outer-name
+    """The sentiment and extra heads' scores are stored by the same update."""
+    mock_analyze.return_value = (
+        {
+            "negative": 0.01,
+            "neutral": 0.15,
+            "positive": 0.84,
+            "composite_score": 4.53,
+            "heads": {"emotion": {"joy": 0.8, "anger": 0.2}},
+        },
+        None,
+    )
+    mock_entries_col.find_one_and_update.return_value = {
+        "user_id": "user-1",
+        "journal_date": "2025-04-08",
+    }
+
+    response = client.post(
+        "/analyze", json={"entry_id": "507f1f77bcf86cd799439011", "text": "hi"}
+    )
+
+    assert response.status_code == 200
+    mock_entries_col.find_one_and_update.assert_called_once()
+    update = mock_entries_col.find_one_and_update.call_args[0][1]["$set"]
+    assert update["heads"] == {"emotion": {"joy": 0.8, "anger": 0.2}}
+    assert "heads" not in update["sentiment"]
+    assert update["sentiment_version"] == ANALYSIS_VERSION
@@ -0,0 +1,46 @@
+"""Unit tests for vectorized scoring of model outputs."""
+
+import numpy as np
+import pytest
+import torch
+from scoring import composite_scores, score_logits, to_results
+
+
+def reference_composite(row):
+    """The per-row composite formula applied to a NumPy float32 row."""
+    return float(round(row[0] * 1 + row[1] * 3 + row[2] * 5, 2))
+
+
+def test_composite_matches_per_row_formula_bit_for_bit():
+    """Test vectorized composite scores equal the per-row float32 formula exactly."""
+    generator = torch.Generator().manual_seed(0)
+    probabilities = torch.softmax(torch.randn(5000, 3, generator=generator) * 3, dim=1)
+    expected = [reference_composite(row) for row in probabilities.numpy()]
+    assert composite_scores(probabilities).tolist() == expected
+
+
+def test_score_logits_returns_probabilities_and_composites():
+    """Test logits are turned into normalized probabilities and 1-5 scores."""
+    logits = torch.tensor([[4.0, 0.0, -4.0], [-4.0, 0.0, 4.0]])
+    probabilities, composite = score_logits(logits)
+    assert probabilities.sum(dim=1).tolist() == pytest.approx([1.0, 1.0])
+    assert composite.tolist() == pytest.approx([1.04, 4.96], abs=0.01)
+
+
+def test_score_logits_combines_windows():
+    """Test windows of the same text are combined before computing composites."""
+    logits = torch.tensor([[9.0, 0.0, 0.0], [0.0, 0.0, 9.0], [0.0, 9.0, 0.0]])
+    probabilities, composite = score_logits(logits, [0, 0, 1], [1, 1, 1], count=2)
+    assert probabilities.shape == (2, 3)
+    assert composite.tolist() == pytest.approx([3.0, 3.0], abs=0.01)
+
+
+def test_to_results_uses_native_floats():
+    """Test results hold Python floats that can be stored in MongoDB as-is."""
+    probabilities, composite = score_logits(torch.tensor([[1.0, 2.0, 3.0]]))
+    (result,) = to_results(probabilities, composite)
+    assert set(result) == {"negative", "neutral", "positive", "composite_score"}
+    assert all(isinstance(value, float) for value in result.values())
+    assert result["composite_score"] == reference_composite(
+        np.asarray(probabilities[0])
+    )
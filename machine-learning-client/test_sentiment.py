@@ -1,7 +1,11 @@
 """Unit tests for sentiment analysis functions."""
 
+import json
+from concurrent.futures import Future
+from unittest.mock import patch
+
 import pytest
-from ml_client import analyze_sentiment
+from ml_client import analyze_sentiment, analyze_text, sentiment_cache
 
 
 def test_analyze_sentiment_returns_valid_output():
@@ -79,3 +83,21 @@ def test_analyze_sentiment_negative():
     assert (
         sentiment_score["composite_score"] < 3
     ), "Expected composite score to be less than 3"
+
+
+def test_analyze_sentiment_returns_only_scores():
+    """Test the embedding is returned by analyze_text only, from the cache too."""
+    text = "An evening walk by the river with an old friend."
+    scores = {"negative": 0.1, "neutral": 0.2, "positive": 0.7, "composite_score": 4}
+    future = Future()
+    future.set_result((scores, b"\x00\x3c"))
+    sentiment_cache.clear()
+    with patch("ml_client.batcher") as mock_batcher:
+        mock_batcher.submit.return_value = future
+        assert analyze_text(text) == (scores, b"\x00\x3c")
+        result = analyze_sentiment(text)
+    assert result == scores
+    json.dumps(result)
+    assert analyze_text(text) == (scores, b"\x00\x3c")
+    mock_batcher.submit.assert_called_once_with(text)
+    sentiment_cache.clear()
@@ -0,0 +1,72 @@
+"""Unit tests for the similar-entries embeddings and vector indexes."""
+
+import numpy as np
+import pytest
+import torch
+
+from embeddings import decode_embedding, encode_embeddings
+from vector_index import FlatIndex, IVFIndex, UserIndexes, build_index
+
+
+def random_vectors(count, dim=32, seed=0):
+    """Build L2-normalized random vectors."""
+    vectors = np.random.default_rng(seed).normal(size=(count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_encode_embeddings_normalizes_and_combines_windows():
+    """Windows of a text are length-weighted and every vector has unit length."""
+    pooled = torch.tensor([[1.0, 0.0], [0.0, 1.0], [3.0, 4.0]])
+    vectors = encode_embeddings(pooled, [0, 0, 1], [3, 1, 5], 2)
+    first, second = (decode_embedding(vector) for vector in vectors)
+    assert first.dtype == np.float16
+    assert np.allclose(first, [0.9487, 0.3162], atol=1e-3)
+    assert np.allclose(second, [0.6, 0.8], atol=1e-3)
+
+
+def test_flat_index_returns_exact_neighbours():
+    """Results are the highest cosine similarities, best first, without the query."""
+    vectors = random_vectors(100)
+    index = FlatIndex(list(range(100)), vectors)
+    results = index.search(vectors[7], k=3, exclude=7)
+    expected = np.argsort(-(vectors @ vectors[7]))[1:4]
+    assert [entry_id for entry_id, _ in results] == expected.tolist()
+    assert results[0][1] >= results[1][1] >= results[2][1]
+    assert FlatIndex([], np.empty((0, 0))).search(vectors[0]) == []
+
+
+def test_ivf_index_finds_most_exact_neighbours():
+    """Probing every cluster finds the exact top results despite quantization."""
+    vectors = random_vectors(400)
+    exact = FlatIndex(list(range(400)), vectors)
+    index = IVFIndex(list(range(400)), vectors, n_lists=8, n_probe=8)
+    for query in range(5):
+        expected = {entry_id for entry_id, _ in exact.search(vectors[query], k=5)}
+        found = {entry_id for entry_id, _ in index.search(vectors[query], k=5)}
+        assert len(expected & found) >= 4
+
+
+def test_build_index_picks_ivf_for_large_histories():
+    """auto mode switches to IVF at the size threshold; unknown modes are rejected."""
+    vectors = random_vectors(50)
+    assert isinstance(build_index(range(50), vectors), FlatIndex)
+    assert isinstance(build_index(range(50), vectors, ivf_min_vectors=50), IVFIndex)
+    with pytest.raises(ValueError):
+        build_index(range(50), vectors, mode="hnsw")
+
+
+def test_user_indexes_are_cached_until_invalidated():
+    """An index is built once per user until their embeddings change."""
+    loads = []
+
+    def loader(user_id):
+        loads.append(user_id)
+        return [1, 2], random_vectors(2)
+
+    indexes = UserIndexes(loader, max_users=1)
+    assert indexes.get("a") is indexes.get("a")
+    indexes.invalidate("a")
+    indexes.get("a")
+    indexes.get("b")
+    indexes.get("a")
+    assert loads == ["a", "a", "b", "a"]
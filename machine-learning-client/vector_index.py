@@ -0,0 +1,224 @@
+"""
+In-memory vector indexes for the similar-entries search.
+A user's entry embeddings are loaded once into a matrix and queried with a
+single matrix-vector product (FlatIndex). Histories above a size threshold
+use an inverted-file index instead (IVFIndex): vectors are clustered with
+k-means, stored as int8 codes, and a query only scores the vectors of the
+clusters closest to it. Indexes are cached per user and rebuilt when the
+user's embeddings change or the cached copy expires.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+
+# "auto" uses IVF for histories of at least ivf_min_vectors entries
+INDEX_MODES = ("auto", "flat", "ivf")
+
+
+def top_k(scores, k):
+    """Return the positions of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def ranked(ids, scores, positions, k, exclude=None):
+    """
+    Return the k best (id, score) pairs of scored vectors.
+
+    Args:
+        ids (list): Identifier of every vector in the index.
+        scores (np.ndarray): Score of each scored vector.
+        positions (np.ndarray): Index position of each scored vector.
+        k (int): Number of results.
+        exclude (optional): An id to leave out.
+    """
+    extra = 1 if exclude is not None else 0
+    results = [(ids[positions[i]], float(scores[i])) for i in top_k(scores, k + extra)]
+    return [result for result in results if result[0] != exclude][:k]
+
+
+class FlatIndex:
+    """
+    Exact brute-force index: every query is scored against every vector.
+
+    Args:
+        ids (list): Identifier of each vector.
+        vectors (np.ndarray): [N, dim] L2-normalized vectors.
+    """
+
+    def __init__(self, ids, vectors):
+        self.ids = list(ids)
+        # float32 so the product runs on BLAS; float16 matmul is not vectorized
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, k=5, exclude=None):
+        """
+        Return the k vectors most similar to the query.
+
+        Args:
+            query (np.ndarray): [dim] L2-normalized vector.
+            k (int): Number of results.
+            exclude (optional): An id to leave out, e.g. the query's own.
+
+        Returns:
+            list[tuple]: (id, cosine similarity) pairs, most similar first.
+        """
+        if not self.ids:
+            return []
+        scores = self.vectors @ np.asarray(query, dtype=np.float32)
+        return ranked(self.ids, scores, np.arange(len(self.ids)), k, exclude)
+
+
+def quantize(vectors):
+    """Return int8 codes and per-vector scales of [N, dim] float vectors."""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def kmeans(vectors, n_lists, iterations=10, seed=0):
+    """
+    Cluster normalized vectors by cosine similarity (spherical k-means).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: [n_lists, dim] centroids and the
+        cluster of each vector.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    assignments = np.zeros(len(vectors), dtype=np.int64)
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for cluster in range(n_lists):
+            members = vectors[assignments == cluster]
+            if len(members):
+                centroid = members.sum(axis=0)
+                centroids[cluster] = centroid / max(np.linalg.norm(centroid), 1e-12)
+    return centroids, assignments
+
+
+class IVFIndex:
+    """
+    Approximate inverted-file index over int8-quantized vectors.
+
+    Args:
+        ids (list): Identifier of each vector.
+        vectors (np.ndarray): [N, dim] L2-normalized vectors.
+        n_lists (int, optional): Number of clusters; defaults to sqrt(N).
+        n_probe (int): Clusters scored per query; more is slower and more exact.
+    """
+
+    def __init__(self, ids, vectors, n_lists=None, n_probe=8):
+        self.ids = list(ids)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n_lists = n_lists or int(np.sqrt(len(vectors)))
+        n_lists = max(1, min(n_lists, len(vectors)))
+        self.n_probe = max(1, int(n_probe))
+        self.centroids, assignments = kmeans(vectors, n_lists)
+        codes, scales = quantize(vectors)
+        # vectors of each cluster stored contiguously, with their positions
+        order = np.argsort(assignments, kind="stable")
+        self.positions = order
+        self.codes = codes[order]
+        self.scales = scales[order]
+        self.offsets = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, k=5, exclude=None):
+        """Return the k most similar vectors among the n_probe closest clusters."""
+        if not self.ids:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        lists = top_k(self.centroids @ query, self.n_probe)
+        rows = np.concatenate(
+            [np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists]
+        )
+        scores = (self.codes[rows].astype(np.float32) @ query) * self.scales[rows]
+        return ranked(self.ids, scores, self.positions[rows], k, exclude)
+
+
+def build_index(ids, vectors, mode="auto", ivf_min_vectors=5000, n_probe=8):
+    """
+    Build the index configured by mode for a set of vectors.
+
+    Args:
+        ids (list): Identifier of each vector.
+        vectors (np.ndarray): [N, dim] L2-normalized vectors.
+        mode (str): One of INDEX_MODES.
+        ivf_min_vectors (int): Size from which "auto" builds an IVF index.
+        n_probe (int): Clusters an IVF index scores per query.
+    """
+    if mode not in INDEX_MODES:
+        raise ValueError(f"Unknown index mode {mode!r}; expected one of {INDEX_MODES}")
+    if mode == "ivf" or (mode == "auto" and len(ids) >= ivf_min_vectors):
+        return IVFIndex(ids, vectors, n_probe=n_probe)
+    return FlatIndex(ids, vectors)
+
+
+class UserIndexes:  # pylint: disable=too-many-instance-attributes
+    """
+    Bounded LRU of per-user vector indexes.
+
+    Args:
+        loader (callable): Maps a user id to (ids, [N, dim] vectors).
+        builder (callable): Maps (ids, vectors) to an index.
+        max_users (int): Maximum number of indexes kept in memory.
+        ttl_seconds (float): How long an index is used before it is rebuilt,
+            so writes made by other processes are picked up.
+    """
+
+    def __init__(self, loader, builder=build_index, max_users=256, ttl_seconds=60):
+        self.loader = loader
+        self.builder = builder
+        self.max_users = max(1, int(max_users))
+        self.ttl = float(ttl_seconds)
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = metrics.counter(
+            "vector_index_builds_total", "Per-user vector indexes built"
+        )
+        self.build_seconds = metrics.histogram(
+            "vector_index_build_seconds", "Time to load and index a user's embeddings"
+        )
+
+    def get(self, user_id):
+        """Return the user's index, building it if it is missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is not None and item[1] > now:
+                self._items.move_to_end(user_id)
+                return item[0]
+        with self.build_seconds.time():
+            index = self.builder(*self.loader(user_id))
+        self.builds.inc()
+        with self._lock:
+            self._items[user_id] = (index, now + self.ttl)
+            self._items.move_to_end(user_id)
+            while len(self._items) > self.max_users:
+                self._items.popitem(last=False)
+        return index
+
+    def invalidate(self, user_id):
+        """Drop a user's index after their embeddings changed."""
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self):
+        """Drop every index."""
+        with self._lock:
+            self._items.clear()
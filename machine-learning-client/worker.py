@@ -0,0 +1,110 @@
+"""
+Analysis worker pool for ml-client.
+Drains the analysis job queue that the web app writes to: each worker
+thread claims a job, analyzes the entry's text and stores the sentiment.
+Threads share the model through the micro-batcher, so concurrent jobs are
+scored in one forward pass. Stops claiming new jobs on SIGTERM/SIGINT and
+finishes the ones in flight before exiting.
+"""
+
+import logging
+import os
+import signal
+import socket
+import threading
+
+from bson.objectid import ObjectId
+
+from db import db
+from job_queue import JobQueue
+from ml_client import (
+    analyze_text,
+    ensure_indexes,
+    model_registry,
+    store_sentiment,
+)
+
+logger = logging.getLogger("worker")
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "1"))
+
+
+def process_job(job):
+    """Analyze one job's text and store the result on its entry."""
+    sentiment_scores, vector = analyze_text(job["text"])
+    if not store_sentiment(job["entry_id"], sentiment_scores, vector):
+        logger.info("* process_job(): entry %s no longer exists", job["entry_id"])
+
+
+def mark_failed(job):
+    """Flag the entry of a dead-lettered job so the web app can say so."""
+    logger.error("* worker: job %s dead-lettered", job["_id"])
+    db["entries"].update_one(
+        {"_id": ObjectId(job["entry_id"])}, {"$set": {"analysis_status": "failed"}}
+    )
+
+
+job_queue = JobQueue(
+    db["analysis_jobs"],
+    lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "5")),
+    retry_base_seconds=float(os.getenv("JOB_RETRY_BASE_SECONDS", "5")),
+    on_dead_letter=mark_failed,
+)
+
+
+def run_worker(worker_id, stop_event):
+    """Claim and process jobs until stop_event is set."""
+    while not stop_event.is_set():
+        try:
+            job = job_queue.claim(worker_id)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error("* %s: claim failed: %s", worker_id, e)
+            stop_event.wait(WORKER_POLL_SECONDS)
+            continue
+        if job is None:
+            stop_event.wait(WORKER_POLL_SECONDS)
+            continue
+        try:
+            process_job(job)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("* %s: job %s failed: %s", worker_id, job["_id"], e)
+            # a dead-lettered job's entry is flagged by mark_failed
+            job_queue.fail(job, e)
+            continue
+        job_queue.complete(job)
+        logger.debug("* %s: analyzed entry %s", worker_id, job["entry_id"])
+
+
+def main():
+    """Start the worker pool and run until SIGTERM or SIGINT."""
+    job_queue.ensure_indexes()
+    ensure_indexes()
+    model_registry.warm_up()
+    stop_event = threading.Event()
+
+    def request_stop(signum, _frame):
+        logger.info("* worker: received signal %s, draining", signum)
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    threads = [
+        threading.Thread(
+            target=run_worker, args=(f"{prefix}-{n}", stop_event), name=f"worker-{n}"
+        )
+        for n in range(WORKER_CONCURRENCY)
+    ]
+    for thread in threads:
+        thread.start()
+    logger.info("* worker: %d threads draining the analysis queue", len(threads))
+    for thread in threads:
+        thread.join()
+    logger.info("* worker: stopped")
+
+
+if __name__ == "__main__":
+    main()
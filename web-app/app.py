@@ -2,11 +2,20 @@
 
 import os
 import logging
+import time
+from datetime import datetime, timezone
 import requests
 import pymongo
-from flask import Flask, render_template, request, redirect, url_for
+from flask import (
+    Flask,
+    Response,
+    render_template,
+    request,
+    redirect,
+    url_for,
+    jsonify,
+)
 from dotenv import load_dotenv
-from flask_bcrypt import Bcrypt
 from flask_login import (
     LoginManager,
     UserMixin,
@@ -16,6 +25,18 @@ from flask_login import (
     current_user,
 )
 from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+import assets
+import export
+import live_updates
+import metrics
+from fragment_cache import FragmentCache, template_fingerprint
+from ml_api import MLClient
+from mongo_settings import create_client
+from passwords import HasherBusy, PasswordHasher
+from rate_limit import RateLimiter
+from user_cache import RedisBackend, UserCache
 
 # loading env file
 load_dotenv()
@@ -24,26 +45,169 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY")
 
-# Set up logging in Docker container's output
-logging.basicConfig(level=logging.DEBUG)
+# Set up logging in Docker container's output. Debug logging on the request
+# path is only formatted when LOG_LEVEL=DEBUG
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+metrics.instrument_app(app)
+# fingerprinted static files built by build_assets.py
+ASSET_VERSION = assets.init_app(app)
+
+# Latency of the web app's calls to other services
+ml_client_seconds = metrics.histogram(
+    "ml_client_request_seconds", "Time for submit_entry's call to ml-client /analyze"
+)
+entry_lookup_seconds = metrics.histogram(
+    "entry_lookup_seconds", "Time for view_entry to load an entry from MongoDB"
+)
 
 # mongodb setup
-mongo_host = os.getenv("MONGO_HOST")
-mongo_port = os.getenv("MONGO_PORT")
 mongo_db = os.getenv("MONGO_DB")
-client = pymongo.MongoClient(f"mongodb://{mongo_host}:{mongo_port}/")
+client = create_client()
 db = client[mongo_db]
 users = db.users
 entries = db.entries
+analysis_jobs = db.analysis_jobs
+# per-user day/week/month sentiment rollups maintained by ml-client
+mood_rollups = db.mood_rollups
+
+# Number of entries shown per page of the journal listing
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "20"))
+# Characters of each entry's text shown in the listing
+PREVIEW_LENGTH = 100
+
+# Rollup periods the trends page can show, and the most points it returns
+TREND_PERIODS = ("day", "week", "month")
+TREND_MAX_POINTS = 366
+SENTIMENT_LABELS = ("negative", "neutral", "positive")
+
+# Rendered entry pages and listings, cached per user and validated with ETags
+# built from the entry data they show; ml-client sets sentiment_updated_at
+# with every new sentiment, which changes the ETag of the pages showing it
+page_cache = FragmentCache(
+    template_fingerprint(os.path.join(app.root_path, "templates")) + ASSET_VERSION,
+    max_size=int(os.getenv("PAGE_CACHE_MAX_SIZE", "2048")),
+)
+# Entry fields that change how the entry's page renders, besides its text
+ENTRY_VERSION_FIELDS = {
+    "sentiment.composite_score": 1,
+    "sentiment_updated_at": 1,
+    "analysis_status": 1,
+}
+
+# Requests a web worker serves at once: greenlets up to
+# GUNICORN_WORKER_CONNECTIONS with gevent workers, otherwise its threads
+if os.getenv("GUNICORN_WORKER_CLASS", "gevent") == "gevent":
+    WORKER_CONCURRENCY = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "2000"))
+else:
+    WORKER_CONCURRENCY = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# Synchronous analysis calls to ml-client: keep-alive connections pooled for
+# each of the worker's concurrent requests, round-robin over ML_CLIENT_URLS
+# with a circuit breaker per replica, and optionally hedged to a second
+# replica after ML_CLIENT_HEDGE_AFTER_MS (/analyze is idempotent)
+ML_CLIENT_HEDGE_AFTER_MS = float(os.getenv("ML_CLIENT_HEDGE_AFTER_MS", "0"))
+ml_api = MLClient(
+    os.getenv("ML_CLIENT_URLS", "http://ml-client:5001").split(","),
+    timeout=float(os.getenv("ML_CLIENT_TIMEOUT_SECONDS", "5")),
+    pool_size=int(os.getenv("ML_CLIENT_POOL_SIZE", str(WORKER_CONCURRENCY))),
+    failure_threshold=int(os.getenv("ML_CLIENT_FAILURE_THRESHOLD", "5")),
+    reset_seconds=float(os.getenv("ML_CLIENT_RESET_SECONDS", "30")),
+    hedge_after=(
+        ML_CLIENT_HEDGE_AFTER_MS / 1000 if ML_CLIENT_HEDGE_AFTER_MS > 0 else None
+    ),
+)
+
+# Entries listed in the "similar entries" section of an entry's page
+SIMILAR_ENTRIES = int(os.getenv("SIMILAR_ENTRIES", "5"))
 
-# bycrypt setup
-bcrypt = Bcrypt(app)
+# Live analysis updates for entry pages: one change stream per web worker,
+# fanned out to the pages' Server-Sent Events connections. Idle connections
+# get a comment every LIVE_HEARTBEAT_SECONDS and are closed after
+# LIVE_MAX_SECONDS, after which the browser reconnects
+live_feed = live_updates.ChangeFeed(
+    entries, max_events=int(os.getenv("LIVE_MAX_QUEUED_EVENTS", "16"))
+)
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+LIVE_MAX_SECONDS = float(os.getenv("LIVE_MAX_SECONDS", "300"))
+LIVE_RETRY_MS = int(os.getenv("LIVE_RETRY_MS", "3000"))
+
+# Entries fetched per cursor batch and encoded per chunk by /export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "200"))
+
+# When true, submitted entries are queued for the ml-client workers instead of
+# waiting on a synchronous call to the ml-client /analyze endpoint
+ASYNC_ANALYSIS = os.getenv("ASYNC_ANALYSIS", "true").lower() == "true"
+
+
+def ensure_indexes():
+    """Create the indexes that the app's queries rely on"""
+    # login lookups by username; also rejects duplicate sign-ups
+    users.create_index("username", unique=True)
+    # keyset pagination of a user's entries, newest first
+    entries.create_index(
+        [
+            ("user_id", pymongo.ASCENDING),
+            ("journal_date", pymongo.DESCENDING),
+            ("_id", pymongo.DESCENDING),
+        ]
+    )
+    # a user's rollups by period; same index ml-client creates for its upserts
+    mood_rollups.create_index(
+        [
+            ("user_id", pymongo.ASCENDING),
+            ("period", pymongo.ASCENDING),
+            ("key", pymongo.ASCENDING),
+        ],
+        unique=True,
+    )
+
+
+# bcrypt hashing in a small process pool per web worker, so logins don't
+# hold request threads; BCRYPT_LOG_ROUNDS changes apply to new hashes and to
+# existing ones at the user's next login
+hasher = PasswordHasher(
+    rounds=int(os.getenv("BCRYPT_LOG_ROUNDS", "12")),
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", "1")),
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "8")),
+    acquire_timeout=float(os.getenv("PASSWORD_HASH_WAIT_SECONDS", "2")),
+)
+
+# Failed logins allowed per username and per client IP within the window
+LOGIN_WINDOW_SECONDS = float(os.getenv("LOGIN_WINDOW_SECONDS", "300"))
+login_limits = {
+    "username": RateLimiter(
+        int(os.getenv("LOGIN_MAX_FAILURES_PER_USER", "5")), LOGIN_WINDOW_SECONDS
+    ),
+    "ip": RateLimiter(
+        int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "20")), LOGIN_WINDOW_SECONDS
+    ),
+}
+logins_limited = metrics.counter(
+    "login_rate_limited_total", "Login attempts rejected by the failed-login limit"
+)
+password_rehashes = metrics.counter(
+    "password_rehashes_total", "Password hashes upgraded to the current work factor"
+)
 
 # login setup
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = "login_signup"
 
+# Users loaded for sessions are cached so authenticated requests don't each
+# read the users collection; USER_CACHE_REDIS_URL shares the cache between
+# processes
+user_cache = UserCache(
+    max_size=int(os.getenv("USER_CACHE_MAX_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+    backend=(
+        RedisBackend(os.getenv("USER_CACHE_REDIS_URL"))
+        if os.getenv("USER_CACHE_REDIS_URL")
+        else None
+    ),
+)
+
 
 # user class for login
 class User(UserMixin):
@@ -64,52 +228,180 @@ def login_signup():
         action = request.form["submit"]  # this will be "Login" or "Sign Up"
 
         if action == "Login":
-            user_data = users.find_one({"username": username})
-            if user_data and bcrypt.check_password_hash(
-                user_data["password"], password
-            ):
-                user = User(user_data)
-                login_user(user)
-                return redirect(url_for("home"))
-            return "Invalid credentials", 400
+            return log_in(username, password)
 
         if action == "Sign Up":
-            if users.find_one({"username": username}):
-                return "User already exists", 400
-            hashed_password = bcrypt.generate_password_hash(password).decode("utf-8")
+            hashed_password = hasher.hash(password)
             user_data = {"username": username, "password": hashed_password}
-            _ = users.insert_one(user_data).inserted_id
+            # the unique username index rejects existing users
+            try:
+                _ = users.insert_one(user_data).inserted_id
+            except DuplicateKeyError:
+                return "User already exists", 400
             return redirect(url_for("login_signup"))
 
     return render_template("login_signup.html")
 
 
+def log_in(username, password):
+    """Check a login attempt, rejecting keys with too many recent failures"""
+    keys = {"username": username, "ip": request.remote_addr or "unknown"}
+    retry_after = max(
+        limiter.retry_after(keys[name]) for name, limiter in login_limits.items()
+    )
+    if retry_after:
+        logins_limited.inc()
+        app.logger.debug("*** log_in(): rate limited %s", keys)
+        return (
+            "Too many failed logins, try again later",
+            429,
+            {"Retry-After": str(retry_after)},
+        )
+
+    user_data = users.find_one({"username": username})
+    if not user_data or not hasher.check(user_data["password"], password):
+        for name, limiter in login_limits.items():
+            limiter.record_failure(keys[name])
+        return "Invalid credentials", 400
+
+    login_limits["username"].reset(username)
+    if hasher.needs_rehash(user_data["password"]):
+        rehash_password(user_data, password)
+    login_user(User(user_data))
+    return redirect(url_for("home"))
+
+
+def rehash_password(user_data, password):
+    """Store a user's password hashed with the current work factor"""
+    # only replaces the hash that was just checked, in case it changed meanwhile
+    result = users.update_one(
+        {"_id": user_data["_id"], "password": user_data["password"]},
+        {"$set": {"password": hasher.hash(password)}},
+    )
+    if result.modified_count:
+        password_rehashes.inc()
+        user_cache.invalidate(str(user_data["_id"]))
+
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(_error):
+    """Turn away logins and sign-ups while the password hashing pool is full"""
+    return "Server busy, please try again", 503, {"Retry-After": "1"}
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    """User loader"""
-    user_data = users.find_one({"_id": ObjectId(user_id)})
-    return User(user_data) if user_data else None
+    """User loader, served from the user cache when possible"""
+    user_data = user_cache.get(user_id)
+    if user_data is None:
+        user_data = users.find_one({"_id": ObjectId(user_id)}, {"username": 1})
+        if user_data is None:
+            return None
+        user_data = {"_id": str(user_data["_id"]), "username": user_data["username"]}
+        user_cache.set(user_id, user_data)
+    return User(user_data)
 
 
 @app.route("/logout", methods=["GET"])
 @login_required
 def logout():
     """Logout"""
+    user_cache.invalidate(current_user.get_id())
     logout_user()
     return redirect(url_for("login_signup"))
 
 
+def encode_page_cursor(entry):
+    """Encode the sort key of the last entry on a page as a URL cursor"""
+    return f"{entry['journal_date']}_{entry['_id']}"
+
+
+def decode_page_cursor(cursor):
+    """Decode a page cursor into (journal_date, ObjectId), or None if invalid"""
+    journal_date, _, entry_id = (cursor or "").rpartition("_")
+    if not journal_date or not ObjectId.is_valid(entry_id):
+        return None
+    return journal_date, ObjectId(entry_id)
+
+
+def entry_score(entry):
+    """Return an entry's composite score, or None if it isn't analyzed yet"""
+    return entry.get("sentiment", {}).get("composite_score")
+
+
+def entry_etag(entry):
+    """Return the ETag of an entry's page from its ENTRY_VERSION_FIELDS"""
+    return page_cache.etag(
+        "entry",
+        entry["_id"],
+        entry_score(entry),
+        entry.get("sentiment_updated_at"),
+        entry.get("analysis_status"),
+    )
+
+
+def entry_last_modified(entry):
+    """Return when an entry was created or last got a sentiment"""
+    created = entry["_id"].generation_time
+    updated = entry.get("sentiment_updated_at")
+    if updated is None:
+        return created
+    if updated.tzinfo is None:
+        updated = updated.replace(tzinfo=timezone.utc)
+    return max(created, updated)
+
+
 @app.route("/")
 def home():
     """Render home page"""
     if not current_user.is_authenticated:
         return redirect(url_for("login_signup"))
 
-    # fetch prev entries to display
-    user_entries = entries.find({"user_id": current_user.id}).sort(
-        "date", pymongo.DESCENDING
+    # fetch one page of prev entries to display, newest first, continuing after
+    # the entry named by the "after" cursor
+    query = {"user_id": current_user.id}
+    after = decode_page_cursor(request.args.get("after"))
+    if after:
+        journal_date, entry_id = after
+        query["$or"] = [
+            {"journal_date": {"$lt": journal_date}},
+            {"journal_date": journal_date, "_id": {"$lt": entry_id}},
+        ]
+    # only a preview of the text (one extra character shows it was cut) and the score
+    projection = {
+        "journal_date": 1,
+        "text": {"$substrCP": ["$text", 0, PREVIEW_LENGTH + 1]},
+        "sentiment.composite_score": 1,
+        "sentiment_updated_at": 1,
+    }
+    user_entries = list(
+        entries.find(query, projection)
+        .sort([("journal_date", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)])
+        .limit(PAGE_SIZE + 1)
+    )
+    next_cursor = None
+    if len(user_entries) > PAGE_SIZE:
+        user_entries = user_entries[:PAGE_SIZE]
+        next_cursor = encode_page_cursor(user_entries[-1])
+
+    # the page only changes when an entry is added or gets a new sentiment
+    etag = page_cache.etag(
+        "home",
+        request.args.get("after"),
+        next_cursor,
+        *(
+            (entry["_id"], entry.get("sentiment_updated_at"), entry_score(entry))
+            for entry in user_entries
+        ),
+    )
+    return page_cache.respond(
+        (current_user.id, "home", request.args.get("after")),
+        etag,
+        None,
+        lambda: render_template(
+            "index.html", entries=user_entries, next_cursor=next_cursor
+        ),
     )
-    return render_template("index.html", entries=user_entries)
 
 
 @app.route("/add-entry")
@@ -119,6 +411,26 @@ def add_entry():
     return render_template("new_entry.html")
 
 
+def enqueue_analysis(entry_id, text):
+    """
+    Queue an entry for sentiment analysis by the ml-client workers.
+
+    The document must match job_queue.new_job in machine-learning-client,
+    which documents the job schema the workers claim by.
+    """
+    now = datetime.now(timezone.utc)
+    analysis_jobs.insert_one(
+        {
+            "entry_id": str(entry_id),
+            "text": text,
+            "status": "queued",
+            "attempts": 0,
+            "available_at": now,
+            "created_at": now,
+        }
+    )
+
+
 @app.route("/submit-entry", methods=["POST"])
 @login_required
 def submit_entry():
@@ -133,14 +445,17 @@ def submit_entry():
     new_entry_id = entries.insert_one(doc).inserted_id
     app.logger.debug("*** submit_entry(): Inserted 1 entry: %s", new_entry_id)
 
+    if ASYNC_ANALYSIS:
+        enqueue_analysis(new_entry_id, text)
+        app.logger.debug("*** submit_entry(): Queued analysis: %s", new_entry_id)
+        return redirect(url_for("view_entry", entry_id=new_entry_id))
+
     # Trigger the /analyze endpoint in the ml_client service
-    analyze_url = "http://ml-client:5001/analyze"
     try:
-        response = requests.post(
-            analyze_url,
-            json={"entry_id": str(new_entry_id), "text": text},
-            timeout=5,
-        )
+        with ml_client_seconds.time():
+            response = ml_api.post(
+                "/analyze", {"entry_id": str(new_entry_id), "text": text}
+            )
     except requests.exceptions.RequestException as e:
         app.logger.error("*** submit_entry(): Request failed: %s", e)
         return "Error analyzing entry", 500
@@ -164,18 +479,283 @@ def submit_entry():
 @app.route("/entry/<entry_id>")
 @login_required
 def view_entry(entry_id):
-    """Render a journal entry page"""
-    entry = entries.find_one({"_id": ObjectId(entry_id)})
+    """Render a journal entry page, or answer 304 if the client's copy is current"""
+    object_id = ObjectId(entry_id)
+    # every view, cached or not, still reads the fields the page's validators
+    # depend on (one _id lookup); the text is loaded only when the page has to
+    # be rendered. The page holds nothing random, so it may be cached until
+    # they change: the quote is picked by the browser.
+    with entry_lookup_seconds.time():
+        version = entries.find_one({"_id": object_id}, ENTRY_VERSION_FIELDS)
+    if not version:
+        return "Entry not found", 404
+
+    def render():
+        with entry_lookup_seconds.time():
+            entry = entries.find_one({"_id": object_id})
+        app.logger.debug("*** view_entry(): Found entry: %s", entry)
+
+        sentiment_score = entry.get("sentiment", {}).get("composite_score", 0)
+        app.logger.debug("*** view_entry(): composite_score= %s", sentiment_score)
+
+        return render_template(
+            "page.html", entry=entry, sentiment_score=sentiment_score
+        )
+
+    return page_cache.respond(
+        (current_user.id, "entry", entry_id),
+        entry_etag(version),
+        entry_last_modified(version),
+        render,
+    )
+
+
+@app.route("/entry/<entry_id>/similar")
+@login_required
+def similar_entries(entry_id):
+    """Return the user's entries most similar to one of theirs, best first"""
+    try:
+        response = ml_api.post(
+            "/similar",
+            {"entry_id": entry_id, "user_id": current_user.id, "k": SIMILAR_ENTRIES},
+        )
+    except requests.exceptions.RequestException as e:
+        app.logger.error("*** similar_entries(): Request failed: %s", e)
+        return jsonify({"error": "similar entries are unavailable"}), 503
+    if response.status_code == 404:
+        # the entry hasn't been analyzed yet
+        return jsonify({"similar": [], "pending": True})
+    if response.status_code != 200:
+        app.logger.error("*** similar_entries(): Search failed: %s", response.text)
+        return jsonify({"error": "similar entries are unavailable"}), 502
+
+    scores = {
+        ObjectId(match["entry_id"]): match["score"]
+        for match in response.json().get("similar", [])
+    }
+    found = {
+        entry["_id"]: entry
+        for entry in entries.find(
+            {"_id": {"$in": list(scores)}, "user_id": current_user.id},
+            {"journal_date": 1, "text": 1},
+        )
+    }
+    app.logger.debug("*** similar_entries(): %d matches", len(found))
+    return jsonify(
+        {
+            "similar": [
+                {
+                    "entry_id": str(object_id),
+                    "url": url_for("view_entry", entry_id=str(object_id)),
+                    "journal_date": found[object_id].get("journal_date"),
+                    "preview": found[object_id].get("text", "")[:PREVIEW_LENGTH],
+                    "score": score,
+                }
+                for object_id, score in scores.items()
+                if object_id in found
+            ]
+        }
+    )
+
+
+@app.route("/entry/<entry_id>/events")
+@login_required
+def entry_events(entry_id):
+    """Stream the analysis of one of the user's entries as Server-Sent Events"""
+    if live_feed.available is False:
+        return "Live updates are unavailable", 503
+    object_id = ObjectId(entry_id)
+    # subscribe before reading the entry, so an analysis stored in between
+    # isn't missed
+    subscription = live_feed.subscribe(entry_id)
+    entry = entries.find_one(
+        {"_id": object_id, "user_id": current_user.id},
+        {field: 1 for field in live_updates.ANALYSIS_FIELDS},
+    )
     if not entry:
+        subscription.close()
         return "Entry not found", 404
-    app.logger.debug("*** view_entry(): Found entry: %s", entry)
 
-    sentiment_score = entry.get("sentiment", {}).get("composite_score", 0)
-    app.logger.debug("*** view_entry(): composite_score= %s", sentiment_score)
+    def stream():
+        try:
+            yield f"retry: {LIVE_RETRY_MS}\n\n"
+            current = live_updates.analysis_event(entry)
+            if current:
+                yield live_updates.format_event(current)
+            deadline = time.monotonic() + LIVE_MAX_SECONDS
+            # a feed that stopped working ends the stream; the page then
+            # falls back to reloading
+            while (remaining := deadline - time.monotonic()) > 0 and (
+                live_feed.available is not False
+            ):
+                event = subscription.get(min(LIVE_HEARTBEAT_SECONDS, remaining))
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield live_updates.format_event(event)
+        finally:
+            subscription.close()
+
+    app.logger.debug("*** entry_events(): Streaming entry %s", entry_id)
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def load_trends(user_id, period, limit):
+    """Return the user's latest mood rollups for a period, oldest first"""
+    rollups = (
+        mood_rollups.find(
+            {"user_id": user_id, "period": period},
+            {"_id": 0, "key": 1, "count": 1, "score_sum": 1, "labels": 1},
+        )
+        .sort("key", pymongo.DESCENDING)
+        .limit(limit)
+    )
+    points = []
+    for rollup in reversed(list(rollups)):
+        count = rollup.get("count", 0)
+        if count <= 0:
+            continue
+        labels = rollup.get("labels", {})
+        points.append(
+            {
+                "key": rollup["key"],
+                "count": count,
+                "average_score": round(rollup.get("score_sum", 0) / count, 2),
+                "distribution": {
+                    label: round(labels.get(label, 0) / count, 3)
+                    for label in SENTIMENT_LABELS
+                },
+            }
+        )
+    return points
+
+
+def trend_args():
+    """Read the period and limit query parameters of the trends routes"""
+    period = request.args.get("period", "week")
+    try:
+        limit = int(request.args.get("limit", "12"))
+    except ValueError:
+        limit = 0
+    if period not in TREND_PERIODS or not 1 <= limit <= TREND_MAX_POINTS:
+        return None
+    return period, limit
+
+
+@app.route("/api/trends")
+@login_required
+def trends_api():
+    """Return average mood and label distribution per day, week or month"""
+    args = trend_args()
+    if args is None:
+        return (
+            jsonify(
+                {
+                    "error": f"period must be one of {', '.join(TREND_PERIODS)} and "
+                    f"limit between 1 and {TREND_MAX_POINTS}"
+                }
+            ),
+            400,
+        )
+    period, limit = args
+    return jsonify(
+        {"period": period, "trends": load_trends(current_user.id, period, limit)}
+    )
+
+
+@app.route("/trends")
+@login_required
+def trends():
+    """Render mood trends page"""
+    args = trend_args()
+    if args is None:
+        return redirect(url_for("trends"))
+    period, limit = args
+    points = load_trends(current_user.id, period, limit)
+    app.logger.debug("*** trends(): %d %s points", len(points), period)
+    return render_template(
+        "trends.html", period=period, periods=TREND_PERIODS, points=points
+    )
+
+
+def export_args():
+    """Read the format and journal_date range of an export, or None if invalid"""
+    export_format = request.args.get("format", "ndjson")
+    date_range = {}
+    for param, operator in (("from", "$gte"), ("to", "$lte")):
+        value = request.args.get(param)
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                return None
+            date_range[operator] = value
+    if export_format not in export.ENCODERS:
+        return None
+    return export_format, date_range
+
+
+@app.route("/export")
+@login_required
+def export_entries():
+    """Stream the user's entries with their sentiment as NDJSON or CSV"""
+    args = export_args()
+    if args is None:
+        return (
+            jsonify(
+                {
+                    "error": f"format must be one of {', '.join(export.ENCODERS)}; "
+                    "from and to must be YYYY-MM-DD dates"
+                }
+            ),
+            400,
+        )
+    export_format, date_range = args
+    query = {"user_id": current_user.id}
+    if date_range:
+        query["journal_date"] = date_range
+    # oldest first, walking the (user_id, journal_date, _id) index backwards
+    cursor = (
+        entries.find(query, export.EXPORT_PROJECTION)
+        .sort([("journal_date", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)])
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+    app.logger.debug("*** export_entries(): %s export of %s", export_format, query)
+
+    def stream():
+        try:
+            yield from export.ENCODERS[export_format](cursor, EXPORT_CHUNK_ROWS)
+        finally:
+            cursor.close()
+
+    filename = f"feelwrite-journal.{export_format}"
+    return Response(
+        stream(),
+        content_type=export.CONTENT_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Report request timings and pool metrics in the Prometheus text format"""
+    return Response(
+        metrics.render_prometheus(), content_type=metrics.PROMETHEUS_CONTENT_TYPE
+    )
+
 
-    return render_template("page.html", entry=entry, sentiment_score=sentiment_score)
+@app.route("/stats")
+def stats():
+    """Report request timings and MongoDB connection pool metrics"""
+    return jsonify(metrics.snapshot())
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Development server only; production uses gunicorn with gunicorn_config.py
+    ensure_indexes()
+    app.run(debug=os.getenv("FLASK_DEBUG", "false").lower() == "true")
     app.logger.debug("*** web-app is running")
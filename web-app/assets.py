@@ -0,0 +1,120 @@
+"""
+Fingerprinted static assets built by build_assets.py.
+Templates link assets with asset_url("1.jpg") (or asset_url("1.jpg", "webp")
+for another format) and image_set("1.jpg") for a CSS image-set() offering
+AVIF and WebP. Built files are served under /assets/ with immutable cache
+headers and, when the client accepts it, a precompressed brotli or gzip body.
+Without a build, the helpers fall back to the files in static/.
+"""
+
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+
+from flask import request, send_from_directory, url_for
+from markupsafe import Markup, escape
+
+logger = logging.getLogger(__name__)
+
+ASSET_MAX_AGE = 365 * 24 * 3600
+# Precompressed siblings in order of preference: (Content-Encoding, suffix)
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# image-set() candidates in order of preference: (variant, MIME type)
+IMAGE_SET_TYPES = (("avif", "image/avif"), ("webp", "image/webp"))
+
+for _type, _extension in (
+    ("image/avif", ".avif"),
+    ("image/webp", ".webp"),
+    ("font/woff2", ".woff2"),
+    ("font/ttf", ".ttf"),
+):
+    mimetypes.add_type(_type, _extension)
+
+
+def load_manifest(path):
+    """Return the manifest written by build_assets.py, or {} if there is none."""
+    try:
+        with open(path, encoding="utf-8") as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        logger.info("* assets: %s not found, serving unbuilt static files", path)
+        return {}
+
+
+def init_app(app, dist_dir=None):
+    """
+    Register the /assets/ route and the asset_url and image_set template helpers.
+
+    Args:
+        app (flask.Flask): The app.
+        dist_dir (str, optional): Build output; defaults to static/dist.
+
+    Returns:
+        str: A hash of the manifest, which changes whenever asset URLs do.
+    """
+    dist_dir = dist_dir or os.path.join(app.static_folder, "dist")
+    manifest = load_manifest(os.path.join(dist_dir, "manifest.json"))
+    built = {path for variants in manifest.values() for path in variants.values()}
+
+    def asset_url(name, variant=None):
+        """URL of an asset's built file, or of the unbuilt file in static/."""
+        variants = manifest.get(name)
+        if not variants:
+            return url_for("static", filename=name)
+        original = os.path.splitext(name)[1].lstrip(".").lower()
+        path = variants.get(variant or original) or variants[original]
+        return url_for("send_asset", filename=path)
+
+    def image_set(name):
+        """CSS image-set() of an image's AVIF, WebP and original versions."""
+        variants = manifest.get(name, {})
+        original = os.path.splitext(name)[1].lstrip(".").lower()
+        candidates = [
+            (variant, mime_type)
+            for variant, mime_type in IMAGE_SET_TYPES
+            if variant in variants and variant != original
+        ]
+        candidates.append((original, mimetypes.guess_type(name)[0]))
+        return Markup("image-set({})").format(
+            Markup(", ").join(
+                Markup('url("{}") type("{}")').format(
+                    asset_url(name, variant), escape(mime_type)
+                )
+                for variant, mime_type in candidates
+            )
+        )
+
+    app.jinja_env.globals.update(asset_url=asset_url, image_set=image_set)
+
+    @app.route("/assets/<path:filename>")
+    def send_asset(filename):
+        """Serve a built asset, precompressed if the client accepts it"""
+        if filename not in built:
+            return "Asset not found", 404
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding, suffix in ENCODINGS:
+            if request.accept_encodings[encoding] and os.path.exists(
+                os.path.join(dist_dir, filename + suffix)
+            ):
+                response = send_from_directory(
+                    dist_dir,
+                    filename + suffix,
+                    mimetype=mimetype,
+                    max_age=ASSET_MAX_AGE,
+                )
+                response.headers["Content-Encoding"] = encoding
+                break
+        else:
+            response = send_from_directory(
+                dist_dir, filename, mimetype=mimetype, max_age=ASSET_MAX_AGE
+            )
+        if os.path.exists(os.path.join(dist_dir, filename + ENCODINGS[0][1])):
+            response.vary.add("Accept-Encoding")
+        # the file name changes with its content, so it never needs revalidating
+        response.cache_control.immutable = True
+        return response
+
+    payload = json.dumps(manifest, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()[:12]
@@ -0,0 +1,157 @@
+"""
+Build fingerprinted, compressed copies of the web app's static assets:
+
+    python build_assets.py
+
+Every file in static/ is copied to static/dist/ under a name containing a
+hash of its content (e.g. 1.3f2a9c0b1d.jpg), so the copies can be cached
+by browsers forever. JPEG and PNG images also get WebP and AVIF versions,
+TrueType fonts get a WOFF2 version, and files that compress well get
+precompressed .gz and .br siblings. static/dist/manifest.json maps each
+source name to its built files; the app's asset_url helper reads it.
+The Docker image runs this step at build time.
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+
+import brotli
+from fontTools.ttLib import TTFont
+from PIL import Image
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BASE_DIR, "static")
+OUTPUT_DIR = os.path.join(SOURCE_DIR, "dist")
+MANIFEST = "manifest.json"
+
+# Images that get modern formats, and the quality each format is encoded at
+RASTER_EXTENSIONS = (".jpg", ".jpeg", ".png")
+IMAGE_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 6}),
+    "avif": ("AVIF", {"quality": 50}),
+}
+# Files already compressed by their format aren't gzipped or brotli'd
+PRECOMPRESS_EXTENSIONS = (".ttf", ".otf", ".svg", ".css", ".js", ".json", ".txt")
+
+
+def fingerprint(name, data):
+    """Return name with a hash of data before its extension."""
+    stem, extension = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{extension}"
+
+
+def encode_image(data, image_format, options):
+    """Re-encode image bytes in another format."""
+    with Image.open(io.BytesIO(data)) as image:
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        output = io.BytesIO()
+        image.save(output, image_format, **options)
+    return output.getvalue()
+
+
+def encode_woff2(data):
+    """Convert TrueType or OpenType font bytes to WOFF2."""
+    font = TTFont(io.BytesIO(data))
+    font.flavor = "woff2"
+    output = io.BytesIO()
+    font.save(output)
+    return output.getvalue()
+
+
+def variants(name, data):
+    """
+    Return the built versions of a source file.
+
+    Returns:
+        dict[str, bytes]: File content by variant: the original's extension
+        (e.g. "jpg") and any alternative formats (e.g. "webp", "avif").
+    """
+    extension = os.path.splitext(name)[1].lower()
+    built = {extension.lstrip("."): data}
+    if extension in RASTER_EXTENSIONS:
+        for variant, (image_format, options) in IMAGE_FORMATS.items():
+            built[variant] = encode_image(data, image_format, options)
+    elif extension in (".ttf", ".otf"):
+        built["woff2"] = encode_woff2(data)
+    return built
+
+
+def write(path, data):
+    """Write bytes to path, creating its directory."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as output:
+        output.write(data)
+
+
+def build_file(name, data, output_dir):
+    """
+    Write the fingerprinted variants of one source file.
+
+    Returns:
+        dict[str, str]: Built file name by variant.
+    """
+    stem = os.path.splitext(name)[0]
+    built = {}
+    for variant, content in variants(name, data).items():
+        built_name = fingerprint(f"{stem}.{variant}", content)
+        built_path = os.path.join(output_dir, built_name)
+        write(built_path, content)
+        if built_name.endswith(PRECOMPRESS_EXTENSIONS):
+            write(built_path + ".gz", gzip.compress(content, 9, mtime=0))
+            write(built_path + ".br", brotli.compress(content, quality=11))
+        built[variant] = built_name
+    return built
+
+
+def build_assets(source_dir=SOURCE_DIR, output_dir=OUTPUT_DIR):
+    """
+    Build every asset of source_dir into output_dir and write the manifest.
+
+    Returns:
+        dict: The manifest: {source name: {variant: built file name}}.
+    """
+    source_dir, output_dir = os.path.abspath(source_dir), os.path.abspath(output_dir)
+    if os.path.commonpath([source_dir, output_dir]) == output_dir:
+        raise ValueError("the output directory must not contain the sources")
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    manifest = {}
+    for root, dirs, files in os.walk(source_dir):
+        # never rebuild a previous build
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != output_dir]
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, source_dir).replace(os.sep, "/")
+            with open(path, "rb") as source:
+                data = source.read()
+            manifest[name] = build_file(name, data, output_dir)
+    write(
+        os.path.join(output_dir, MANIFEST),
+        json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"),
+    )
+    return manifest
+
+
+def main():
+    """Build the assets and print the size of each variant."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--source", default=SOURCE_DIR)
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    args = parser.parse_args()
+    manifest = build_assets(args.source, args.output)
+    for name, built in sorted(manifest.items()):
+        sizes = ", ".join(
+            f"{variant} {os.path.getsize(os.path.join(args.output, path)) // 1024} KB"
+            for variant, path in built.items()
+        )
+        print(f"{name}: {sizes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Streaming encoders for exporting journal entries.
+Entries are read from a MongoDB cursor and encoded a chunk of rows at a
+time, so an export holds one cursor batch and one chunk in memory however
+long the journal is.
+"""
+
+import csv
+import io
+import json
+
+# Columns of an exported entry, in CSV order
+EXPORT_FIELDS = (
+    "entry_id",
+    "journal_date",
+    "text",
+    "negative",
+    "neutral",
+    "positive",
+    "composite_score",
+)
+# MongoDB projection of the fields an export reads
+EXPORT_PROJECTION = {"journal_date": 1, "text": 1, "sentiment": 1}
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def export_row(entry):
+    """Flatten an entry into a dict with EXPORT_FIELDS; unscored fields are None."""
+    sentiment = entry.get("sentiment") or {}
+    return {
+        "entry_id": str(entry["_id"]),
+        "journal_date": entry.get("journal_date"),
+        "text": entry.get("text"),
+        **{field: sentiment.get(field) for field in EXPORT_FIELDS[3:]},
+    }
+
+
+def ndjson_chunks(entries, chunk_rows=500):
+    """Yield newline-delimited JSON, chunk_rows entries per chunk."""
+    lines = []
+    for entry in entries:
+        lines.append(json.dumps(export_row(entry), ensure_ascii=False))
+        if len(lines) >= chunk_rows:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def csv_chunks(entries, chunk_rows=500):
+    """Yield CSV with a header row, chunk_rows entries per chunk."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    rows = 0
+    for entry in entries:
+        writer.writerow(export_row(entry))
+        rows += 1
+        if rows >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+
+ENCODERS = {"ndjson": ndjson_chunks, "csv": csv_chunks}
@@ -0,0 +1,128 @@
+"""
+Rendered-page cache with HTTP validators.
+Pages are cached per user under a validator (ETag) built from the data they
+were rendered from, so a new sentiment or entry changes the validator and the
+old rendering is simply never looked up again. Browsers that send back a
+current ETag or Last-Modified date get a 304 without any rendering.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import make_response, request
+from werkzeug.http import is_resource_modified
+
+import metrics
+
+
+def template_fingerprint(template_dir):
+    """Return a hash of every template, so a deploy with new templates changes ETags."""
+    digest = hashlib.sha1()
+    for root, _, files in sorted(os.walk(template_dir)):
+        for name in sorted(files):
+            if name.endswith(".html"):
+                with open(os.path.join(root, name), "rb") as template:
+                    digest.update(name.encode("utf-8"))
+                    digest.update(template.read())
+    return digest.hexdigest()[:12]
+
+
+class FragmentCache:
+    """
+    Bounded LRU of rendered pages keyed by (user, page, ETag).
+
+    Args:
+        version (str): Mixed into every ETag, e.g. the template fingerprint.
+        max_size (int): Maximum number of rendered pages kept; 0 only answers
+            conditional requests and never stores pages.
+    """
+
+    def __init__(self, version, max_size=2048):
+        self.version = version
+        self.max_size = max(0, int(max_size))
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = metrics.counter(
+            "fragment_cache_hits_total", "Pages served from the rendered-page cache"
+        )
+        self.misses = metrics.counter(
+            "fragment_cache_misses_total", "Pages that had to be rendered"
+        )
+        self.not_modified = metrics.counter(
+            "fragment_cache_not_modified_total",
+            "Conditional requests answered with 304 Not Modified",
+        )
+
+    def etag(self, *parts):
+        """Return an ETag for the data a page is rendered from."""
+        payload = "\0".join(str(part) for part in (self.version, *parts))
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def not_modified_response(self, etag, last_modified=None):
+        """
+        Return a 304 response if the request's validators match, else None.
+        """
+        if is_resource_modified(
+            request.environ, etag=etag, last_modified=last_modified
+        ):
+            return None
+        self.not_modified.inc()
+        return self._with_validators(make_response("", 304), etag, last_modified)
+
+    def respond(self, key, etag, last_modified, render):
+        """
+        Answer a page request from the cache, rendering it on a miss.
+
+        Args:
+            key (tuple): The user and page, e.g. (user_id, "entry", entry_id).
+            etag (str): Validator of the data the page is rendered from.
+            last_modified (datetime, optional): When that data last changed.
+            render (callable): Returns the page's HTML.
+
+        Returns:
+            flask.Response: 304 if the client's copy is current, else the page.
+        """
+        response = self.not_modified_response(etag, last_modified)
+        if response is not None:
+            return response
+        html = self._get((key, etag))
+        if html is None:
+            self.misses.inc()
+            html = render()
+            self._set((key, etag), html)
+        else:
+            self.hits.inc()
+        return self._with_validators(make_response(html), etag, last_modified)
+
+    def clear(self):
+        """Remove every cached page."""
+        with self._lock:
+            self._items.clear()
+
+    @staticmethod
+    def _with_validators(response, etag, last_modified):
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        # pages are per user and must be revalidated before reuse
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+
+    def _get(self, key):
+        with self._lock:
+            html = self._items.get(key)
+            if html is not None:
+                self._items.move_to_end(key)
+            return html
+
+    def _set(self, key, html):
+        if self.max_size == 0:
+            return
+        with self._lock:
+            self._items[key] = html
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
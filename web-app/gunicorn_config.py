@@ -0,0 +1,48 @@
+"""
+Gunicorn settings for serving the web app in production:
+
+    gunicorn -c gunicorn_config.py app:app
+
+Worker processes, the worker class and timeouts are read from the
+environment. The default gevent workers serve each request on a greenlet,
+so the entry pages' live update streams, which stay open while idle, don't
+each hold a thread; GUNICORN_WORKER_CLASS=gthread serves requests on a
+fixed pool of GUNICORN_THREADS threads instead.
+Each worker makes sure the indexes the app relies on exist once it starts,
+and stops its password hashing processes when it exits.
+"""
+
+import os
+
+# gunicorn reads these lowercase module-level settings by name
+# pylint: disable=invalid-name
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str((os.cpu_count() or 1) * 2 + 1)))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+# Concurrent connections per gevent worker, including idle live update streams
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "2000"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+# Time given to in-flight requests to finish after SIGTERM
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+
+def post_worker_init(worker):
+    """Create the app's indexes once the worker has imported it."""
+    # pylint: disable=import-outside-toplevel
+    from app import ensure_indexes
+
+    try:
+        ensure_indexes()
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        worker.log.warning("Worker %s could not create indexes: %s", worker.pid, e)
+
+
+def worker_exit(_server, _worker):
+    """Stop the worker's password hashing processes."""
+    # pylint: disable=import-outside-toplevel
+    from app import hasher
+
+    hasher.shutdown()
@@ -0,0 +1,226 @@
+"""
+Live analysis updates for entry pages over Server-Sent Events.
+Each web worker process watches the entries collection through one shared
+MongoDB change stream, filtered to the writes that store an analysis or
+change its status, and fans the entry's current analysis fields out to the
+clients subscribed to that entry. Subscribers wait on a small queue rather than polling MongoDB,
+so with gevent workers an idle connection costs a greenlet and a socket.
+Change streams need a replica set; on a standalone server the feed reports
+itself unavailable and pages fall back to reloading.
+"""
+
+import json
+import logging
+import queue
+import threading
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Entry fields written with an analysis, sent to the page as they change
+ANALYSIS_FIELDS = ("sentiment", "heads", "analysis_status")
+# Top-level fields whose update marks a change worth sending: ml-client sets
+# sentiment_updated_at with every stored analysis, and the worker sets
+# analysis_status. The analysis itself may be reported as dotted paths
+# (sentiment.positive, heads.emotion.joy), so it isn't matched on directly.
+TRIGGER_FIELDS = ("sentiment_updated_at", "analysis_status")
+# Server error code meaning the deployment has no change streams (not a replica set)
+UNSUPPORTED_CODES = (40573,)
+# ChangeStreamHistoryLost: the resume point is no longer in the oplog
+HISTORY_LOST_CODE = 286
+
+
+def change_pipeline():
+    """
+    Return the change stream pipeline matching analysis writes to entries.
+
+    The stream is opened with the looked-up full document, whose analysis
+    fields are kept, since a partial update only reports what changed.
+    """
+    updated = "updateDescription.updatedFields"
+    return [
+        {
+            "$match": {
+                "operationType": "update",
+                "$or": [
+                    {f"{updated}.{field}": {"$exists": True}}
+                    for field in TRIGGER_FIELDS
+                ],
+            }
+        },
+        {
+            "$project": {
+                "documentKey": 1,
+                **{f"fullDocument.{field}": 1 for field in ANALYSIS_FIELDS},
+            }
+        },
+    ]
+
+
+def analysis_event(fields):
+    """Return the analysis fields of an entry or of a change's updated fields."""
+    return {field: fields[field] for field in ANALYSIS_FIELDS if field in fields}
+
+
+def format_event(event, name="analysis"):
+    """Encode an event as a Server-Sent Events message."""
+    return f"event: {name}\ndata: {json.dumps(event)}\n\n"
+
+
+class Subscription:
+    """
+    A client's queue of events for one entry.
+
+    Args:
+        feed (ChangeFeed): The feed the subscription belongs to.
+        key (str): The entry id.
+        max_events (int): Events kept while the client is slow; the oldest
+            are dropped first.
+    """
+
+    def __init__(self, feed, key, max_events):
+        self.feed = feed
+        self.key = key
+        self.events = queue.Queue(max_events)
+
+    def put(self, event):
+        """Queue an event, dropping the oldest one if the queue is full."""
+        while True:
+            try:
+                self.events.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.events.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        """Return the next event, or None if there was none within timeout seconds."""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """Stop receiving events."""
+        self.feed.unsubscribe(self)
+
+
+class ChangeFeed:  # pylint: disable=too-many-instance-attributes
+    """
+    One change stream on a collection, shared by every subscriber of a process.
+
+    The stream is opened by the first subscription and kept open afterwards;
+    after an error it is reopened from the last event it delivered.
+
+    Args:
+        collection (pymongo.collection.Collection): The watched collection.
+        max_events (int): Events queued per subscriber.
+        retry_seconds (float): Wait before reopening a failed stream.
+    """
+
+    def __init__(self, collection, max_events=16, retry_seconds=5.0):
+        self.collection = collection
+        self.max_events = max(1, int(max_events))
+        self.retry_seconds = float(retry_seconds)
+        self.available = None
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._resume_token = None
+        self._stop = threading.Event()
+        self.subscribers_gauge = metrics.gauge(
+            "live_subscribers", "Clients waiting for live analysis updates"
+        )
+        self.events_counter = metrics.counter(
+            "live_events_total", "Analysis changes received from the change stream"
+        )
+        self.errors_counter = metrics.counter(
+            "live_change_stream_errors_total", "Change stream failures"
+        )
+
+    def subscribe(self, key):
+        """Return a Subscription to the changes of one entry."""
+        subscription = Subscription(self, key, self.max_events)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscription)
+            self.subscribers_gauge.inc()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="change-feed", daemon=True
+                )
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription; closing it twice is harmless."""
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.key)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.key]
+            self.subscribers_gauge.dec()
+
+    def publish(self, key, event):
+        """Deliver an event to every subscriber of an entry."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def stop(self):
+        """Stop watching after the current event."""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._watch()
+            except OperationFailure as e:
+                if e.code in UNSUPPORTED_CODES:
+                    logger.warning("* ChangeFeed: change streams unavailable: %s", e)
+                    self.available = False
+                    return
+                if e.code == HISTORY_LOST_CODE:
+                    # the oplog no longer holds the resume point; start afresh
+                    self._resume_token = None
+                self._failed(e)
+            except PyMongoError as e:
+                self._failed(e)
+            except Exception:  # pylint: disable=broad-exception-caught
+                # e.g. a client without change streams; stop rather than spin
+                logger.exception("* ChangeFeed: change stream stopped")
+                self.available = False
+                return
+
+    def _watch(self):
+        with self.collection.watch(
+            change_pipeline(),
+            full_document="updateLookup",
+            resume_after=self._resume_token,
+        ) as stream:
+            self.available = True
+            while not self._stop.is_set():
+                change = stream.try_next()
+                if change is None:
+                    continue
+                self._resume_token = stream.resume_token
+                # None when the entry was deleted before the lookup
+                if change.get("fullDocument") is None:
+                    continue
+                self.events_counter.inc()
+                self.publish(
+                    str(change["documentKey"]["_id"]),
+                    analysis_event(change["fullDocument"]),
+                )
+
+    def _failed(self, error):
+        self.errors_counter.inc()
+        logger.error("* ChangeFeed: change stream failed: %s", error)
+        self._stop.wait(self.retry_seconds)
@@ -0,0 +1,263 @@
+"""
+Lightweight in-process metrics for the web app.
+Counters, gauges and histograms are registered by name (and optional labels)
+in a module-level registry so that any module can record observations and
+the Flask app can report all of them, as JSON from /stats or in the
+Prometheus text format from /metrics.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+
+# Default histogram buckets, in seconds, suitable for request latencies
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    """Format labels as a Prometheus label set, e.g. {endpoint="analyze"}."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Metric:
+    """Base class holding a metric's name, help text and labels."""
+
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=None):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(sorted((labels or {}).items()))
+        self._lock = threading.Lock()
+
+    @property
+    def series(self):
+        """The metric's name with its labels, e.g. requests_total{code="500"}."""
+        return self.name + format_labels(self.labels)
+
+    def samples(self):
+        """Return (name, labels, value) samples in the Prometheus format."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """A monotonically increasing counter."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=None):
+        super().__init__(name, help_text, labels)
+        self._value = 0
+
+    def inc(self, amount=1):
+        """Increase the counter by the given amount."""
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        """Current value of the counter."""
+        return self._value
+
+    def snapshot(self):
+        """Return the counter as a JSON-serializable dict."""
+        return {"type": "counter", "help": self.help_text, "value": self._value}
+
+    def samples(self):
+        return [(self.name, self.labels, self._value)]
+
+
+class Gauge(Metric):
+    """A value that can go up and down, such as connections in use."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=None):
+        super().__init__(name, help_text, labels)
+        self._value = 0
+
+    def inc(self, amount=1):
+        """Increase the gauge by the given amount."""
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        """Decrease the gauge by the given amount."""
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value):
+        """Set the gauge to the given value."""
+        with self._lock:
+            self._value = value
+
+    @property
+    def value(self):
+        """Current value of the gauge."""
+        return self._value
+
+    def snapshot(self):
+        """Return the gauge as a JSON-serializable dict."""
+        return {"type": "gauge", "help": self.help_text, "value": self._value}
+
+    def samples(self):
+        return [(self.name, self.labels, self._value)]
+
+
+class Histogram(Metric):
+    """A histogram with fixed, cumulative upper-bound buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS, labels=None):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+        """Record a single observation."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of the with block, in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self):
+        """
+        Return the histogram as a JSON-serializable dict.
+
+        Bucket counts are cumulative, so the value for an upper bound is the
+        number of observations less than or equal to it.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+            running += bucket_count
+            cumulative.append([bound, running])
+        return {
+            "type": "histogram",
+            "help": self.help_text,
+            "buckets": cumulative,
+            "count": count,
+            "sum": total,
+        }
+
+    def samples(self):
+        state = self.snapshot()
+        samples = [
+            (f"{self.name}_bucket", self.labels + (("le", bound),), count)
+            for bound, count in state["buckets"]
+        ]
+        samples.append((f"{self.name}_sum", self.labels, state["sum"]))
+        samples.append((f"{self.name}_count", self.labels, state["count"]))
+        return samples
+
+
+def _get_or_create(name, labels, factory):
+    key = (name, tuple(sorted((labels or {}).items())))
+    with _registry_lock:
+        metric = _registry.get(key)
+        if metric is None:
+            metric = factory()
+            _registry[key] = metric
+        return metric
+
+
+def counter(name, help_text, labels=None):
+    """Return the counter registered under name and labels, creating it if needed."""
+    return _get_or_create(name, labels, lambda: Counter(name, help_text, labels))
+
+
+def gauge(name, help_text, labels=None):
+    """Return the gauge registered under name and labels, creating it if needed."""
+    return _get_or_create(name, labels, lambda: Gauge(name, help_text, labels))
+
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS, labels=None):
+    """Return the histogram registered under name and labels, creating it if needed."""
+    return _get_or_create(
+        name, labels, lambda: Histogram(name, help_text, buckets, labels)
+    )
+
+
+def snapshot():
+    """Return a snapshot of every registered metric keyed by name and labels."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {metric.series: metric.snapshot() for metric in metrics}
+
+
+def render_prometheus():
+    """Render every registered metric in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+    lines = []
+    family = None
+    for metric in metrics:
+        if metric.name != family:
+            family = metric.name
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def instrument_app(app):
+    """
+    Time every request of a Flask app and count error responses by endpoint.
+
+    Records http_request_seconds and http_request_errors_total, labelled with
+    the endpoint (and status code for errors).
+    """
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop("request_started", None)
+        endpoint = request.endpoint or "unmatched"
+        if started is not None:
+            histogram(
+                "http_request_seconds",
+                "Time to handle a request, by endpoint",
+                labels={"endpoint": endpoint},
+            ).observe(time.perf_counter() - started)
+        if response.status_code >= 400:
+            counter(
+                "http_request_errors_total",
+                "Requests answered with an error status, by endpoint and status",
+                labels={"endpoint": endpoint, "status": response.status_code},
+            ).inc()
+        return response
@@ -0,0 +1,244 @@
+"""
+HTTP client for the web app's calls to ml-client.
+Requests go through one pooled keep-alive session, round-robin over the
+configured ml-client replicas. Each replica has a circuit breaker: after a
+run of failures it is skipped until a cool-down has passed, so an unhealthy
+ml-client is failed fast instead of waiting out the timeout on every call.
+Optionally a request that is slower than the hedge delay is also sent to the
+next replica, and whichever answers first is used; only use hedging for
+idempotent requests.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Threads sending hedged requests, whatever the connection pool size: each
+# hedged call uses at most two, and calls beyond that are sent unhedged
+HEDGE_MAX_WORKERS = 16
+
+
+class CircuitOpen(requests.exceptions.RequestException):
+    """Raised when every ml-client replica's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed, it lets every request through. After failure_threshold failures
+    in a row it opens and rejects requests for reset_seconds; then it lets a
+    single trial request through (half-open) and closes again if it succeeds.
+
+    Args:
+        name (str): Label of the breaker's metrics, e.g. the replica URL.
+        failure_threshold (int): Consecutive failures that open the breaker.
+        reset_seconds (float): How long the breaker stays open.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_seconds=30.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_seconds = float(reset_seconds)
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.open_gauge = metrics.gauge(
+            "ml_client_circuit_open",
+            "1 while the circuit breaker of an ml-client replica is open",
+            labels={"replica": name},
+        )
+
+    def allow(self):
+        """Return whether a request may be sent now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        """Close the breaker."""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+            self.open_gauge.set(0)
+
+    def record_failure(self):
+        """Count a failure, opening the breaker at the threshold or after a trial."""
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(
+                        "* CircuitBreaker: opening after %d failures", self.failures
+                    )
+                self.opened_at = time.monotonic()
+                self._trial_running = False
+                self.open_gauge.set(1)
+
+    def release_trial(self):
+        """End a half-open trial that got no answer, so another can be sent."""
+        with self._lock:
+            self._trial_running = False
+
+
+class MLClient:  # pylint: disable=too-many-instance-attributes
+    """
+    Pooled, load-balanced client for ml-client replicas.
+
+    Args:
+        urls (list[str]): Base URLs of the replicas, e.g. ["http://ml-client:5001"].
+        timeout (float): Seconds to wait for a replica's response.
+        pool_size (int): Keep-alive connections kept per replica; match the
+            number of threads or greenlets that call the client at once.
+        failure_threshold (int): Consecutive failures that open a replica's breaker.
+        reset_seconds (float): How long an open breaker skips its replica.
+        hedge_after (float, optional): Seconds after which a request that has
+            not been answered is also sent to the next replica; None disables
+            hedging.
+        session (requests.Session, optional): Session to send requests with.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        urls,
+        *,
+        timeout=5.0,
+        pool_size=4,
+        failure_threshold=5,
+        reset_seconds=30.0,
+        hedge_after=None,
+        session=None,
+    ):
+        self.urls = [url.rstrip("/") for url in urls]
+        if not self.urls:
+            raise ValueError("at least one ml-client URL is required")
+        self.timeout = float(timeout)
+        self.hedge_after = hedge_after
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=len(self.urls), pool_maxsize=max(1, int(pool_size))
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.breakers = {
+            url: CircuitBreaker(url, failure_threshold, reset_seconds)
+            for url in self.urls
+        }
+        self._turns = itertools.count()
+        self._hedge_pool = (
+            ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS)
+            if hedge_after is not None
+            else None
+        )
+        self._hedge_slots = threading.BoundedSemaphore(HEDGE_MAX_WORKERS // 2)
+        self.rejected = metrics.counter(
+            "ml_client_circuit_rejections_total",
+            "Calls to ml-client failed fast because every breaker was open",
+        )
+        self.hedged = metrics.counter(
+            "ml_client_hedged_requests_total",
+            "Calls to ml-client also sent to a second replica after the hedge delay",
+        )
+
+    def replicas(self):
+        """Yield the replicas whose breaker allows a request, in round-robin order."""
+        start = next(self._turns) % len(self.urls)
+        for url in self.urls[start:] + self.urls[:start]:
+            # allow() may claim a half-open breaker's trial, so only ask for
+            # as many replicas as are used
+            if self.breakers[url].allow():
+                yield url
+
+    def post(self, path, payload):
+        """
+        POST a JSON payload to one replica, hedging to a second if configured.
+
+        Returns:
+            requests.Response: The first response that isn't a 5xx, or the
+            last response received.
+
+        Raises:
+            CircuitOpen: If every replica's breaker is open.
+            requests.exceptions.RequestException: If the request failed.
+        """
+        replicas = self.replicas()
+        first = next(replicas, None)
+        if first is None:
+            self.rejected.inc()
+            raise CircuitOpen("ml-client is unavailable")
+        if self._hedge_pool is None or len(self.urls) < 2:
+            return self._send(first, path, payload)
+        # a non-blocking acquire, released in the finally below
+        # pylint: disable-next=consider-using-with
+        if not self._hedge_slots.acquire(blocking=False):
+            # every hedging thread is busy; don't queue behind them
+            return self._send(first, path, payload)
+
+        try:
+            pending = {self._hedge_pool.submit(self._send, first, path, payload)}
+            done, pending = wait(pending, timeout=self.hedge_after)
+            if not done:
+                second = next(replicas, None)
+                if second is not None:
+                    self.hedged.inc()
+                    pending.add(
+                        self._hedge_pool.submit(self._send, second, path, payload)
+                    )
+            return self._first_answer(done, pending)
+        finally:
+            self._hedge_slots.release()
+
+    def _first_answer(self, done, pending):
+        """Return the first non-5xx response among the futures."""
+        response, error = None, None
+        while True:
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    error = e
+                    continue
+                if response.status_code < 500:
+                    return response
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        if response is not None:
+            return response
+        raise error
+
+    def _send(self, url, path, payload):
+        breaker = self.breakers[url]
+        answered = None
+        try:
+            response = self.session.post(url + path, json=payload, timeout=self.timeout)
+            answered = response.status_code < 500
+            return response
+        except requests.exceptions.RequestException:
+            answered = False
+            raise
+        finally:
+            if answered is None:
+                # neither a response nor a request error (e.g. a bug or a
+                # killed greenlet): don't leave a half-open trial running
+                breaker.release_trial()
+            elif answered:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
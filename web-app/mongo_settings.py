@@ -0,0 +1,161 @@
+"""
+MongoDB connection settings read from the environment.
+Both services build their MongoClient here so pool size, timeouts, wire
+compression and write concerns are configured the same way. The module is
+kept identical in machine-learning-client/ and web-app/, which are separate
+Docker build contexts.
+
+Connection pool activity is recorded in the metrics registry: open and
+checked-out connections, pool utilization, checkout wait times and
+checkout failures.
+"""
+
+import os
+
+from pymongo import MongoClient, monitoring
+from pymongo.write_concern import WriteConcern
+
+import metrics
+
+# Settings unset in the environment keep the pymongo default
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+# Comma-separated wire compressors in order of preference, e.g. zstd,snappy
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+# Talk only to MONGO_HOST instead of discovering the replica set's members,
+# e.g. when the host name the members advertise isn't reachable from here
+MONGO_DIRECT_CONNECTION = (
+    os.getenv("MONGO_DIRECT_CONNECTION", "false").lower() == "true"
+)
+
+# MongoClient option -> environment variable, for optional millisecond timeouts
+TIMEOUT_SETTINGS = {
+    "waitQueueTimeoutMS": "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+    "serverSelectionTimeoutMS": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+    "connectTimeoutMS": "MONGO_CONNECT_TIMEOUT_MS",
+    "socketTimeoutMS": "MONGO_SOCKET_TIMEOUT_MS",
+}
+
+# Checkout waits are usually sub-millisecond; long ones mean the pool is exhausted
+CHECKOUT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+
+def parse_write_concern(value):
+    """
+    Parse a write concern setting such as "0", "1" or "majority".
+
+    A ":j" suffix also waits for the journal, e.g. "majority:j".
+    """
+    w, _, journal = value.partition(":")
+    return WriteConcern(w=int(w) if w.isdigit() else w, j=True if journal else None)
+
+
+def write_concern(operation):
+    """
+    Return the write concern configured for an operation, if any.
+
+    Reads MONGO_WRITE_CONCERN_<OPERATION>, e.g. MONGO_WRITE_CONCERN_SENTIMENT=0
+    for unacknowledged sentiment writes.
+
+    Returns:
+        WriteConcern or None: None keeps the client's write concern.
+    """
+    value = os.getenv(f"MONGO_WRITE_CONCERN_{operation.upper()}", "")
+    return parse_write_concern(value) if value else None
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Record connection pool activity in the metrics registry."""
+
+    def __init__(self, max_pool_size):
+        self.max_pool_size = max_pool_size
+        self.open = metrics.gauge(
+            "mongo_pool_connections", "Open connections in the MongoDB pool"
+        )
+        self.checked_out = metrics.gauge(
+            "mongo_pool_checked_out", "MongoDB connections currently in use"
+        )
+        self.utilization = metrics.gauge(
+            "mongo_pool_utilization", "Share of the MongoDB pool's connections in use"
+        )
+        self.wait = metrics.histogram(
+            "mongo_pool_checkout_wait_seconds",
+            "Time spent waiting to check out a MongoDB connection",
+            CHECKOUT_BUCKETS,
+        )
+        self.failures = metrics.counter(
+            "mongo_pool_checkout_failures_total",
+            "MongoDB connection checkouts that failed or timed out",
+        )
+
+    def _update_utilization(self):
+        if self.max_pool_size:
+            self.utilization.set(self.checked_out.value / self.max_pool_size)
+
+    def connection_created(self, event):
+        self.open.inc()
+
+    def connection_closed(self, event):
+        self.open.dec()
+
+    def connection_checked_out(self, event):
+        self.checked_out.inc()
+        self._update_utilization()
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            self.wait.observe(duration)
+
+    def connection_checked_in(self, event):
+        self.checked_out.dec()
+        self._update_utilization()
+
+    def connection_check_out_failed(self, event):
+        self.failures.inc()
+
+    # pool lifecycle events that don't change the metrics
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+def client_options():
+    """Return the MongoClient keyword arguments configured in the environment."""
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "event_listeners": [PoolMetrics(MONGO_MAX_POOL_SIZE)],
+    }
+    for option, variable in TIMEOUT_SETTINGS.items():
+        if os.getenv(variable):
+            options[option] = int(os.getenv(variable))
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    if MONGO_DIRECT_CONNECTION:
+        options["directConnection"] = True
+    default_write_concern = os.getenv("MONGO_WRITE_CONCERN", "")
+    if default_write_concern:
+        options.update(parse_write_concern(default_write_concern).document)
+    return options
+
+
+def create_client():
+    """Create a MongoClient for MONGO_HOST and MONGO_PORT with pooled settings."""
+    return MongoClient(
+        host=os.getenv("MONGO_HOST"),
+        port=int(os.getenv("MONGO_PORT")),
+        **client_options(),
+    )
@@ -0,0 +1,126 @@
+"""
+Password hashing off the request thread.
+bcrypt is deliberately slow, so hashes are computed in a small process pool
+instead of on the web worker's request threads. A bounded number of hashing
+requests may be pending at once; beyond that callers are turned away
+quickly with HasherBusy rather than queueing behind a burst of logins.
+"""
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# bcrypt only uses the first 72 bytes of a password; older bcrypt releases
+# truncated silently, newer ones raise, so truncate to keep existing hashes valid
+BCRYPT_MAX_BYTES = 72
+
+
+class HasherBusy(Exception):
+    """Raised when too many hashing requests are already pending."""
+
+
+def _encode(password):
+    return password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+
+
+def hash_password(password, rounds):
+    """Return the bcrypt hash of a password with the given work factor."""
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def check_password(hashed, password):
+    """Return whether a password matches a bcrypt hash."""
+    return bcrypt.checkpw(_encode(password), hashed.encode("utf-8"))
+
+
+def hash_rounds(hashed):
+    """Return the work factor of a bcrypt hash such as "$2b$12$...", or None."""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing in a bounded process pool.
+
+    Args:
+        rounds (int): bcrypt work factor (log2 of the iterations) for new hashes.
+        workers (int): Hashing processes; 0 hashes on the calling thread.
+        max_pending (int): Hashing requests allowed in flight at once.
+        acquire_timeout (float): Seconds to wait for a free slot before
+            raising HasherBusy.
+    """
+
+    def __init__(self, rounds=12, workers=1, max_pending=8, acquire_timeout=2.0):
+        self.rounds = int(rounds)
+        self.workers = max(0, int(workers))
+        self.acquire_timeout = float(acquire_timeout)
+        self._slots = threading.BoundedSemaphore(max(1, int(max_pending)))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.rejected = metrics.counter(
+            "password_hash_rejected_total",
+            "Password hashing requests turned away because the pool was full",
+        )
+
+    def hash(self, password):
+        """Hash a new password with the configured work factor."""
+        return self._run("hash", hash_password, password, self.rounds)
+
+    def check(self, hashed, password):
+        """Check a password against a stored hash."""
+        return self._run("check", check_password, hashed, password)
+
+    def needs_rehash(self, hashed):
+        """Return whether a stored hash uses a different work factor."""
+        return hash_rounds(hashed) != self.rounds
+
+    def shutdown(self):
+        """Stop the hashing processes."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _executor(self):
+        # Created on first use so each gunicorn worker starts its own pool;
+        # spawned rather than forked from a multi-threaded web worker
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def _run(self, operation, function, *args):
+        # pylint: disable-next=consider-using-with
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self.rejected.inc()
+            raise HasherBusy(f"too many pending password {operation} requests")
+        try:
+            with metrics.histogram(
+                "password_hash_seconds",
+                "Time to hash or check a password, including the wait for a process",
+                labels={"operation": operation},
+            ).time():
+                if self.workers == 0:
+                    return function(*args)
+                return self._executor().submit(function, *args).result()
+        except BrokenProcessPool:
+            # A hashing process died; start a new pool for the next request
+            logger.warning("* PasswordHasher: process pool broke, restarting it")
+            self.shutdown()
+            raise
+        finally:
+            self._slots.release()
@@ -0,0 +1,76 @@
+"""
+Sliding-window limiter for failed logins.
+Failed attempts are counted per key (a username or a client IP) and a key
+is locked out once it reaches the limit within the window, so brute-force
+traffic is rejected before any password hashing is done.
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+
+
+class RateLimiter:
+    """
+    In-process count of recent failures per key.
+
+    Args:
+        max_failures (int): Failures allowed within the window.
+        window_seconds (float): Length of the sliding window.
+        max_keys (int): Keys tracked at once; when exceeded, keys without
+            recent failures are forgotten first.
+    """
+
+    def __init__(self, max_failures, window_seconds, max_keys=100000):
+        self.max_failures = int(max_failures)
+        self.window = float(window_seconds)
+        self.max_keys = int(max_keys)
+        self._failures = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def retry_after(self, key):
+        """
+        Return the seconds until key may try again, or 0 if it isn't limited.
+        """
+        now = time.monotonic()
+        with self._lock:
+            failures = self._failures.get(key)
+            if not failures:
+                return 0
+            self._expire(failures, now)
+            if len(failures) < self.max_failures:
+                return 0
+            return max(1, int(failures[0] + self.window - now) + 1)
+
+    def record_failure(self, key):
+        """Count a failed attempt for key."""
+        now = time.monotonic()
+        with self._lock:
+            if key not in self._failures and len(self._failures) >= self.max_keys:
+                self._prune(now)
+            failures = self._failures[key]
+            self._expire(failures, now)
+            failures.append(now)
+
+    def reset(self, key):
+        """Forget the failures of key, e.g. after a successful login."""
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def clear(self):
+        """Forget every key."""
+        with self._lock:
+            self._failures.clear()
+
+    def _expire(self, failures, now):
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+
+    def _prune(self, now):
+        for key in list(self._failures):
+            self._expire(self._failures[key], now)
+            if not self._failures[key]:
+                del self._failures[key]
+        # Still full of active keys: drop the oldest ones
+        while len(self._failures) >= self.max_keys:
+            del self._failures[next(iter(self._failures))]
@@ -1,9 +1,20 @@
 """Unit tests for the Flask app routes."""
 
+from datetime import datetime
 from unittest.mock import patch
 import pytest
 from bson.objectid import ObjectId
-from app import app
+from pymongo.errors import DuplicateKeyError
+from ml_api import CircuitOpen
+from passwords import HasherBusy
+from app import (
+    app,
+    login_limits,
+    page_cache,
+    user_cache,
+    ENTRY_VERSION_FIELDS,
+    PAGE_SIZE,
+)
 
 
 # pylint: disable=too-few-public-methods
@@ -27,14 +38,18 @@ class MockUser:
 def client():
     """Fixture to create a test client for the Flask app."""
     app.config["TESTING"] = True
+    user_cache.clear()
+    page_cache.clear()
+    for limiter in login_limits.values():
+        limiter.clear()
     with app.test_client() as client:
         yield client
 
 
 @patch("app.users")
-@patch("app.bcrypt")
+@patch("app.hasher")
 def test_login_success(
-    mock_bcrypt, mock_users, client
+    mock_hasher, mock_users, client
 ):  # pylint: disable=redefined-outer-name
     """Test successful login."""
     mock_users.find_one.return_value = {
@@ -42,7 +57,8 @@ def test_login_success(
         "username": "testuser",
         "password": "hashed_password",
     }
-    mock_bcrypt.check_password_hash.return_value = True
+    mock_hasher.check.return_value = True
+    mock_hasher.needs_rehash.return_value = False
 
     response = client.post(
         "/login-signup",
@@ -66,13 +82,12 @@ def test_login_failure(mock_users, client):  # pylint: disable=redefined-outer-n
 
 
 @patch("app.users")
-@patch("app.bcrypt")
+@patch("app.hasher")
 def test_signup_success(
-    mock_bcrypt, mock_users, client
+    mock_hasher, mock_users, client
 ):  # pylint: disable=redefined-outer-name
     """Test successful signup."""
-    mock_users.find_one.return_value = None
-    mock_bcrypt.generate_password_hash.return_value = b"hashed_password"
+    mock_hasher.hash.return_value = "hashed_password"
 
     response = client.post(
         "/login-signup",
@@ -80,12 +95,84 @@ def test_signup_success(
     )
     assert response.status_code == 302
     assert response.location.endswith("/login-signup")
+    mock_users.insert_one.assert_called_once()
+
+
+@patch("app.users")
+@patch("app.hasher")
+def test_login_rehashes_outdated_password(
+    mock_hasher, mock_users, client
+):  # pylint: disable=redefined-outer-name
+    """Test a hash with an old work factor is replaced after a successful login."""
+    user_id = ObjectId()
+    mock_users.find_one.return_value = {
+        "_id": user_id,
+        "username": "testuser",
+        "password": "old_hash",
+    }
+    mock_hasher.check.return_value = True
+    mock_hasher.needs_rehash.return_value = True
+    mock_hasher.hash.return_value = "new_hash"
+
+    response = client.post(
+        "/login-signup",
+        data={"username": "testuser", "password": "password", "submit": "Login"},
+    )
+    assert response.status_code == 302
+    mock_users.update_one.assert_called_once_with(
+        {"_id": user_id, "password": "old_hash"}, {"$set": {"password": "new_hash"}}
+    )
+
+
+@patch("app.users")
+@patch("app.hasher")
+def test_login_rate_limited_after_failures(
+    mock_hasher, mock_users, client
+):  # pylint: disable=redefined-outer-name
+    """Test repeated failed logins for a username are rejected without hashing."""
+    mock_users.find_one.return_value = {
+        "_id": ObjectId(),
+        "username": "testuser",
+        "password": "hash",
+    }
+    mock_hasher.check.return_value = False
+    form = {"username": "testuser", "password": "guess", "submit": "Login"}
+    limit = login_limits["username"].max_failures
+
+    for _ in range(limit):
+        assert client.post("/login-signup", data=form).status_code == 400
+    response = client.post("/login-signup", data=form)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert mock_hasher.check.call_count == limit
+
+
+@patch("app.users")
+@patch("app.hasher")
+def test_login_busy_hasher(
+    mock_hasher, mock_users, client
+):  # pylint: disable=redefined-outer-name
+    """Test logins are answered with 503 when the hashing pool is full."""
+    mock_users.find_one.return_value = {
+        "_id": ObjectId(),
+        "username": "testuser",
+        "password": "hash",
+    }
+    mock_hasher.check.side_effect = HasherBusy("full")
+
+    response = client.post(
+        "/login-signup",
+        data={"username": "testuser", "password": "password", "submit": "Login"},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
 
 
 @patch("app.users")
 def test_signup_failure(mock_users, client):  # pylint: disable=redefined-outer-name
     """Test signup failure when user already exists."""
-    mock_users.find_one.return_value = {"_id": ObjectId(), "username": "existinguser"}
+    mock_users.insert_one.side_effect = DuplicateKeyError("duplicate username")
 
     response = client.post(
         "/login-signup",
@@ -106,13 +193,52 @@ def test_home_authenticated(
     mock_current_user.id = "test_user_id"
 
     fake_entries = [{"_id": 1, "text": "Test entry"}]
-    mock_entries.find.return_value.sort.return_value = fake_entries
+    mock_entries.find.return_value.sort.return_value.limit.return_value = fake_entries
 
     response = client.get("/")
 
     assert response.status_code == 200
-    mock_entries.find.assert_called_once_with({"user_id": "test_user_id"})
-    mock_render_template.assert_called_once_with("index.html", entries=fake_entries)
+    assert mock_entries.find.call_args[0][0] == {"user_id": "test_user_id"}
+    mock_entries.find.return_value.sort.return_value.limit.assert_called_once_with(
+        PAGE_SIZE + 1
+    )
+    mock_render_template.assert_called_once_with(
+        "index.html", entries=fake_entries, next_cursor=None
+    )
+
+
+@patch("app.render_template")
+@patch("app.entries")
+@patch("app.current_user")
+def test_home_next_page(
+    mock_current_user, mock_entries, mock_render_template, client
+):  # pylint: disable=redefined-outer-name
+    """Test that the home route continues after the cursor and links the next page."""
+    mock_current_user.is_authenticated = True
+    mock_current_user.id = "test_user_id"
+    cursor_id = ObjectId()
+    fake_entries = [
+        {"_id": ObjectId(), "journal_date": "2025-04-01", "text": "Entry"}
+        for _ in range(PAGE_SIZE + 1)
+    ]
+    mock_entries.find.return_value.sort.return_value.limit.return_value = fake_entries
+
+    response = client.get(f"/?after=2025-04-02_{cursor_id}")
+
+    assert response.status_code == 200
+    assert mock_entries.find.call_args[0][0] == {
+        "user_id": "test_user_id",
+        "$or": [
+            {"journal_date": {"$lt": "2025-04-02"}},
+            {"journal_date": "2025-04-02", "_id": {"$lt": cursor_id}},
+        ],
+    }
+    last = fake_entries[PAGE_SIZE - 1]
+    mock_render_template.assert_called_once_with(
+        "index.html",
+        entries=fake_entries[:PAGE_SIZE],
+        next_cursor=f"2025-04-01_{last['_id']}",
+    )
 
 
 @patch("app.current_user")
@@ -154,18 +280,19 @@ def test_add_entry(
     mock_render_template.assert_called_once_with("new_entry.html")
 
 
-@patch("app.requests.post")
+@patch("app.ASYNC_ANALYSIS", False)
+@patch("app.ml_api")
 @patch("app.entries")
 @patch("app.current_user")
 @patch("app.users")
 def test_submit_entry(
-    mock_users, mock_current_user, mock_entries, mock_requests, client
+    mock_users, mock_current_user, mock_entries, mock_ml_api, client
 ):  # pylint: disable=redefined-outer-name
-    """Test submitting a journal entry."""
+    """Test submitting a journal entry with synchronous analysis."""
     test_entry_id = ObjectId("67f6d1236aaf92738f8f8855")
     mock_entries.insert_one.return_value.inserted_id = test_entry_id
-    mock_requests.return_value.status_code = 200
-    mock_requests.return_value.json.return_value = {
+    mock_ml_api.post.return_value.status_code = 200
+    mock_ml_api.post.return_value.json.return_value = {
         "status": "updated",
         "entry_id": str(test_entry_id),
     }
@@ -196,7 +323,77 @@ def test_submit_entry(
             "text": "Test entry",
         }
     )
-    mock_requests.assert_called_once()
+    mock_ml_api.post.assert_called_once_with(
+        "/analyze", {"entry_id": str(test_entry_id), "text": "Test entry"}
+    )
+
+
+@patch("app.ASYNC_ANALYSIS", False)
+@patch("app.ml_api")
+@patch("app.entries")
+@patch("app.current_user")
+@patch("app.users")
+def test_submit_entry_ml_client_unavailable(
+    mock_users, mock_current_user, mock_entries, mock_ml_api, client
+):  # pylint: disable=redefined-outer-name
+    """Test a submission fails fast while ml-client's circuit breakers are open."""
+    log_in(client, mock_users, mock_current_user)
+    mock_entries.insert_one.return_value.inserted_id = ObjectId()
+    mock_ml_api.post.side_effect = CircuitOpen("ml-client is unavailable")
+
+    response = client.post(
+        "/submit-entry", data={"date": "2023-01-01", "entry": "Test entry"}
+    )
+
+    assert response.status_code == 500
+    assert b"Error analyzing entry" in response.data
+
+
+@patch("app.analysis_jobs")
+@patch("app.entries")
+@patch("app.current_user")
+@patch("app.users")
+def test_submit_entry_async(
+    mock_users, mock_current_user, mock_entries, mock_jobs, client
+):  # pylint: disable=redefined-outer-name
+    """Test submitting a journal entry queues analysis and redirects immediately."""
+    test_entry_id = ObjectId("67f6d1236aaf92738f8f8855")
+    mock_entries.insert_one.return_value.inserted_id = test_entry_id
+
+    user = MockUser(id=ObjectId("67f5ea3b20185e29bd744a71"))
+    mock_users.find_one.return_value = {
+        "_id": user.id,
+        "username": "testuser",
+        "password": "hashed_password",
+    }
+    mock_current_user.is_authenticated = True
+    mock_current_user.id = user.get_id()
+    mock_current_user.get_id = user.get_id
+
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user.id)
+
+    with patch("app.ml_api") as mock_ml_api:
+        response = client.post(
+            "/submit-entry", data={"date": "2023-01-01", "entry": "Test entry"}
+        )
+
+    assert response.status_code == 302
+    assert response.location.endswith(f"/entry/{test_entry_id}")
+    mock_jobs.insert_one.assert_called_once()
+    job = mock_jobs.insert_one.call_args[0][0]
+    # the schema job_queue.new_job documents in machine-learning-client; keep
+    # in sync with test_claim_matches_jobs_written_by_the_web_app
+    assert job == {
+        "entry_id": str(test_entry_id),
+        "text": "Test entry",
+        "status": "queued",
+        "attempts": 0,
+        "available_at": job["created_at"],
+        "created_at": job["created_at"],
+    }
+    assert job["created_at"].tzinfo is not None
+    mock_ml_api.post.assert_not_called()
 
 
 @patch("app.entries")
@@ -269,3 +466,427 @@ def test_view_entry_not_found(
 
     assert response.status_code == 404
     assert b"Entry not found" in response.data
+
+
+@patch("app.entries")
+@patch("app.current_user")
+@patch("app.users")
+def test_view_entry_pending(
+    mock_users, mock_current_user, mock_entries, client
+):  # pylint: disable=redefined-outer-name
+    """Test an entry without sentiment yet renders the pending state."""
+    mock_entries.find_one.return_value = {
+        "_id": ObjectId("67f6d1236aaf92738f8f8855"),
+        "user_id": "12345",
+        "journal_date": "2023-01-01",
+        "text": "Test entry",
+    }
+
+    user = MockUser(id=ObjectId())
+    mock_users.find_one.return_value = {
+        "_id": user.id,
+        "username": "testuser",
+        "password": "hashed_password",
+    }
+    mock_current_user.is_authenticated = True
+    mock_current_user.id = user.get_id()
+    mock_current_user.get_id = user.get_id
+
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user.id)
+
+    response = client.get("/entry/67f6d1236aaf92738f8f8855")
+
+    assert response.status_code == 200
+    assert b"Analyzing your entry" in response.data
+    assert b"/entry/67f6d1236aaf92738f8f8855/events" in response.data
+
+
+@patch("app.entries")
+@patch("app.current_user")
+@patch("app.users")
+def test_view_entry_shows_heads(
+    mock_users, mock_current_user, mock_entries, client
+):  # pylint: disable=redefined-outer-name
+    """Test the top label of every extra analysis head is shown."""
+    log_in(client, mock_users, mock_current_user)
+    mock_entries.find_one.return_value = {
+        "_id": ObjectId("67f6d1236aaf92738f8f8855"),
+        "journal_date": "2023-01-01",
+        "text": "Test entry",
+        "sentiment": {"composite_score": 4.2},
+        "heads": {
+            "emotion": {"joy": 0.72, "anger": 0.08, "sadness": 0.2},
+            "intensity": {"intensity": 0.634},
+        },
+    }
+
+    response = client.get("/entry/67f6d1236aaf92738f8f8855")
+
+    assert response.status_code == 200
+    html = " ".join(response.data.decode().split())
+    assert "<strong>Emotion:</strong> joy (72%)" in html
+    assert "<strong>Intensity:</strong> 0.63" in html
+
+
+@patch("app.entries")
+@patch("app.current_user")
+@patch("app.users")
+def test_view_entry_picks_the_quote_in_the_browser(
+    mock_users, mock_current_user, mock_entries, client
+):  # pylint: disable=redefined-outer-name
+    """Test an analyzed page is the same on every render; its script picks the quote."""
+    log_in(client, mock_users, mock_current_user)
+    entry = {
+        "_id": ObjectId(),
+        "journal_date": "2023-01-01",
+        "text": "Test entry",
+        "sentiment": {"composite_score": 1.2},
+    }
+    mock_entries.find_one.return_value = entry
+
+    pages = set()
+    for _ in range(10):
+        page_cache.clear()
+        pages.add(client.get(f"/entry/{entry['_id']}").get_data(as_text=True))
+
+    assert len(pages) == 1
+    html = " ".join(pages.pop().split())
+    assert 'id="quote"> "You are not alone. Keep pushing!" </div>' in html
+    assert 'const choices = ["You are not alone. Keep pushing!",' in html
+
+
+@patch("app.entries")
+@patch("app.render_template")
+@patch("app.current_user")
+@patch("app.users")
+def test_view_entry_cached_and_revalidated(
+    mock_users, mock_current_user, mock_render_template, mock_entries, client
+):  # pylint: disable=redefined-outer-name
+    """Test entry pages are rendered once and answered with 304 while current."""
+    log_in(client, mock_users, mock_current_user)
+    mock_render_template.return_value = "<p>entry</p>"
+    entry = {
+        "_id": ObjectId.from_datetime(datetime(2025, 4, 1)),
+        "text": "Test entry",
+        "sentiment": {"composite_score": 4.0},
+        "sentiment_updated_at": datetime(2025, 4, 2, 12, 0, 0),
+    }
+    mock_entries.find_one.return_value = entry
+    url = f"/entry/{entry['_id']}"
+
+    first = client.get(url)
+    second = client.get(url)
+    assert first.status_code == second.status_code == 200
+    assert second.data == b"<p>entry</p>"
+    assert mock_render_template.call_count == 1
+    assert first.headers["Last-Modified"] == "Wed, 02 Apr 2025 12:00:00 GMT"
+    assert "private" in first.headers["Cache-Control"]
+
+    not_modified = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == first.headers["ETag"]
+    # the 304 only needed the validator fields, not the full entry
+    assert mock_entries.find_one.call_args[0][1] == ENTRY_VERSION_FIELDS
+
+    # a new sentiment from ml-client changes the ETag and renders the page again
+    entry["sentiment_updated_at"] = datetime(2025, 4, 3, 12, 0, 0)
+    updated = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert updated.status_code == 200
+    assert updated.headers["ETag"] != first.headers["ETag"]
+    assert mock_render_template.call_count == 2
+
+
+@patch("app.render_template")
+@patch("app.entries")
+@patch("app.current_user")
+def test_home_not_modified(
+    mock_current_user, mock_entries, mock_render_template, client
+):  # pylint: disable=redefined-outer-name
+    """Test the listing is answered with 304 until an entry changes."""
+    mock_current_user.is_authenticated = True
+    mock_current_user.id = "test_user_id"
+    mock_render_template.return_value = "<p>entries</p>"
+    fake_entries = [{"_id": ObjectId(), "text": "Test entry"}]
+    mock_entries.find.return_value.sort.return_value.limit.return_value = fake_entries
+
+    first = client.get("/")
+    not_modified = client.get("/", headers={"If-None-Match": first.headers["ETag"]})
+    assert not_modified.status_code == 304
+    assert mock_render_template.call_count == 1
+
+    fake_entries[0]["sentiment"] = {"composite_score": 3.0}
+    changed = client.get("/", headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    assert mock_render_template.call_count == 2
+
+
+@patch("app.entries")
+@patch("app.current_user")
+@patch("app.users")
+def test_export_streams_csv(
+    mock_users, mock_current_user, mock_entries, client
+):  # pylint: disable=redefined-outer-name
+    """Test the export streams the user's entries in a journal_date range."""
+    user = log_in(client, mock_users, mock_current_user)
+    cursor = mock_entries.find.return_value.sort.return_value.batch_size.return_value
+    cursor.__iter__.return_value = iter(
+        [{"_id": ObjectId(), "journal_date": "2025-04-01", "text": "Entry"}]
+    )
+
+    response = client.get("/export?format=csv&from=2025-04-01&to=2025-04-30")
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.content_type.startswith("text/csv")
+    assert response.data.decode().splitlines()[1].endswith(",2025-04-01,Entry,,,,")
+    assert mock_entries.find.call_args[0][0] == {
+        "user_id": user.get_id(),
+        "journal_date": {"$gte": "2025-04-01", "$lte": "2025-04-30"},
+    }
+    cursor.close.assert_called_once()
+
+
+@patch("app.entries")
+@patch("app.current_user")
+@patch("app.users")
+def test_export_rejects_bad_dates(
+    mock_users, mock_current_user, mock_entries, client
+):  # pylint: disable=redefined-outer-name
+    """Test an invalid date range is rejected before querying."""
+    log_in(client, mock_users, mock_current_user)
+
+    response = client.get("/export?from=April")
+
+    assert response.status_code == 400
+    mock_entries.find.assert_not_called()
+
+
+@patch("app.ml_api")
+@patch("app.entries")
+@patch("app.current_user")
+@patch("app.users")
+def test_similar_entries(
+    mock_users, mock_current_user, mock_entries, mock_ml_api, client
+):  # pylint: disable=redefined-outer-name
+    """Test similar entries are listed in ml-client's order with their previews."""
+    user = log_in(client, mock_users, mock_current_user)
+    entry_id, best, second = ObjectId(), ObjectId(), ObjectId()
+    mock_ml_api.post.return_value.status_code = 200
+    mock_ml_api.post.return_value.json.return_value = {
+        "similar": [
+            {"entry_id": str(best), "score": 0.92},
+            {"entry_id": str(second), "score": 0.81},
+        ]
+    }
+    mock_entries.find.return_value = [
+        {"_id": second, "journal_date": "2025-04-02", "text": "Rainy walk"},
+        {"_id": best, "journal_date": "2025-04-01", "text": "x" * 300},
+    ]
+
+    response = client.get(f"/entry/{entry_id}/similar")
+
+    assert response.status_code == 200
+    similar = response.get_json()["similar"]
+    assert [match["entry_id"] for match in similar] == [str(best), str(second)]
+    assert similar[0]["url"] == f"/entry/{best}"
+    assert similar[0]["preview"] == "x" * 100
+    assert mock_ml_api.post.call_args[0] == (
+        "/similar",
+        {"entry_id": str(entry_id), "user_id": user.get_id(), "k": 5},
+    )
+    assert mock_entries.find.call_args[0][0]["user_id"] == user.get_id()
+
+
+@patch("app.ml_api")
+@patch("app.current_user")
+@patch("app.users")
+def test_similar_entries_pending_or_unavailable(
+    mock_users, mock_current_user, mock_ml_api, client
+):  # pylint: disable=redefined-outer-name
+    """Test an unanalyzed entry has no similar entries yet and errors are reported."""
+    log_in(client, mock_users, mock_current_user)
+    mock_ml_api.post.return_value.status_code = 404
+
+    response = client.get(f"/entry/{ObjectId()}/similar")
+
+    assert response.get_json() == {"similar": [], "pending": True}
+    mock_ml_api.post.side_effect = CircuitOpen("ml-client is unavailable")
+    assert client.get(f"/entry/{ObjectId()}/similar").status_code == 503
+
+
+@patch("app.LIVE_HEARTBEAT_SECONDS", 0.01)
+@patch("app.LIVE_MAX_SECONDS", 0.05)
+@patch("app.live_feed")
+@patch("app.entries")
+@patch("app.current_user")
+@patch("app.users")
+def test_entry_events_stream_analysis(
+    mock_users, mock_current_user, mock_entries, mock_live_feed, client
+):  # pylint: disable=redefined-outer-name
+    """Test the events stream sends stored and live analysis, then closes."""
+    user = log_in(client, mock_users, mock_current_user)
+    entry_id = ObjectId()
+    mock_live_feed.available = True
+    subscription = mock_live_feed.subscribe.return_value
+    events = [{"sentiment": {"composite_score": 4}}]
+    subscription.get.side_effect = lambda timeout: events.pop() if events else None
+    mock_entries.find_one.return_value = {"_id": entry_id, "analysis_status": "queued"}
+
+    response = client.get(f"/entry/{entry_id}/events")
+    body = response.get_data(as_text=True)
+
+    assert response.mimetype == "text/event-stream"
+    assert body.startswith("retry: ")
+    assert 'data: {"analysis_status": "queued"}' in body
+    assert 'data: {"sentiment": {"composite_score": 4}}' in body
+    assert ": keep-alive" in body
+    mock_live_feed.subscribe.assert_called_once_with(str(entry_id))
+    assert mock_entries.find_one.call_args[0][0]["user_id"] == user.get_id()
+    subscription.close.assert_called()
+
+
+@patch("app.live_feed")
+@patch("app.entries")
+@patch("app.current_user")
+@patch("app.users")
+def test_entry_events_not_found_or_unavailable(
+    mock_users, mock_current_user, mock_entries, mock_live_feed, client
+):  # pylint: disable=redefined-outer-name
+    """Test another user's entry isn't streamed and a missing feed is reported."""
+    log_in(client, mock_users, mock_current_user)
+    mock_live_feed.available = None
+    mock_entries.find_one.return_value = None
+
+    assert client.get(f"/entry/{ObjectId()}/events").status_code == 404
+    mock_live_feed.subscribe.return_value.close.assert_called_once()
+
+    mock_live_feed.available = False
+    assert client.get(f"/entry/{ObjectId()}/events").status_code == 503
+
+
+def log_in(
+    client, mock_users, mock_current_user
+):  # pylint: disable=redefined-outer-name
+    """Log a mock user into the test client's session and return it."""
+    user = MockUser(id=ObjectId())
+    mock_users.find_one.return_value = {
+        "_id": user.id,
+        "username": "testuser",
+        "password": "hashed_password",
+    }
+    mock_current_user.is_authenticated = True
+    mock_current_user.id = user.get_id()
+    mock_current_user.get_id = user.get_id
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user.id)
+    return user
+
+
+@patch("app.render_template")
+@patch("app.current_user")
+@patch("app.users")
+def test_session_user_is_cached(
+    mock_users, mock_current_user, mock_render_template, client
+):  # pylint: disable=redefined-outer-name
+    """Test the session user is loaded from MongoDB once and invalidated on logout."""
+    mock_render_template.return_value = ""
+    user = log_in(client, mock_users, mock_current_user)
+    mock_current_user.get_id = lambda: str(user.id)
+
+    client.get("/add-entry")
+    client.get("/add-entry")
+    assert mock_users.find_one.call_count == 1
+    assert user_cache.get(str(user.id))["username"] == "testuser"
+
+    response = client.get("/logout")
+    assert response.status_code == 302
+    assert user_cache.get(str(user.id)) is None
+
+
+@patch("app.mood_rollups")
+@patch("app.current_user")
+@patch("app.users")
+def test_trends_api(
+    mock_users, mock_current_user, mock_mood_rollups, client
+):  # pylint: disable=redefined-outer-name
+    """Test the trends API turns rollups into averages and distributions."""
+    user = log_in(client, mock_users, mock_current_user)
+    mock_mood_rollups.find.return_value.sort.return_value.limit.return_value = [
+        {
+            "key": "2025-W15",
+            "count": 4,
+            "score_sum": 14.0,
+            "labels": {"negative": 1, "positive": 3},
+        },
+        {"key": "2025-W14", "count": 2, "score_sum": 4.0, "labels": {"neutral": 2}},
+    ]
+
+    response = client.get("/api/trends?period=week&limit=2")
+
+    assert response.status_code == 200
+    assert mock_mood_rollups.find.call_args[0][0] == {
+        "user_id": user.id,
+        "period": "week",
+    }
+    data = response.get_json()
+    assert data["period"] == "week"
+    assert [point["key"] for point in data["trends"]] == ["2025-W14", "2025-W15"]
+    assert data["trends"][1]["average_score"] == 3.5
+    assert data["trends"][1]["distribution"] == {
+        "negative": 0.25,
+        "neutral": 0.0,
+        "positive": 0.75,
+    }
+
+
+@patch("app.current_user")
+@patch("app.users")
+def test_trends_api_rejects_unknown_period(
+    mock_users, mock_current_user, client
+):  # pylint: disable=redefined-outer-name
+    """Test the trends API rejects periods without rollups."""
+    log_in(client, mock_users, mock_current_user)
+
+    response = client.get("/api/trends?period=year")
+
+    assert response.status_code == 400
+
+
+@patch("app.mood_rollups")
+@patch("app.current_user")
+@patch("app.users")
+def test_trends_page(
+    mock_users, mock_current_user, mock_mood_rollups, client
+):  # pylint: disable=redefined-outer-name
+    """Test the trends page renders each rollup."""
+    log_in(client, mock_users, mock_current_user)
+    mock_mood_rollups.find.return_value.sort.return_value.limit.return_value = [
+        {"key": "2025-04", "count": 1, "score_sum": 4.2, "labels": {"positive": 1}}
+    ]
+
+    response = client.get("/trends?period=month")
+
+    assert response.status_code == 200
+    assert b"2025-04" in response.data
+    assert b"4.2" in response.data
+
+
+def test_stats_reports_pool_metrics(client):  # pylint: disable=redefined-outer-name
+    """Test the stats route reports the MongoDB connection pool metrics."""
+    response = client.get("/stats")
+
+    assert response.status_code == 200
+    assert "mongo_pool_checked_out" in response.get_json()
+
+
+def test_metrics_prometheus_format(client):  # pylint: disable=redefined-outer-name
+    """Test /metrics reports request timings as Prometheus text."""
+    client.get("/login-signup")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert "# TYPE ml_client_request_seconds histogram" in body
+    assert 'http_request_seconds_count{endpoint="login_signup"}' in body
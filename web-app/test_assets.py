@@ -0,0 +1,83 @@
+"""Unit tests for the static asset build and the /assets/ route."""
+
+import gzip
+import os
+import shutil
+
+import brotli
+import pytest
+from flask import Flask, render_template_string
+from PIL import Image
+
+import assets
+from build_assets import build_assets
+
+FONT = os.path.join(os.path.dirname(__file__), "static", "SeptemberMornings.ttf")
+
+
+# pylint: disable=redefined-outer-name
+@pytest.fixture
+def built(tmp_path):
+    """Build a small static directory and return (app, manifest, dist dir)."""
+    static = tmp_path / "static"
+    static.mkdir()
+    Image.new("RGB", (8, 8), "green").save(static / "bg.jpg")
+    (static / "icon.svg").write_text("<svg>" + "<g/>" * 200 + "</svg>")
+    shutil.copy(FONT, static / "font.ttf")
+    dist = tmp_path / "dist"
+    manifest = build_assets(str(static), str(dist))
+    app = Flask(__name__, static_folder=str(static))
+    assets.init_app(app, str(dist))
+    return app, manifest, dist
+
+
+def test_build_fingerprints_and_converts(built):
+    """Images get WebP and AVIF versions and fonts a WOFF2 version."""
+    _, manifest, dist = built
+    assert set(manifest["bg.jpg"]) == {"jpg", "webp", "avif"}
+    assert set(manifest["font.ttf"]) == {"ttf", "woff2"}
+    assert manifest["bg.jpg"]["jpg"].startswith("bg.")
+    assert manifest["bg.jpg"]["jpg"] != "bg.jpg"
+    assert (dist / (manifest["icon.svg"]["svg"] + ".br")).exists()
+    assert not (dist / (manifest["bg.jpg"]["jpg"] + ".gz")).exists()
+
+
+def test_build_rejects_output_containing_sources(tmp_path):
+    """The build never deletes its own sources."""
+    with pytest.raises(ValueError):
+        build_assets(str(tmp_path / "static"), str(tmp_path))
+
+
+def test_template_helpers(built):
+    """asset_url and image_set link the fingerprinted files."""
+    app, manifest, _ = built
+    with app.test_request_context("/"):
+        assert render_template_string("{{ asset_url('bg.jpg', 'webp') }}") == (
+            "/assets/" + manifest["bg.jpg"]["webp"]
+        )
+        image_set = render_template_string("{{ image_set('bg.jpg') }}")
+        assert image_set.startswith('image-set(url("/assets/bg.')
+        assert 'type("image/avif")' in image_set
+        assert render_template_string("{{ asset_url('missing.png') }}") == (
+            "/static/missing.png"
+        )
+
+
+def test_assets_are_immutable_and_precompressed(built):
+    """Built files are cached forever and sent precompressed when accepted."""
+    app, manifest, _ = built
+    url = "/assets/" + manifest["icon.svg"]["svg"]
+    with app.test_client() as client:
+        plain = client.get(url)
+        compressed = client.get(url, headers={"Accept-Encoding": "gzip, br"})
+        gzipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+        missing = client.get("/assets/icon.svg")
+    assert "immutable" in plain.headers["Cache-Control"]
+    assert "max-age=31536000" in plain.headers["Cache-Control"]
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.headers["Content-Encoding"] == "br"
+    assert compressed.headers["Content-Type"].startswith("image/svg+xml")
+    assert brotli.decompress(compressed.data) == plain.data
+    assert gzip.decompress(gzipped.data) == plain.data
+    assert "Accept-Encoding" in plain.headers["Vary"]
+    assert missing.status_code == 404
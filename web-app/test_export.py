@@ -0,0 +1,52 @@
+"""Unit tests for the streaming export encoders."""
+
+import csv
+import io
+import json
+
+from bson.objectid import ObjectId
+
+from export import EXPORT_FIELDS, csv_chunks, ndjson_chunks
+
+ENTRIES = [
+    {
+        "_id": ObjectId(),
+        "journal_date": f"2025-04-0{day}",
+        "text": f'Entry, "{day}"\nsecond line',
+        "sentiment": {
+            "negative": 0.1,
+            "neutral": 0.2,
+            "positive": 0.7,
+            "composite_score": 4.2,
+        },
+    }
+    for day in range(1, 6)
+] + [{"_id": ObjectId(), "journal_date": "2025-04-06", "text": "Pending"}]
+
+
+def test_ndjson_chunks():
+    """Every entry is one JSON line and chunks hold at most chunk_rows lines."""
+    chunks = list(ndjson_chunks(iter(ENTRIES), chunk_rows=4))
+    assert [chunk.count("\n") for chunk in chunks] == [4, 2]
+    rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert rows[0]["entry_id"] == str(ENTRIES[0]["_id"])
+    assert rows[0]["composite_score"] == 4.2
+    assert rows[-1]["composite_score"] is None
+
+
+def test_csv_chunks_round_trip():
+    """CSV output has a header and quotes texts with commas and newlines."""
+    chunks = list(csv_chunks(iter(ENTRIES), chunk_rows=2))
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert tuple(rows[0]) == EXPORT_FIELDS
+    assert rows[0]["text"] == ENTRIES[0]["text"]
+    assert rows[-1]["positive"] == ""
+
+
+def test_chunks_consume_the_cursor_lazily():
+    """Entries are read only as chunks are requested."""
+    source = iter(ENTRIES)
+    chunks = ndjson_chunks(source, chunk_rows=2)
+    next(chunks)
+    assert len(list(source)) == 4
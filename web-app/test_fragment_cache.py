@@ -0,0 +1,49 @@
+"""Unit tests for the rendered-page cache."""
+
+from flask import Flask
+
+from fragment_cache import FragmentCache, template_fingerprint
+
+app = Flask(__name__)
+
+
+def test_etag_depends_on_version_and_data():
+    """ETags change with the template version and with the page data."""
+    cache = FragmentCache("v1")
+    assert cache.etag("entry", 1) == FragmentCache("v1").etag("entry", 1)
+    assert cache.etag("entry", 1) != cache.etag("entry", 2)
+    assert cache.etag("entry", 1) != FragmentCache("v2").etag("entry", 1)
+
+
+def test_template_fingerprint_changes_with_templates(tmp_path):
+    """Editing a template changes the fingerprint."""
+    template = tmp_path / "page.html"
+    template.write_text("<p>one</p>")
+    before = template_fingerprint(tmp_path)
+    template.write_text("<p>two</p>")
+    assert template_fingerprint(tmp_path) != before
+
+
+def test_respond_renders_once_per_etag():
+    """Pages are stored under their key and ETag."""
+    cache = FragmentCache("v1")
+    renders = []
+
+    def render():
+        renders.append(1)
+        return "<p>page</p>"
+
+    with app.test_request_context("/"):
+        cache.respond(("user", "home"), "a", None, render)
+        response = cache.respond(("user", "home"), "a", None, render)
+        cache.respond(("user", "home"), "b", None, render)
+    assert response.get_data() == b"<p>page</p>"
+    assert len(renders) == 2
+
+
+def test_respond_not_modified():
+    """A matching If-None-Match is answered with 304 without rendering."""
+    cache = FragmentCache("v1", max_size=0)
+    with app.test_request_context("/", headers={"If-None-Match": '"a"'}):
+        response = cache.respond(("user", "home"), "a", None, lambda: 1 / 0)
+    assert response.status_code == 304
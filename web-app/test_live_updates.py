@@ -0,0 +1,235 @@
+"""Unit tests for the live analysis change feed."""
+
+import json
+import os
+import time
+
+import pytest
+from bson.objectid import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+from live_updates import ChangeFeed, analysis_event, change_pipeline, format_event
+
+
+class FakeStream:
+    """Change stream returning queued changes, then failing or idling."""
+
+    def __init__(self, changes=(), error=None, open_error=None):
+        self.changes = list(changes)
+        self.error = error
+        self.open_error = open_error
+        self.resume_token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def try_next(self):
+        """Return the next change, or None after a short wait."""
+        if not self.changes:
+            if self.error:
+                raise self.error
+            time.sleep(0.01)
+            return None
+        change = self.changes.pop(0)
+        self.resume_token = {"_data": str(change["documentKey"]["_id"])}
+        return change
+
+
+class FakeCollection:  # pylint: disable=too-few-public-methods
+    """Collection whose watch() returns the given streams or their open errors."""
+
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.watch_calls = []
+
+    def watch(self, pipeline, full_document=None, resume_after=None):
+        """Record the call and return or raise the next stream."""
+        assert full_document == "updateLookup"
+        self.watch_calls.append((pipeline, resume_after))
+        stream = self.streams.pop(0) if self.streams else FakeStream()
+        if stream.open_error:
+            raise stream.open_error
+        return stream
+
+
+def update(entry_id, **fields):
+    """Return a change as delivered for the feed's pipeline."""
+    return {"documentKey": {"_id": entry_id}, "fullDocument": fields}
+
+
+def test_publish_reaches_only_the_entrys_subscribers():
+    """Test events fan out to every subscriber of an entry and no one else."""
+    feed = ChangeFeed(FakeCollection(), retry_seconds=0)
+    first, second = feed.subscribe("a"), feed.subscribe("a")
+    other = feed.subscribe("b")
+
+    feed.publish("a", {"analysis_status": "queued"})
+
+    assert first.get(1) == {"analysis_status": "queued"}
+    assert second.get(1) == {"analysis_status": "queued"}
+    assert other.get(0.01) is None
+    feed.stop()
+
+
+def test_close_unsubscribes_once():
+    """Test a closed subscription gets no events and closing twice is harmless."""
+    feed = ChangeFeed(FakeCollection(), retry_seconds=0)
+    subscription = feed.subscribe("a")
+    subscribers = feed.subscribers_gauge.value
+
+    subscription.close()
+    subscription.close()
+    feed.publish("a", {"analysis_status": "failed"})
+
+    assert feed.subscribers_gauge.value == subscribers - 1
+    assert subscription.get(0.01) is None
+    feed.stop()
+
+
+def test_slow_subscriber_drops_oldest_events():
+    """Test a full queue keeps the newest events."""
+    feed = ChangeFeed(FakeCollection(), max_events=2, retry_seconds=0)
+    subscription = feed.subscribe("a")
+
+    for status in ("queued", "running", "failed"):
+        feed.publish("a", {"analysis_status": status})
+
+    assert subscription.get(1) == {"analysis_status": "running"}
+    assert subscription.get(1) == {"analysis_status": "failed"}
+    subscription.close()
+    feed.stop()
+
+
+def test_changes_are_delivered_and_resumed_after_errors():
+    """Test a failed stream is reopened from the last delivered change."""
+    entry_id = ObjectId()
+    sentiment = {"composite_score": 4.2}
+    collection = FakeCollection(
+        FakeStream(
+            [update(entry_id, analysis_status="running")],
+            error=PyMongoError("connection reset"),
+        ),
+        FakeStream(open_error=OperationFailure("interrupted", code=11601)),
+        FakeStream([update(entry_id, sentiment=sentiment)]),
+    )
+    feed = ChangeFeed(collection, retry_seconds=0)
+    errors = feed.errors_counter.value
+    subscription = feed.subscribe(str(entry_id))
+
+    assert subscription.get(2) == {"analysis_status": "running"}
+    assert subscription.get(2) == {"sentiment": sentiment}
+    feed.stop()
+    assert feed.available is True
+    assert feed.errors_counter.value == errors + 2
+    token = {"_data": str(entry_id)}
+    assert [resume_after for _, resume_after in collection.watch_calls[:3]] == [
+        None,
+        token,
+        token,
+    ]
+
+
+def test_standalone_server_marks_feed_unavailable():
+    """Test a deployment without change streams disables the feed."""
+    collection = FakeCollection(
+        FakeStream(
+            open_error=OperationFailure(
+                "The $changeStream stage is only supported on replica sets",
+                code=40573,
+            )
+        )
+    )
+    feed = ChangeFeed(collection, retry_seconds=0)
+    feed.subscribe("a")
+
+    deadline = time.monotonic() + 2
+    while feed.available is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert feed.available is False
+    assert len(collection.watch_calls) == 1
+
+
+def test_analysis_event_and_format():
+    """Test only analysis fields are sent, encoded as an SSE message."""
+    event = analysis_event({"sentiment": {"composite_score": 3}, "text": "private"})
+
+    assert event == {"sentiment": {"composite_score": 3}}
+    assert format_event(event) == f"event: analysis\ndata: {json.dumps(event)}\n\n"
+
+
+def test_pipeline_matches_rescores_reported_as_dotted_paths():
+    """Test changes are matched on the fields every analysis write sets."""
+    match, project = change_pipeline()
+    triggers = [next(iter(clause)) for clause in match["$match"]["$or"]]
+    # a re-score may report only sentiment.positive or heads.emotion.joy
+    assert "updateDescription.updatedFields.sentiment_updated_at" in triggers
+    assert "updateDescription.updatedFields.analysis_status" in triggers
+    assert project["$project"]["fullDocument.heads"] == 1
+
+
+def test_deleted_entries_are_skipped():
+    """Test a change whose entry is gone by the lookup publishes nothing."""
+    entry_id = ObjectId()
+    deleted = {"documentKey": {"_id": entry_id}, "fullDocument": None}
+    collection = FakeCollection(
+        FakeStream([deleted, update(entry_id, analysis_status="failed")])
+    )
+    feed = ChangeFeed(collection, retry_seconds=0)
+    subscription = feed.subscribe(str(entry_id))
+
+    assert subscription.get(2) == {"analysis_status": "failed"}
+    feed.stop()
+
+
+@pytest.fixture
+def replica_set():
+    """A collection on the local replica set in MONGO_TEST_URI, or skip."""
+    uri = os.getenv(
+        "MONGO_TEST_URI", "mongodb://localhost:27017/?directConnection=true"
+    )
+    client = MongoClient(uri, serverSelectionTimeoutMS=500)
+    try:
+        hello = client.admin.command("hello")
+    except PyMongoError:
+        pytest.skip("no MongoDB server at MONGO_TEST_URI")
+    if "setName" not in hello:
+        pytest.skip("MONGO_TEST_URI is not a replica set")
+    database = client[f"test_live_updates_{ObjectId()}"]
+    yield database["entries"]
+    client.drop_database(database)
+    client.close()
+
+
+def test_change_stream_on_replica_set(
+    replica_set,
+):  # pylint: disable=redefined-outer-name
+    """Test a stored analysis reaches a subscriber through a real change stream."""
+    entry_id = replica_set.insert_one({"text": "A sunny day"}).inserted_id
+    feed = ChangeFeed(replica_set, retry_seconds=0.1)
+    subscription = feed.subscribe(str(entry_id))
+    deadline = time.monotonic() + 10
+    while feed.available is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    replica_set.update_one({"_id": entry_id}, {"$set": {"text": "edited"}})
+    # as ml-client stores a first analysis and then a re-score
+    for score in (4.5, 2.0):
+        replica_set.update_one(
+            {"_id": entry_id},
+            {
+                "$set": {"sentiment": {"composite_score": score, "positive": 0.5}},
+                "$currentDate": {"sentiment_updated_at": True},
+            },
+        )
+
+    for score in (4.5, 2.0):
+        assert subscription.get(10) == {
+            "sentiment": {"composite_score": score, "positive": 0.5}
+        }
+    subscription.close()
+    feed.stop()
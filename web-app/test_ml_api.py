@@ -0,0 +1,122 @@
+"""Unit tests for the ml-client HTTP client."""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from ml_api import HEDGE_MAX_WORKERS, CircuitBreaker, CircuitOpen, MLClient
+
+
+def response(status_code):
+    """Return a fake response with a status code."""
+    fake = MagicMock()
+    fake.status_code = status_code
+    return fake
+
+
+def make_client(post, **options):
+    """Return an MLClient for two replicas whose session.post is post."""
+    session = MagicMock()
+    session.post.side_effect = post
+    return MLClient(["http://a", "http://b/"], session=session, **options), session
+
+
+def test_round_robin_over_replicas():
+    """Consecutive calls go to the replicas in turn."""
+    client, session = make_client(lambda url, **_: response(200))
+    for _ in range(4):
+        client.post("/analyze", {"text": "hi"})
+    urls = [call.args[0] for call in session.post.call_args_list]
+    assert urls == ["http://a/analyze", "http://b/analyze"] * 2
+
+
+def test_breaker_opens_and_fails_fast():
+    """After the failure threshold the replica is skipped until reset."""
+    client, session = make_client(
+        MagicMock(side_effect=requests.exceptions.ConnectTimeout("slow")),
+        failure_threshold=2,
+        reset_seconds=60,
+    )
+    for _ in range(4):
+        with pytest.raises(requests.exceptions.ConnectTimeout):
+            client.post("/analyze", {})
+    with pytest.raises(CircuitOpen):
+        client.post("/analyze", {})
+    assert session.post.call_count == 4
+
+
+def test_breaker_half_open_trial():
+    """After the reset time one trial request is allowed and closes it on success."""
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=10)
+    with patch("ml_api.time.monotonic", return_value=100.0):
+        breaker.record_failure()
+        assert not breaker.allow()
+    with patch("ml_api.time.monotonic", return_value=111.0):
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.allow()
+
+
+def test_unexpected_error_ends_the_half_open_trial():
+    """A trial call failing with a non-request error doesn't block later trials."""
+    client, _ = make_client(
+        MagicMock(side_effect=[requests.exceptions.ConnectionError("down"), KeyError]),
+        failure_threshold=1,
+        reset_seconds=10,
+    )
+    client.urls = ["http://a"]
+    breaker = client.breakers["http://a"]
+    with patch("ml_api.time.monotonic", return_value=100.0):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.post("/analyze", {})
+    with patch("ml_api.time.monotonic", return_value=111.0):
+        with pytest.raises(KeyError):
+            client.post("/analyze", {})
+        assert breaker.allow()
+
+
+def test_server_errors_count_as_failures():
+    """5xx responses trip the breaker; 4xx responses don't."""
+    breaker_client, _ = make_client(lambda url, **_: response(503), failure_threshold=1)
+    breaker_client.post("/analyze", {})
+    assert breaker_client.breakers["http://a"].opened_at is not None
+    ok_client, _ = make_client(lambda url, **_: response(404), failure_threshold=1)
+    ok_client.post("/analyze", {})
+    assert ok_client.breakers["http://a"].opened_at is None
+
+
+def test_hedged_request_uses_the_faster_replica():
+    """A slow request is also sent to the next replica and the first answer wins."""
+    release = threading.Event()
+
+    def post(url, **_):
+        if url.startswith("http://a"):
+            release.wait(5)
+            return response(500)
+        return response(200)
+
+    client, session = make_client(post, hedge_after=0.01, pool_size=2000)
+    try:
+        assert client.post("/analyze", {}).status_code == 200
+        assert session.post.call_count == 2
+        assert client.hedged.value >= 1
+        # pylint: disable-next=protected-access
+        assert client._hedge_pool._max_workers == HEDGE_MAX_WORKERS
+    finally:
+        release.set()
+
+
+def test_hedging_is_skipped_while_every_hedge_thread_is_busy():
+    """Calls beyond the hedge pool's capacity are sent directly, without queueing."""
+    client, session = make_client(lambda url, **_: response(200), hedge_after=0.01)
+    # pylint: disable=protected-access,consider-using-with
+    for _ in range(HEDGE_MAX_WORKERS // 2):
+        client._hedge_slots.acquire()
+    hedged = client.hedged.value
+
+    assert client.post("/analyze", {}).status_code == 200
+    assert session.post.call_count == 1
+    assert client.hedged.value == hedged
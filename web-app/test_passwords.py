@@ -0,0 +1,48 @@
+"""Unit tests for offloaded password hashing."""
+
+import pytest
+
+from passwords import HasherBusy, PasswordHasher, check_password, hash_rounds
+
+
+def test_hash_and_check_inline():
+    """Hashes use the configured work factor and verify the password."""
+    hasher = PasswordHasher(rounds=4, workers=0)
+    hashed = hasher.hash("secret")
+    assert hash_rounds(hashed) == 4
+    assert hasher.check(hashed, "secret")
+    assert not hasher.check(hashed, "wrong")
+
+
+def test_needs_rehash_when_work_factor_changes():
+    """Hashes made with another work factor are flagged for rehashing."""
+    hashed = PasswordHasher(rounds=4, workers=0).hash("secret")
+    assert not PasswordHasher(rounds=4, workers=0).needs_rehash(hashed)
+    assert PasswordHasher(rounds=5, workers=0).needs_rehash(hashed)
+
+
+def test_long_passwords_use_first_72_bytes():
+    """Passwords are truncated the way bcrypt always did, so old hashes still match."""
+    hasher = PasswordHasher(rounds=4, workers=0)
+    hashed = hasher.hash("x" * 100)
+    assert check_password(hashed, "x" * 72)
+
+
+def test_full_pool_raises_busy():
+    """Requests beyond max_pending are turned away after the wait."""
+    hasher = PasswordHasher(rounds=4, workers=0, max_pending=1, acquire_timeout=0.01)
+    rejected = hasher.rejected.value
+    # pylint: disable-next=protected-access,consider-using-with
+    hasher._slots.acquire()
+    with pytest.raises(HasherBusy):
+        hasher.hash("secret")
+    assert hasher.rejected.value == rejected + 1
+
+
+def test_hash_in_process_pool():
+    """Hashing in a worker process gives a hash the caller can verify."""
+    hasher = PasswordHasher(rounds=4, workers=1)
+    try:
+        assert check_password(hasher.hash("secret"), "secret")
+    finally:
+        hasher.shutdown()
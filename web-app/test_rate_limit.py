@@ -0,0 +1,42 @@
+"""Unit tests for the failed-login limiter."""
+
+from unittest.mock import patch
+
+from rate_limit import RateLimiter
+
+
+def test_limits_after_max_failures():
+    """A key is limited once it reaches the failure limit."""
+    limiter = RateLimiter(max_failures=2, window_seconds=60)
+    with patch("rate_limit.time.monotonic", return_value=100.0):
+        limiter.record_failure("alice")
+        assert limiter.retry_after("alice") == 0
+        limiter.record_failure("alice")
+        assert limiter.retry_after("alice") == 61
+        assert limiter.retry_after("bob") == 0
+
+
+def test_failures_expire_after_window():
+    """Failures older than the window no longer count."""
+    limiter = RateLimiter(max_failures=1, window_seconds=60)
+    with patch("rate_limit.time.monotonic", return_value=100.0):
+        limiter.record_failure("alice")
+    with patch("rate_limit.time.monotonic", return_value=160.0):
+        assert limiter.retry_after("alice") == 0
+
+
+def test_reset_forgets_failures():
+    """A successful login clears the key's failures."""
+    limiter = RateLimiter(max_failures=1, window_seconds=60)
+    limiter.record_failure("alice")
+    limiter.reset("alice")
+    assert limiter.retry_after("alice") == 0
+
+
+def test_key_limit_drops_oldest_keys():
+    """The number of tracked keys stays bounded."""
+    limiter = RateLimiter(max_failures=1, window_seconds=60, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.record_failure(key)
+    assert limiter.retry_after("a") == 0
+    assert limiter.retry_after("c") > 0
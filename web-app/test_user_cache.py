@@ -0,0 +1,70 @@
+"""Unit tests for the session user cache."""
+
+from unittest.mock import MagicMock, patch
+
+from user_cache import UserCache
+
+USER = {"_id": "u1", "username": "alice"}
+
+
+def test_miss_then_hit():
+    """A stored user is returned as a copy and counted as a hit."""
+    cache = UserCache()
+    hits = cache.hits.value
+    assert cache.get("u1") is None
+    cache.set("u1", USER)
+    cached = cache.get("u1")
+    assert cached == USER
+    cached["username"] = "changed"
+    assert cache.get("u1") == USER
+    assert cache.hits.value == hits + 2
+
+
+def test_expired_users_are_evicted():
+    """Users older than the TTL are not returned."""
+    cache = UserCache(ttl_seconds=60)
+    with patch("user_cache.time.monotonic", return_value=100.0):
+        cache.set("u1", USER)
+    with patch("user_cache.time.monotonic", return_value=161.0):
+        assert cache.get("u1") is None
+
+
+def test_size_limit_evicts_least_recently_used():
+    """The least recently used user is dropped when the cache is full."""
+    cache = UserCache(max_size=2)
+    cache.set("u1", USER)
+    cache.set("u2", USER)
+    cache.get("u1")
+    cache.set("u3", USER)
+    assert cache.get("u2") is None
+    assert cache.get("u1") == USER
+
+
+def test_invalidate_removes_from_both_tiers():
+    """Invalidation reaches the shared backend too."""
+    backend = MagicMock()
+    backend.get.return_value = None
+    cache = UserCache(backend=backend)
+    cache.set("u1", USER)
+    backend.set.assert_called_once_with("u1", USER, 60.0)
+    cache.invalidate("u1")
+    backend.delete.assert_called_once_with("u1")
+    assert cache.get("u1") is None
+
+
+def test_backend_hit_fills_local_tier():
+    """A user found in the backend is kept locally for later lookups."""
+    backend = MagicMock()
+    backend.get.return_value = USER
+    cache = UserCache(backend=backend)
+    assert cache.get("u1") == USER
+    assert cache.get("u1") == USER
+    backend.get.assert_called_once_with("u1")
+
+
+def test_backend_errors_are_misses():
+    """A failing backend doesn't break user loading."""
+    backend = MagicMock()
+    backend.get.side_effect = ConnectionError("down")
+    cache = UserCache(backend=backend)
+    assert cache.get("u1") is None
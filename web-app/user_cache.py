@@ -0,0 +1,174 @@
+"""
+TTL cache of logged-in users for flask-login's user_loader.
+Every request that touches current_user would otherwise load the user from
+MongoDB. Users are held in a bounded in-process LRU with a short TTL, and
+optionally in a shared backend (for example Redis) so that every web app
+process sees the same entries and invalidations.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RedisBackend:
+    """
+    Shared cache tier stored in Redis.
+
+    Any object with the same get, set and delete methods can be passed to
+    UserCache as its backend.
+
+    Args:
+        url (str): Redis URL, e.g. "redis://redis:6379/0".
+        prefix (str): Prefix of every key written by this backend.
+    """
+
+    def __init__(self, url, prefix="feelwrite:user:"):
+        # redis is only needed when a shared backend is configured, so it is
+        # installed separately rather than declared in the Pipfile
+        # pylint: disable=import-outside-toplevel,import-error
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        """Return the value stored for key, or None."""
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl_seconds):
+        """Store a JSON-serializable value for ttl_seconds."""
+        self.client.set(
+            self.prefix + key, json.dumps(value), ex=max(1, int(ttl_seconds))
+        )
+
+    def delete(self, key):
+        """Remove key."""
+        self.client.delete(self.prefix + key)
+
+
+class UserCache:  # pylint: disable=too-many-instance-attributes
+    """
+    Two-tier cache of user records keyed by user id.
+
+    Only the fields needed to build the session user are cached, never the
+    password hash.
+
+    Args:
+        max_size (int): Maximum number of users kept in process memory;
+            0 disables the in-process tier.
+        ttl_seconds (float): How long a cached user stays valid. This bounds
+            how long another process without a shared backend can keep
+            serving a user after it was invalidated here.
+        backend (object, optional): Shared tier with get(key),
+            set(key, value, ttl_seconds) and delete(key) methods. Backend
+            errors are logged and treated as misses.
+    """
+
+    def __init__(self, max_size=10000, ttl_seconds=60, backend=None):
+        self.max_size = max(0, int(max_size))
+        self.ttl = float(ttl_seconds)
+        self.backend = backend
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = metrics.counter(
+            "user_cache_hits_total", "Session users loaded from the user cache"
+        )
+        self.backend_hits = metrics.counter(
+            "user_cache_backend_hits_total",
+            "Session users loaded from the shared user cache backend",
+        )
+        self.misses = metrics.counter(
+            "user_cache_misses_total",
+            "Session users that had to be loaded from MongoDB",
+        )
+        self.evictions = metrics.counter(
+            "user_cache_evictions_total", "Cached users removed for size or age"
+        )
+        self.hit_ratio = metrics.gauge(
+            "user_cache_hit_ratio", "Share of user lookups served from the user cache"
+        )
+        self.size = metrics.gauge(
+            "user_cache_size", "Users held in the in-process user cache"
+        )
+
+    def get(self, user_id):
+        """
+        Look up a cached user.
+
+        Returns:
+            dict or None: A copy of the cached user fields, or None on a miss.
+        """
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is not None:
+                user_data, expires_at = item
+                if expires_at > now:
+                    self._items.move_to_end(user_id)
+                    self._count(self.hits)
+                    return dict(user_data)
+                del self._items[user_id]
+                self.evictions.inc()
+                self.size.set(len(self._items))
+
+        user_data = self._backend_call("get", user_id)
+        if user_data is not None:
+            self._count(self.hits)
+            self.backend_hits.inc()
+            self._set_local(user_id, user_data)
+            return dict(user_data)
+
+        self._count(self.misses)
+        return None
+
+    def set(self, user_id, user_data):
+        """Cache the fields of a user loaded from the database."""
+        self._set_local(user_id, user_data)
+        self._backend_call("set", user_id, dict(user_data), self.ttl)
+
+    def invalidate(self, user_id):
+        """Forget a user, e.g. on logout or when their password changes."""
+        with self._lock:
+            if self._items.pop(user_id, None) is not None:
+                self.size.set(len(self._items))
+        self._backend_call("delete", user_id)
+
+    def clear(self):
+        """Remove every user from the in-process tier."""
+        with self._lock:
+            self._items.clear()
+            self.size.set(0)
+
+    def _count(self, outcome):
+        """Count a hit or miss and update the hit ratio."""
+        outcome.inc()
+        lookups = self.hits.value + self.misses.value
+        self.hit_ratio.set(round(self.hits.value / lookups, 4))
+
+    def _set_local(self, user_id, user_data):
+        if self.max_size == 0:
+            return
+        with self._lock:
+            self._items[user_id] = (dict(user_data), time.monotonic() + self.ttl)
+            self._items.move_to_end(user_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions.inc()
+            self.size.set(len(self._items))
+
+    def _backend_call(self, method, *args):
+        if self.backend is None:
+            return None
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("* UserCache: backend %s failed: %s", method, e)
+            return None